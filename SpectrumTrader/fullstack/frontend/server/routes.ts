@@ -2,8 +2,96 @@ import type { Express } from "express";
 import { createServer, type Server } from "http";
 import { readFileSync, writeFileSync } from "fs";
 import { join } from "path";
-import { execSync } from "child_process";
+import { execSync, spawn, type ChildProcessWithoutNullStreams } from "child_process";
 import { existsSync } from "fs";
+import { createInterface } from "readline";
+
+type WorkerResponse = { id: number; status: string; output_path?: string; message?: string; [key: string]: any };
+
+/**
+ * Resident Python inference worker (run_inference.py --serve).
+ * Models and market cache stay loaded between refreshes; requests and
+ * responses are JSON lines over the child's stdin/stdout.
+ */
+let inferenceWorker: ChildProcessWithoutNullStreams | null = null;
+let nextRequestId = 1;
+const pendingRequests = new Map<number, { resolve: (r: WorkerResponse) => void; reject: (e: Error) => void }>();
+
+/** Reject every pending request and forget the worker, so the next request spawns a fresh one */
+function failInferenceWorker(child: ChildProcessWithoutNullStreams, error: Error) {
+  for (const pending of Array.from(pendingRequests.values())) {
+    pending.reject(error);
+  }
+  pendingRequests.clear();
+  if (inferenceWorker === child) {
+    inferenceWorker = null;
+  }
+}
+
+function getInferenceWorker(backendPath: string): ChildProcessWithoutNullStreams {
+  if (inferenceWorker && inferenceWorker.exitCode === null) {
+    return inferenceWorker;
+  }
+
+  console.log("🚀 Starting resident inference worker in:", backendPath);
+  const child = spawn("python", ["run_inference.py", "--serve"], {
+    cwd: backendPath,
+    env: { ...process.env, PYTHONUNBUFFERED: "1" },
+  });
+
+  createInterface({ input: child.stdout }).on("line", (line) => {
+    try {
+      const response: WorkerResponse = JSON.parse(line);
+      const pending = pendingRequests.get(response.id);
+      if (pending) {
+        pendingRequests.delete(response.id);
+        pending.resolve(response);
+      }
+    } catch {
+      console.warn("⚠️ Unparseable worker output:", line);
+    }
+  });
+  createInterface({ input: child.stderr }).on("line", (line) => console.log("[worker]", line));
+
+  child.on("exit", (code) => {
+    console.warn(`⚠️ Inference worker exited (code ${code})`);
+    failInferenceWorker(child, new Error("Inference worker exited"));
+  });
+  // spawn failures (python not on PATH) and EPIPE on a dead worker arrive as 'error'
+  // events; unhandled they would crash the API server instead of falling back to execSync
+  child.on("error", (error) => {
+    console.warn("⚠️ Inference worker error:", error.message);
+    failInferenceWorker(child, error);
+  });
+  child.stdin.on("error", (error) => {
+    console.warn("⚠️ Inference worker stdin error:", error.message);
+    failInferenceWorker(child, error);
+  });
+
+  inferenceWorker = child;
+  return child;
+}
+
+function requestWorkerInference(backendPath: string, timeoutMs = 180000): Promise<WorkerResponse> {
+  const worker = getInferenceWorker(backendPath);
+  const id = nextRequestId++;
+
+  return new Promise((resolve, reject) => {
+    const timer = setTimeout(() => {
+      pendingRequests.delete(id);
+      reject(new Error(`Inference worker timed out after ${timeoutMs}ms`));
+      // a hung worker would hold up every later request: kill it so the next one starts fresh
+      failInferenceWorker(worker, new Error("Inference worker killed after timeout"));
+      worker.kill();
+    }, timeoutMs);
+
+    pendingRequests.set(id, {
+      resolve: (r) => { clearTimeout(timer); resolve(r); },
+      reject: (e) => { clearTimeout(timer); reject(e); },
+    });
+    worker.stdin.write(JSON.stringify({ id, cmd: "infer" }) + "\n");
+  });
+}
 
 /**
  * Execute Python backend inference and return the generated omnispectrum data
@@ -18,8 +106,26 @@ async function runBackendInference(): Promise<any> {
     }
 
     console.log("🔄 Running backend inference from:", backendPath);
-    
-    // Run the Python inference script with better error handling
+
+    // Preferred path: resident worker (no per-refresh Python start-up or model load)
+    try {
+      const response = await requestWorkerInference(backendPath);
+      if (response.status === "success" && response.output_path && existsSync(response.output_path)) {
+        console.log(`✅ Backend inference completed via worker in ${response.elapsed_ms}ms`);
+        const jsonData = JSON.parse(readFileSync(response.output_path, "utf-8"));
+
+        // Copy to frontend data directory for caching
+        const frontendDataPath = join(process.cwd(), "server", "data", "omnispectrum.json");
+        writeFileSync(frontendDataPath, JSON.stringify(jsonData, null, 2));
+
+        return jsonData;
+      }
+      console.warn("⚠️ Worker inference failed:", response.message ?? response.status);
+    } catch (workerError) {
+      console.warn("⚠️ Inference worker unavailable:", workerError instanceof Error ? workerError.message : workerError);
+    }
+
+    // Fallback: one-shot Python process
     try {
       const output = execSync(`cd "${backendPath}" && python run_inference.py`, {
         encoding: "utf-8",
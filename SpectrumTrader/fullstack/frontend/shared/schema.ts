@@ -55,6 +55,14 @@ export const omnisSpectrumDataSchema = z.object({
   }).optional(),
   historicalClose: z.array(z.number()),
   historicalPatternMatch: z.array(z.number()).optional(),
+  patternMatches: z.array(z.object({
+    date: z.string(),
+    distance: z.number(),
+    similarity: z.number(),
+    fwd_return_1d: z.number().nullable(),
+    fwd_return_5d: z.number().nullable(),
+    fwd_return_21d: z.number().nullable(),
+  })).optional(),
 });
 
 export type OmniSpectrumData = z.infer<typeof omnisSpectrumDataSchema>;
@@ -2,31 +2,105 @@
 """
 Omnispectrum Backend Inference Wrapper
 Designed to be called from Node.js
+
+Usage:
+  python run_inference.py                      # one-shot: score, write JSON, exit
+  python run_inference.py --serve              # resident worker, JSON lines on stdin/stdout
+  python run_inference.py --serve --socket P   # resident worker on Unix socket P
+  python run_inference.py --quantize int8      # int8 encoders (if they pass the drift check)
+  python run_inference.py --no-cache           # rerun even if inputs and models are unchanged
+  python run_inference.py --trace stderr       # per-stage spans as JSON lines (or --trace FILE)
+  python run_inference.py --profile run.prof   # cProfile one run, dump pstats (implies --no-cache)
+  python run_inference.py --memory             # add peak/retained/RSS per span (tracemalloc)
+  python run_inference.py --mem-budget 1500    # fail fast once RSS exceeds 1500 MB
+
+The status JSON printed on success (and on error) carries the run's spans.
 """
 import sys
 import json
+import time
+import argparse
+import contextlib
 from pathlib import Path
 
 # Add parent directory to path to import src module
 backend_dir = Path(__file__).parent.absolute()
 sys.path.insert(0, str(backend_dir))
 
+parser = argparse.ArgumentParser(description="Omnispectrum inference")
+parser.add_argument("--serve", action="store_true", help="Run as a long-lived JSON-lines worker")
+parser.add_argument("--socket", default=None, help="Unix socket path for --serve (default: stdin/stdout)")
+parser.add_argument("--quantize", choices=["int8"], default=None,
+                    help="Use dynamically quantized encoders (refused if drift exceeds tolerance)")
+parser.add_argument("--no-cache", action="store_true",
+                    help="Always run the pipeline (skip the input/model fingerprint check)")
+parser.add_argument("--trace", default=None,
+                    help="Also write spans as JSON lines to FILE or 'stderr' (default: $OMNI_TRACE)")
+parser.add_argument("--profile", default=None, metavar="PATH",
+                    help="cProfile a single run and dump pstats to PATH")
+parser.add_argument("--memory", action="store_true",
+                    help="Record tracemalloc peak/retained bytes and RSS for every span")
+parser.add_argument("--mem-budget", type=float, default=None, metavar="MB",
+                    help="Fail as soon as RSS exceeds MB, with a per-stage memory report (default: $OMNI_MEM_BUDGET_MB)")
+args = parser.parse_args()
+if args.profile:
+    args.no_cache = True
+
+from src import tracing
+
 try:
-    from src.inference import run_inference
+    if args.serve:
+        from src.worker import InferenceWorker, serve_stdio, serve_unix
+        worker = InferenceWorker(quantize=args.quantize, result_cache=not args.no_cache, trace_sink=args.trace,
+                                 trace_memory=args.memory, mem_budget_mb=args.mem_budget)
+        if args.socket:
+            serve_unix(worker, args.socket)
+        else:
+            serve_stdio(worker)
+        sys.exit(0)
     
     # Determine output path
     output_dir = backend_dir / "data"
     output_path = str(output_dir / "omnispectrum.json")
     
-    # Run inference
-    print(f"Starting inference, output will be saved to: {output_path}")
-    run_inference(output_path=output_path)
+    tracing.begin("inference", sink=args.trace, memory=args.memory, budget_mb=args.mem_budget)
+    started = time.perf_counter()
+    
+    # Unchanged inputs and models: return the stored output (torch is never imported)
+    cache = None
+    if not args.no_cache:
+        from src.result_cache import ResultCache
+        cache = ResultCache(output_path, quantize=args.quantize)
+        with tracing.span("result_cache.lookup"):
+            hit = cache.lookup()
+        if hit:
+            print(json.dumps({
+                "status": "success",
+                "output_path": output_path,
+                "message": "Inputs unchanged, returned cached output",
+                "cache": "hit",
+                "spans": tracing.end(),
+            }))
+            sys.exit(0)
+    
+    with tracing.profiled(args.profile) if args.profile else contextlib.nullcontext():
+        with tracing.span("import"):
+            from src.inference import run_inference
+        
+        # Run inference
+        print(f"Starting inference, output will be saved to: {output_path}")
+        with tracing.span("run_inference"):
+            run_inference(output_path=output_path, quantize=args.quantize)
+    if cache is not None:
+        cache.store(time.perf_counter() - started)
     
     # Return success with file path
     result = {
         "status": "success",
         "output_path": output_path,
-        "message": "Inference completed successfully"
+        "message": "Inference completed successfully",
+        "cache": "miss" if cache is not None else "off",
+        "spans": tracing.end(),
     }
     print(json.dumps(result))
     sys.exit(0)
@@ -36,7 +110,8 @@ except ImportError as e:
         "status": "error",
         "error_type": "ImportError",
         "message": f"Failed to import inference module: {str(e)}",
-        "note": "Make sure all Python dependencies are installed: pip install -r requirements.txt"
+        "note": "Make sure all Python dependencies are installed: pip install -r requirements.txt",
+        "spans": tracing.end(),
     }
     print(json.dumps(error_result), file=sys.stderr)
     sys.exit(1)
@@ -46,6 +121,7 @@ except Exception as e:
         "status": "error",
         "error_type": type(e).__name__,
         "message": str(e),
+        "spans": tracing.end(),
     }
     print(json.dumps(error_result), file=sys.stderr)
     sys.exit(1)
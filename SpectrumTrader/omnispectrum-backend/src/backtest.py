@@ -0,0 +1,220 @@
+"""
+OmniSpectrum: Walk-Forward Batch Inference
+==========================================
+Scores every date in a range with the trained models, the way run_inference
+scores the last bar, and writes a columnar time series of the tiles.
+
+One add_basic_features pass over history, then per batch of dates:
+batched window builders -> one encoder call -> fusion MLP + LightGBM on the
+whole batch. Each row only sees bars up to its own date (windows end at the
+scored bar), so the series is walk-forward.
+
+Output (data/backtest/ by default, same layout idea as src.market_store):
+  manifest.json   rows, date range, columns, model kind, run parameters
+  <column>.npy    one array per column: ts (int64 ns UTC), close, sigma,
+                  tilt_bear/neutral/bull, em_<horizon>, expansion_prob,
+                  pattern_match, trend_strength
+
+pattern_match is the mean similarity of the PATTERN_INDEX_TOP nearest GFE
+windows in the pattern index that closed before the scored bar (the same
+definition run_inference uses, restricted to what was known at the time).
+
+Usage:
+  python -m src.backtest                                   # full history
+  python -m src.backtest --start 2023-01-01 --end 2024-12-31
+  python -m src.backtest --workers 4 --chunk-size 500      # process pool over date chunks
+
+A pool run matches the in-process run within float tolerance, not bit for
+bit (per-process torch/BLAS state can differ in the last ulp or in denormals);
+compare runs with compare_backtest.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from src.features import (
+    load_history, build_tme_windows, build_vse_grids, build_gfe_geometries, build_engineered_matrix
+)
+from src.encoder_bundle import GFE_SLICE, encode
+from src.inference import HORIZONS, PATTERN_INDEX_TOP, load_models
+from src.pattern_index import GFE_WINDOW, get_index, similarity
+
+OUTPUT_DIR = os.path.join("data", "backtest")
+MANIFEST = "manifest.json"
+WARMUP = 90  # first scored row in feature space, as in prepare_dataset
+BATCH_SIZE = 2048
+ENG_CLOSE, ENG_RV10, ENG_RV20, ENG_SLOPE = 0, 1, 2, 4  # build_engineered_matrix column order
+
+
+def select_indices(dates, start=None, end=None, warmup=WARMUP):
+    """Feature-row indices to score: dates within [start, end], after warm-up"""
+    mask = np.arange(len(dates)) >= warmup
+    if start is not None:
+        mask &= dates >= _as_date(start, dates)
+    if end is not None:
+        mask &= dates <= _as_date(end, dates)
+    return np.flatnonzero(mask)
+
+
+def _as_date(value, dates):
+    ts = pd.Timestamp(value)
+    if dates.tz is not None and ts.tzinfo is None:
+        ts = ts.tz_localize(dates.tz)
+    return ts
+
+
+def walk_forward_pattern_match(index, latents, indices, k=PATTERN_INDEX_TOP):
+    """Mean top-k similarity per row, searching only windows before each row's bar"""
+    out = np.empty(len(indices))
+    for j, (z, i) in enumerate(zip(latents, indices)):
+        _, dist = index.search(z, k, before=int(i) - GFE_WINDOW + 1)
+        out[j] = similarity(dist).mean() if len(dist) else np.nan
+    return out
+
+
+def score_indices(feats, indices, models, batch_size=BATCH_SIZE, index=None):
+    """Tile columns for every index, batch_size samples per model call"""
+    encoder, fusion, lgbm = models
+    parts = []
+    for lo in range(0, len(indices), batch_size):
+        idx = indices[lo:lo + batch_size]
+        gfe_in = build_gfe_geometries(feats, idx, window=20)
+        emb = encode(encoder, build_tme_windows(feats, idx, window=90), build_vse_grids(feats, idx, window=60), gfe_in)
+        eng = build_engineered_matrix(feats, idx)
+        fused = np.hstack([emb, eng])
+        probs = fusion.predict_proba(fused)
+        close = eng[:, ENG_CLOSE]
+        sigma = np.where(eng[:, ENG_RV20] > 0, eng[:, ENG_RV20], eng[:, ENG_RV10])
+        cols = {
+            "close": close,
+            "sigma": sigma,
+            "tilt_bear": probs[:, 0],
+            "tilt_neutral": probs[:, 1],
+            "tilt_bull": probs[:, 2],
+        }
+        for name, h in HORIZONS.items():
+            cols[f"em_{name}"] = close * sigma * np.sqrt(h / 252.0)
+        cols["expansion_prob"] = lgbm.predict(fused) if lgbm is not None else np.full(len(idx), np.nan)
+        if index is not None:
+            cols["pattern_match"] = walk_forward_pattern_match(index, index.encode(gfe_in), idx)
+        else:
+            cols["pattern_match"] = 1.0 / (np.linalg.norm(emb[:, GFE_SLICE], axis=1) + 1e-9)
+        cols["trend_strength"] = eng[:, ENG_SLOPE]
+        parts.append(cols)
+    return {k: np.concatenate([p[k] for p in parts]).astype(np.float64) for k in parts[0]}
+
+
+# ---------------------------------------------------------------- process pool
+_worker_state = {}
+
+
+def _init_worker(feats, quantize):
+    import torch
+    torch.set_num_threads(1)  # one core per process; the pool provides the parallelism
+    _worker_state["feats"] = feats
+    _worker_state["models"] = load_models(quantize=quantize)
+    _worker_state["index"] = get_index()
+
+
+def _score_chunk(args):
+    indices, batch_size = args
+    return score_indices(_worker_state["feats"], indices, _worker_state["models"], batch_size,
+                         _worker_state["index"])
+
+
+def run_backtest(start=None, end=None, output_dir=OUTPUT_DIR, workers=1, chunk_size=None,
+                 batch_size=BATCH_SIZE, quantize=None):
+    """Score [start, end] and write the columnar tile series. Returns the manifest."""
+    t0 = time.time()
+    feats, dates = load_history()
+    indices = select_indices(dates, start, end)
+    if len(indices) == 0:
+        raise Exception(f"[ERROR] No dates to score in range {start or 'begin'} .. {end or 'end'}")
+    index = get_index()  # synced once here so pool workers only open it
+    print(f"[INFO] Scoring {len(indices)} dates: {dates[indices[0]].date()} .. {dates[indices[-1]].date()}")
+
+    if workers > 1:
+        chunk_size = chunk_size or -(-len(indices) // workers)
+        chunks = [indices[i:i + chunk_size] for i in range(0, len(indices), chunk_size)]
+        print(f"[INFO] Process pool: {workers} workers, {len(chunks)} chunks of <= {chunk_size} dates")
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(feats, quantize)) as pool:
+            parts = list(pool.map(_score_chunk, [(c, batch_size) for c in chunks]))
+        columns = {k: np.concatenate([p[k] for p in parts]) for k in parts[0]}
+    else:
+        columns = score_indices(feats, indices, load_models(quantize=quantize), batch_size, index)
+
+    ts = dates[indices]
+    utc_ts = ts.tz_convert("UTC").tz_localize(None) if ts.tz is not None else ts
+    columns = {"ts": utc_ts.values.astype("datetime64[ns]").astype(np.int64), **columns}
+    elapsed = time.time() - t0
+    manifest = write_columns(columns, output_dir, {
+        "start": str(ts[0]), "end": str(ts[-1]),
+        "utc_offset_min": int(ts[0].utcoffset().total_seconds() // 60) if ts.tz is not None else None,
+        "workers": workers, "batch_size": batch_size, "quantize": quantize,
+        "elapsed_s": round(elapsed, 3),
+    })
+    print(f"[OK] Backtest: {len(indices)} dates in {elapsed:.2f}s ({len(indices) / elapsed:,.0f} dates/s) -> {output_dir}")
+    return manifest
+
+
+def write_columns(columns, output_dir, meta):
+    """One .npy per column, manifest replaced last (all-or-nothing like the market store)"""
+    os.makedirs(output_dir, exist_ok=True)
+    staged = {}
+    for name, values in columns.items():
+        tmp = os.path.join(output_dir, f".{name}.npy.tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, np.ascontiguousarray(values))
+        staged[name] = tmp
+    for name, tmp in staged.items():
+        os.replace(tmp, os.path.join(output_dir, f"{name}.npy"))
+    manifest = {"rows": int(len(columns["ts"])), "columns": list(columns), **meta}
+    tmp_manifest = os.path.join(output_dir, f".{MANIFEST}.tmp")
+    with open(tmp_manifest, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_manifest, os.path.join(output_dir, MANIFEST))
+    return manifest
+
+
+def load_backtest(output_dir=OUTPUT_DIR, columns=None, mmap=True):
+    """Backtest columns as a DataFrame indexed by date"""
+    with open(os.path.join(output_dir, MANIFEST), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    names = [c for c in (columns or manifest["columns"]) if c != "ts"]
+    data = {c: np.load(os.path.join(output_dir, f"{c}.npy"), mmap_mode="r" if mmap else None) for c in names}
+    index = pd.to_datetime(np.load(os.path.join(output_dir, "ts.npy")), utc=manifest.get("utc_offset_min") is not None)
+    if manifest.get("utc_offset_min") is not None:
+        index = index.tz_convert(pd.Timestamp(manifest["start"]).tz)
+    return pd.DataFrame(data, index=index.rename("Date"))
+
+
+def compare_backtest(output_dir, other_dir, rtol=1e-6, atol=1e-9):
+    """Columns that differ between two backtest runs beyond float tolerance ([] if they match)"""
+    a, b = load_backtest(output_dir, mmap=False), load_backtest(other_dir, mmap=False)
+    if not a.index.equals(b.index) or list(a.columns) != list(b.columns):
+        raise Exception(f"[ERROR] Backtests in {output_dir} and {other_dir} cover different dates or columns")
+    return [c for c in a.columns
+            if not np.allclose(a[c].to_numpy(), b[c].to_numpy(), rtol=rtol, atol=atol, equal_nan=True)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OmniSpectrum walk-forward batch inference")
+    parser.add_argument("--start", default=None, help="First date to score (YYYY-MM-DD)")
+    parser.add_argument("--end", default=None, help="Last date to score (YYYY-MM-DD)")
+    parser.add_argument("--output", default=OUTPUT_DIR, help="Output directory for the columnar series")
+    parser.add_argument("--workers", type=int, default=1, help="Processes over date chunks (1 = in-process)")
+    parser.add_argument("--chunk-size", type=int, default=None, help="Dates per chunk (default: split evenly)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Samples per model call")
+    parser.add_argument("--quantize", choices=["int8"], default=None)
+    args = parser.parse_args(argv)
+    run_backtest(args.start, args.end, args.output, args.workers, args.chunk_size, args.batch_size, args.quantize)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
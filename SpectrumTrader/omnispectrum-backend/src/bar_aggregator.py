@@ -0,0 +1,313 @@
+"""
+OmniSpectrum: Tick-to-Bar Aggregator
+====================================
+Builds 1m / 5m OHLCV bars from a tick stream (src.synthetic_data_gen
+TickStream / stream_ticks, TICK_DTYPE batches) and hands every closed bar to
+a per-interval FeatureState, whose model inputs for the new bar are the
+"tile" the dashboard / worker consumes.
+
+Memory is bounded whatever the stream length: per interval one forming bar
+(scalars), the last BAR_HISTORY closed bars and a FeatureState (fixed rings);
+ticks are folded into the forming bars batch by batch (NumPy over the batch,
+one Python step per bucket boundary) and not retained.
+
+A bar closes when the first tick of a later bucket arrives, on an idle
+flush() once the wall clock has passed its end (a quiet live feed), or at
+end of stream.
+Tick-to-tile latency is measured from the wall-clock `sent` time of the tick
+that closed the bar to the moment its tile is built (queue / socket transit,
+aggregation, FeatureState update and model-input build).
+
+Usage:
+  python -m src.bar_aggregator --listen tcp://127.0.0.1:9100        # then, elsewhere:
+  python -m src.synthetic_data_gen --stream tcp://127.0.0.1:9100 --rate 100000 --duration 10
+  python -m src.bar_aggregator --self-test --rate 50000 --duration 5  # producer thread + queue, one process
+"""
+import os
+import sys
+import time
+import queue
+import socket
+import argparse
+import threading
+from collections import deque
+import numpy as np
+import pandas as pd
+from src.feature_state import FeatureState
+from src.synthetic_data_gen import TICK_DTYPE, TICK_HEADER, generate_synthetic_ohlc, stream_ticks
+
+INTERVALS = {"1m": 60 * 10**9, "5m": 300 * 10**9, "15m": 900 * 10**9}
+BAR_HISTORY = 512        # closed bars kept per interval
+WARMUP_BARS = 200        # synthetic history seeded into each FeatureState
+LATENCY_SAMPLES = 65536  # tick-to-tile latencies kept for percentiles
+IDLE_FLUSH_S = 0.05      # queue timeout after which forming bars are checked against the clock
+
+
+class BarAggregator:
+    def __init__(self, intervals=("1m", "5m"), on_bar=None, history=BAR_HISTORY):
+        unknown = [i for i in intervals if i not in INTERVALS]
+        if unknown:
+            raise Exception(f"[ERROR] Unsupported bar interval(s) {unknown}; choose from {list(INTERVALS)}")
+        self.intervals = list(intervals)
+        self.on_bar = on_bar
+        self.bars = {i: deque(maxlen=history) for i in self.intervals}
+        self._forming = {i: None for i in self.intervals}
+        self.ticks = 0
+        self.last_ts = None
+
+    def _close(self, interval, closed_by):
+        bar = self._forming[interval]
+        if bar is None:
+            return
+        self._forming[interval] = None
+        bar["closed_by"] = int(closed_by)
+        self.bars[interval].append(bar)
+        if self.on_bar is not None:
+            self.on_bar(interval, bar)
+
+    def add(self, batch):
+        """Fold one TICK_DTYPE batch (market-time ordered) into the forming bars"""
+        n = len(batch)
+        if n == 0:
+            return
+        ts, price, qty, sent = batch["ts"], batch["price"], batch["qty"], batch["sent"]
+        self.ticks += n
+        self.last_ts = int(ts[-1])
+        for interval in self.intervals:
+            step = INTERVALS[interval]
+            bucket = ts // step
+            cuts = np.flatnonzero(bucket[1:] != bucket[:-1]) + 1
+            lo = 0
+            for hi in [*cuts.tolist(), n]:
+                b = int(bucket[lo])
+                seg = price[lo:hi]
+                bar = self._forming[interval]
+                if bar is not None and bar["bucket"] != b:
+                    self._close(interval, sent[lo])
+                    bar = None
+                high, low = float(seg.max()), float(seg.min())
+                if bar is None:
+                    self._forming[interval] = {
+                        "interval": interval, "bucket": b, "start": b * step,
+                        "open": float(seg[0]), "high": high, "low": low, "close": float(seg[-1]),
+                        "volume": int(qty[lo:hi].sum()), "ticks": hi - lo,
+                    }
+                else:
+                    bar["high"] = max(bar["high"], high)
+                    bar["low"] = min(bar["low"], low)
+                    bar["close"] = float(seg[-1])
+                    bar["volume"] += int(qty[lo:hi].sum())
+                    bar["ticks"] += hi - lo
+                lo = hi
+
+    def flush(self, market_ns=None):
+        """Close forming bars that ended by market_ns (UTC ns; all of them if None)"""
+        now = time.time_ns()
+        for interval in self.intervals:
+            bar = self._forming[interval]
+            if bar is not None and (market_ns is None or bar["start"] + INTERVALS[interval] <= market_ns):
+                self._close(interval, now)
+
+    def frame(self, interval):
+        """Closed bars kept for interval as an OHLCV DataFrame (Date = bar start, UTC)"""
+        bars = list(self.bars[interval])
+        return pd.DataFrame({
+            "Date": pd.to_datetime([b["start"] for b in bars], utc=True),
+            "Open": [b["open"] for b in bars], "High": [b["high"] for b in bars],
+            "Low": [b["low"] for b in bars], "Close": [b["close"] for b in bars],
+            "Volume": [b["volume"] for b in bars],
+        })
+
+
+class TickPipeline:
+    """
+    Ticks -> BarAggregator -> FeatureState per interval -> tile (model inputs).
+    on_tile(interval, bar, tile) is called for every tile, e.g. to run models.
+    """
+
+    def __init__(self, intervals=("1m", "5m"), seed_history=None, on_tile=None, base_price=None,
+                 warmup_bars=WARMUP_BARS):
+        self.on_tile = on_tile
+        self.aggregator = BarAggregator(intervals, on_bar=self._on_bar)
+        seed_history = seed_history or {}
+        self.states = {}
+        for interval in self.aggregator.intervals:
+            history = seed_history.get(interval)
+            if history is None:
+                freq = f"{INTERVALS[interval] // 60 // 10**9}min"
+                history = generate_synthetic_ohlc(base_price or 23500.0, warmup_bars, freq=freq, seed=7,
+                                                  name=f"warmup_{interval}")
+            self.states[interval] = FeatureState.from_history(history[["Open", "High", "Low", "Close", "Volume"]])
+        self.tiles = {i: 0 for i in self.aggregator.intervals}
+        self.latest = {}
+        self._latency = np.zeros(LATENCY_SAMPLES)
+        self._n_latency = 0
+        self.started = None
+        self.finished = None
+
+    def _on_bar(self, interval, bar):
+        state = self.states[interval]
+        feats = state.update(bar["open"], bar["high"], bar["low"], bar["close"], bar["volume"])
+        if feats is None:
+            return
+        tile = state.model_inputs()
+        self._latency[self._n_latency % LATENCY_SAMPLES] = time.time_ns() - bar["closed_by"]
+        self._n_latency += 1
+        self.tiles[interval] += 1
+        self.latest[interval] = (bar, tile)
+        if self.on_tile is not None:
+            self.on_tile(interval, bar, tile)
+
+    def consume(self, batch):
+        if self.started is None:
+            self.started = time.perf_counter()
+        self.aggregator.add(batch)
+        self.finished = time.perf_counter()
+
+    def finish(self):
+        """End of stream: close the forming bars"""
+        self.aggregator.flush()
+        self.finished = time.perf_counter()
+
+    # ------------------------------------------------------------------ transports
+    def run_queue(self, q, idle_s=IDLE_FLUSH_S):
+        """Consume TICK_DTYPE batches from q until a None sentinel"""
+        while True:
+            try:
+                batch = q.get(timeout=idle_s)
+            except queue.Empty:
+                # quiet live feed: close bars whose end has passed (accelerated streams run ahead of the clock)
+                self.aggregator.flush(time.time_ns())
+                continue
+            if batch is None:
+                break
+            self.consume(batch)
+        self.finish()
+        return self.report()
+
+    def run_socket(self, conn):
+        """Consume length-prefixed batches from a connected socket until EOF"""
+        reader = conn.makefile("rb")
+        try:
+            while True:
+                header = reader.read(TICK_HEADER.size)
+                if len(header) < TICK_HEADER.size:
+                    break
+                (n,) = TICK_HEADER.unpack(header)
+                payload = reader.read(n * TICK_DTYPE.itemsize)
+                if len(payload) < n * TICK_DTYPE.itemsize:
+                    break
+                self.consume(np.frombuffer(payload, dtype=TICK_DTYPE))
+        finally:
+            reader.close()
+            conn.close()
+        self.finish()
+        return self.report()
+
+    # ------------------------------------------------------------------ stats
+    def report(self):
+        lat = self._latency[:min(self._n_latency, LATENCY_SAMPLES)] / 1e6
+        elapsed = (self.finished - self.started) if self.started is not None else 0.0
+        ticks = self.aggregator.ticks
+        out = {
+            "ticks": ticks,
+            "seconds": round(elapsed, 3),
+            "ticks_per_s": round(ticks / elapsed, 1) if elapsed > 0 else 0.0,
+            "bars": {i: len(self.aggregator.bars[i]) for i in self.aggregator.intervals},
+            "tiles": dict(self.tiles),
+        }
+        if len(lat):
+            out["latency_ms"] = {"p50": round(float(np.percentile(lat, 50)), 3),
+                                 "p99": round(float(np.percentile(lat, 99)), 3),
+                                 "max": round(float(lat.max()), 3)}
+        return out
+
+
+def listen(address):
+    """Bound, listening socket for 'tcp://host:port' or 'unix:/path'"""
+    if address.startswith("tcp://"):
+        host, port = address[len("tcp://"):].rsplit(":", 1)
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, int(port)))
+    elif address.startswith("unix:"):
+        path = address[len("unix:"):]
+        if os.path.exists(path):
+            os.unlink(path)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(path)
+    else:
+        raise Exception(f"[ERROR] Unsupported stream address: {address} (use tcp://host:port or unix:/path)")
+    sock.listen(1)
+    return sock
+
+
+def run_local(rate, duration_s, intervals=("1m", "5m"), speed=60.0, transport="queue", seed=42):
+    """
+    Producer thread + consumer in one process over a bounded queue or a
+    loopback TCP socket. Returns (producer stats, pipeline report).
+    """
+    pipeline = TickPipeline(intervals)
+    result = {}
+    if transport == "queue":
+        q = queue.Queue(maxsize=4096)
+        producer = threading.Thread(target=lambda: result.update(stream_ticks(q, rate, duration_s, speed, seed)),
+                                    name="ticks", daemon=True)
+        producer.start()
+        report = pipeline.run_queue(q)
+    elif transport == "tcp":
+        server = listen("tcp://127.0.0.1:0")
+        address = "tcp://127.0.0.1:%d" % server.getsockname()[1]
+        producer = threading.Thread(target=lambda: result.update(stream_ticks(address, rate, duration_s, speed, seed)),
+                                    name="ticks", daemon=True)
+        producer.start()
+        conn, _ = server.accept()
+        server.close()
+        report = pipeline.run_socket(conn)
+    else:
+        raise Exception(f"[ERROR] Unknown transport: {transport}")
+    producer.join()
+    return result, report
+
+
+def _print_report(report, producer=None):
+    if producer:
+        print(f"  producer: {producer['ticks']:,d} ticks at {producer['rate']:,.0f}/s "
+              f"(max lag {producer['max_lag_ms']:.1f} ms, {producer['batch']} ticks/batch)")
+    print(f"  consumer: {report['ticks']:,d} ticks in {report['seconds']:.2f}s = {report['ticks_per_s']:,.0f}/s")
+    print(f"  bars: {report['bars']}  tiles: {report['tiles']}")
+    if "latency_ms" in report:
+        lat = report["latency_ms"]
+        print(f"  tick->tile latency: p50 {lat['p50']:.3f} ms  p99 {lat['p99']:.3f} ms  max {lat['max']:.3f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OmniSpectrum tick-to-bar aggregator")
+    parser.add_argument("--listen", default=None, metavar="ADDRESS", help="Receive ticks on tcp://host:port or unix:/path")
+    parser.add_argument("--self-test", action="store_true", help="Run a producer thread in this process")
+    parser.add_argument("--transport", choices=["queue", "tcp"], default="queue", help="--self-test transport")
+    parser.add_argument("--intervals", default="1m,5m")
+    parser.add_argument("--rate", type=float, default=50_000, help="--self-test ticks per second")
+    parser.add_argument("--duration", type=float, default=5.0, help="--self-test seconds")
+    parser.add_argument("--speed", type=float, default=60.0, help="--self-test market seconds per wall second")
+    args = parser.parse_args(argv)
+    intervals = [i for i in args.intervals.split(",") if i]
+
+    if args.self_test:
+        producer, report = run_local(args.rate, args.duration, intervals, args.speed, args.transport)
+        _print_report(report, producer)
+        return 0
+    if not args.listen:
+        parser.error("--listen ADDRESS or --self-test is required")
+    server = listen(args.listen)
+    print(f"[INFO] Waiting for a tick stream on {args.listen} (intervals {', '.join(intervals)})")
+    conn, _ = server.accept()
+    server.close()
+    report = TickPipeline(intervals).run_socket(conn)
+    print("[OK] Stream ended")
+    _print_report(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,641 @@
+"""
+OmniSpectrum: Benchmarks
+========================
+Offline throughput and regression benchmarks for the pipeline kernels.
+No network, no cache, no models required: the pipeline suite builds synthetic
+caches and trains throwaway models in a temporary working directory.
+Correctness (parity and protocol) checks live in tests/: python -m pytest tests
+
+Usage:
+  python -m src.benchmark features                       # 1k / 100k / 1M rows
+  python -m src.benchmark features --sizes 1000,50000
+  python -m src.benchmark state                          # FeatureState per-bar update cost
+  python -m src.benchmark windows --sizes 10000,100000    # batched vs per-sample window builders
+  python -m src.benchmark labels                         # direction/expansion label sweeps
+  python -m src.benchmark encoders                       # eager encoders vs fused TorchScript bundle
+  python -m src.benchmark memory                         # per-stage peak memory vs output size (regression check)
+  python -m src.benchmark pipeline                       # synthetic caches 730 / 10k / 100k / 1M bars, end to end
+  python -m src.benchmark pipeline --output new.json --compare data/benchmark/baseline.json
+  python -m src.benchmark fetch                          # fetchers against src.feed_server (clean / faulty / rate-limited)
+  python -m src.benchmark ticks --sizes 10000,100000     # tick stream -> 1m/5m bars -> FeatureState tiles, per tick rate
+  python -m src.benchmark resample                       # 5m -> 15m/30m/1h/session: vectorized vs pandas, incremental vs full
+"""
+import io
+import os
+import sys
+import json
+import time
+import asyncio
+import platform
+import argparse
+import tempfile
+import subprocess
+import contextlib
+import numpy as np
+import pandas as pd
+from src.features import (
+    add_basic_features,
+    build_tme_window, build_vse_grid, build_gfe_geometry, build_engineered_features,
+    build_tme_windows, build_vse_grids, build_gfe_geometries, build_engineered_matrix
+)
+from src.feature_state import FeatureState
+from src.labels import direction_labels, direction_label_sweep, expansion_label_sweep
+from src import tracing
+
+# Peak tracemalloc bytes a prepare_dataset stage may allocate, as a multiple of
+# the bytes it returns (+ MEMORY_SLACK_MB for fixed-size chunk temporaries).
+# Window builders gather in bounded chunks, so a regression to whole-array
+# float64 intermediates (3-6x) trips these.
+MEMORY_RATIO_MAX = {
+    "features.add_basic": 5.5,
+    "windows.tme": 1.1,
+    "windows.vse": 1.25,
+    "windows.gfe": 1.25,
+    "windows.engineered": 2.25,
+    "labels.direction": 9.0,
+}
+MEMORY_SLACK_MB = 32
+
+PIPELINE_SIZES = (730, 10_000, 100_000, 1_000_000)
+PREPARE_MAX = 100_000        # largest cache prepare_dataset is timed on
+TRAIN_MAX = 10_000           # largest cache train_all is timed on (full-batch LSTM)
+WARM_RUNS = 5
+RESULTS_FILE = os.path.join("data", "benchmark", "pipeline.json")
+REGRESSION_TOLERANCE = 0.20  # flag stages more than 20% slower than baseline...
+MIN_DELTA_S = 0.010          # ...and at least 10 ms slower in absolute terms
+
+# fetch suite: feed stand-in fault scenarios, and the retry backoff used against them
+FETCH_SCENARIOS = {
+    "clean": {"latency_ms": 40.0, "jitter_ms": 20.0},
+    "faulty": {"latency_ms": 40.0, "jitter_ms": 20.0, "error_rate": 0.15},
+    "rate-limited": {"latency_ms": 40.0, "jitter_ms": 20.0, "rate_limit": 10.0, "burst": 3.0},
+}
+FETCH_BACKOFF_S = 0.05
+BACKFILL_DAYS = 3650
+
+TICK_RATES = (10_000, 50_000, 100_000)
+TICK_DURATION_S = 3.0
+TICK_SPEED = 600.0  # market seconds per wall second: ten 1m bars per second
+
+RESAMPLE_SIZES = (75 * 250, 75 * 250 * 10)  # one and ten years of 5m session bars
+
+
+def random_ohlc(n, seed=0, base_price=23500.0, volatility=0.012):
+    """Cheap geometric random walk OHLCV frame for kernel benchmarks"""
+    rng = np.random.default_rng(seed)
+    close = base_price * np.exp(np.cumsum(rng.normal(0, volatility, n)))
+    spread = np.abs(rng.normal(0, volatility / 2, (2, n)))
+    open_ = close * (1 + rng.normal(0, volatility / 3, n))
+    return pd.DataFrame({
+        "Open": open_,
+        "High": np.maximum.reduce([close * (1 + spread[0]), open_, close]),
+        "Low": np.minimum.reduce([close * (1 - spread[1]), open_, close]),
+        "Close": close,
+        "Volume": rng.integers(100_000, 2_000_000, n),
+    })
+
+
+def _timeit(fn, repeat=3):
+    """Best-of-N wall time in seconds"""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def bench_features(sizes=(1_000, 100_000, 1_000_000), repeat=3):
+    """Time vectorized add_basic_features (parity with the pandas original: tests/test_features.py)"""
+    rows = []
+    for n in sizes:
+        df = random_ohlc(n)
+        t_new, _ = _timeit(lambda: add_basic_features(df), repeat)
+        rows.append({"rows": n, "vectorized_s": t_new, "rows_per_s": n / t_new})
+        print(f"  add_basic_features {n:>9,d} rows: {t_new * 1000:9.2f} ms  ({n / t_new:,.0f} rows/s)")
+    return rows
+
+
+def bench_feature_state(history=5_000, updates=2_000):
+    """Seed FeatureState and stream bars through it, vs one full add_basic_features recompute"""
+    df = random_ohlc(history + updates, seed=1)
+    t_seed, state = _timeit(lambda: FeatureState.from_history(df.iloc[:history]), 1)
+    bars = df.iloc[history:].to_numpy()
+    t0 = time.perf_counter()
+    for o, h, l, c, v in bars:
+        state.update(o, h, l, c, v)
+    per_bar = (time.perf_counter() - t0) / len(bars)
+    t_full, _ = _timeit(lambda: add_basic_features(df), 3)
+    print(f"  FeatureState seed ({history:,d} bars): {t_seed * 1000:.2f} ms")
+    print(f"  FeatureState update: {per_bar * 1e6:.1f} us/bar over {len(bars):,d} bars")
+    print(f"  full add_basic_features recompute: {t_full * 1000:.2f} ms")
+    return {"seed_s": t_seed, "update_us": per_bar * 1e6, "full_recompute_s": t_full}
+
+
+def bench_windows(sizes=(10_000, 100_000), reference_max=20_000):
+    """Time batched window builders (and the per-sample loop where affordable)"""
+    rows = []
+    for n in sizes:
+        feats = add_basic_features(random_ohlc(n))
+        indices = np.arange(90, len(feats) - 5)
+        batched = lambda: (build_tme_windows(feats, indices), build_vse_grids(feats, indices),
+                           build_gfe_geometries(feats, indices), build_engineered_matrix(feats, indices))
+        t_batch, out = _timeit(batched, 3)
+        nbytes = sum(a.nbytes for a in out)
+        row = {"rows": n, "samples": len(indices), "batched_s": t_batch, "samples_per_s": len(indices) / t_batch,
+               "output_mb": nbytes / 1e6}
+        if n <= reference_max:
+            def loop():
+                return (np.array([build_tme_window(feats, i) for i in indices]),
+                        np.array([build_vse_grid(feats, i) for i in indices]),
+                        np.array([build_gfe_geometry(feats, i) for i in indices]),
+                        np.array([list(build_engineered_features(feats, i).values()) for i in indices]))
+            t_loop, _ = _timeit(loop, 1)
+            row.update({"loop_s": t_loop, "speedup": t_loop / t_batch})
+        rows.append(row)
+        ref_txt = f"loop {row['loop_s']:.2f}s  x{row['speedup']:.0f}" if "loop_s" in row else "loop skipped"
+        print(f"  windows {len(indices):>9,d} samples: {t_batch * 1000:9.2f} ms  "
+              f"({row['samples_per_s']:,.0f} samples/s, {row['output_mb']:.1f} MB)  {ref_txt}")
+    return rows
+
+
+def bench_labels(sizes=(100_000, 1_000_000), horizons=(1, 3, 5, 10, 21), thresholds=(0.0025, 0.005, 0.01)):
+    """Time a full label sweep (every horizon x threshold, every short x long window)"""
+    rows = []
+    for n in sizes:
+        feats = add_basic_features(random_ohlc(n))
+        indices = np.arange(90, len(feats) - max(horizons))
+        close, returns = feats["Close"].to_numpy(), feats["Return"].to_numpy()
+        t_dir, dir_labels = _timeit(lambda: direction_label_sweep(close, indices, horizons, thresholds), 3)
+        t_exp, exp_labels = _timeit(lambda: expansion_label_sweep(returns, indices), 3)
+        n_sets = len(dir_labels) + len(exp_labels)
+        rows.append({"rows": n, "samples": len(indices), "label_sets": n_sets, "direction_s": t_dir, "expansion_s": t_exp})
+        print(f"  labels {len(indices):>9,d} samples x {n_sets} label sets: "
+              f"direction {t_dir * 1000:.1f} ms, expansion {t_exp * 1000:.1f} ms")
+    return rows
+
+
+def bench_encoders(batch_sizes=(1, 256), repeat=20):
+    """
+    Load time and per-call latency: three eager encoders (state dicts) vs the
+    fused TorchScript bundle. Uses freshly initialised models in a temp dir.
+    """
+    import torch
+    from src.train import TME_LSTM, VSE_CNN, GFE_AE
+    from src.encoder_bundle import STATE_FILES, BUNDLE_FILE, load_eager_encoders, export_bundle, encode
+
+    feats = add_basic_features(random_ohlc(5_000, seed=2))
+    indices = np.arange(90, len(feats))
+    windows = (build_tme_windows(feats, indices), build_vse_grids(feats, indices), build_gfe_geometries(feats, indices))
+    rows = []
+    with tempfile.TemporaryDirectory() as model_dir:
+        torch.manual_seed(0)
+        tme, vse, gfe = TME_LSTM().eval(), VSE_CNN().eval(), GFE_AE().eval()
+        for m, name in zip((tme, vse, gfe), STATE_FILES):
+            torch.save(m.state_dict(), os.path.join(model_dir, name))
+        export_bundle(tme, vse, gfe, tuple(w[-64:] for w in windows), model_dir)
+
+        load_eager_encoders(model_dir)  # import + first-load costs out of the way
+        t_eager_load, eager = _timeit(lambda: load_eager_encoders(model_dir), 5)
+        t_bundle_load, bundle = _timeit(lambda: torch.jit.load(os.path.join(model_dir, BUNDLE_FILE)), 5)
+        print(f"  load: eager {t_eager_load * 1000:.2f} ms (3 state dicts), bundle {t_bundle_load * 1000:.2f} ms (1 file)")
+
+        for n in batch_sizes:
+            batch = tuple(w[-n:] for w in windows)
+            for _ in range(10):  # let the TorchScript profiling executor settle
+                encode(eager, *batch), encode(bundle, *batch)
+            a, b = encode(eager, *batch), encode(bundle, *batch)
+            t_eager = _timeit(lambda: [encode(eager, *batch) for _ in range(repeat)], 3)[0] / repeat
+            t_bundle = _timeit(lambda: [encode(bundle, *batch) for _ in range(repeat)], 3)[0] / repeat
+            max_diff = float(np.max(np.abs(a - b)))
+            rows.append({"batch": n, "eager_ms": t_eager * 1000, "bundle_ms": t_bundle * 1000, "max_abs_diff": max_diff})
+            print(f"  batch {n:>5d}: eager {t_eager * 1000:8.3f} ms, bundle {t_bundle * 1000:8.3f} ms  "
+                  f"x{t_eager / t_bundle:.2f}  (max diff {max_diff:.1e})")
+    return {"eager_load_s": t_eager_load, "bundle_load_s": t_bundle_load, "calls": rows}
+
+
+def _nbytes(obj):
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=True, deep=False).sum())
+    return int(obj.nbytes)
+
+
+def bench_memory(sizes=(100_000, 500_000), ratios=None):
+    """
+    Run the prepare_dataset stages on synthetic bars under a memory trace and
+    check each stage's tracemalloc peak against MEMORY_RATIO_MAX x its output
+    bytes + MEMORY_SLACK_MB. Raises AssertionError on a regression.
+    """
+    ratios = ratios or MEMORY_RATIO_MAX
+    rows = []
+    for n in sizes:
+        df = random_ohlc(n, seed=2)
+        out = {}
+        tracing.begin("benchmark.memory", memory=True, rows=n)
+        try:
+            with tracing.span("features.add_basic"):
+                out["features.add_basic"] = feats = add_basic_features(df)
+            indices = np.arange(90, len(feats) - 5)
+            for name, fn in (("windows.tme", build_tme_windows), ("windows.vse", build_vse_grids),
+                             ("windows.gfe", build_gfe_geometries), ("windows.engineered", build_engineered_matrix)):
+                with tracing.span(name):
+                    out[name] = fn(feats, indices)
+            with tracing.span("labels.direction"):
+                out["labels.direction"] = direction_labels(feats["Close"].to_numpy(), indices, horizon=5, threshold=0.005)
+        finally:
+            spans = {s["span"]: s for s in tracing.end()}
+        failures = []
+        for name, limit in ratios.items():
+            output_mb = _nbytes(out[name]) / tracing.MB
+            ratio = spans[name]["peak_mb"] / output_mb if output_mb else 0.0
+            rows.append({"rows": n, "stage": name, "peak_mb": spans[name]["peak_mb"], "output_mb": output_mb,
+                         "retained_mb": spans[name]["retained_mb"], "ratio": ratio, "limit": limit})
+            over = spans[name]["peak_mb"] > limit * output_mb + MEMORY_SLACK_MB
+            status = "REGRESSION" if over else "ok"
+            print(f"  {n:>9,d} rows  {name:20s} peak {spans[name]['peak_mb']:9.1f} MB  "
+                  f"output {output_mb:9.1f} MB  x{ratio:5.2f} (limit x{limit:.2f})  {status}")
+            if over:
+                failures.append(f"{name} at {n:,d} rows: peak x{ratio:.2f} of output (limit x{limit:.2f})")
+        if failures:
+            raise AssertionError("Memory regression: " + "; ".join(failures))
+    return rows
+
+
+def _quiet():
+    """Swallow pipeline progress prints while timing"""
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def _import_seconds(module="src.inference"):
+    """Fresh-interpreter import time of the inference stack (torch, sklearn, lightgbm)"""
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-W", "ignore", "-c", code], cwd=backend,
+                         capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def bench_pipeline(sizes=PIPELINE_SIZES, prepare_max=PREPARE_MAX, train_max=TRAIN_MAX, warm_runs=WARM_RUNS):
+    """
+    End-to-end stage timings on synthetic caches of each size (bars):
+    synthetic_data_gen store write, add_basic_features, each window builder,
+    prepare_dataset (<= prepare_max), train_all samples/s (<= train_max) and
+    run_inference cold (first call: model load + pattern index build) and warm
+    (median of warm_runs with models and cache held, as in src.worker).
+    Sizes above train_max reuse the models trained on the largest trained size.
+    Runs in a temporary working directory; returns result rows.
+    """
+    from src.synthetic_data_gen import write_synthetic_store
+    from src.features import load_cache, cache_to_frame
+    from src.train import prepare_dataset, train_all
+    from src.inference import load_models, run_inference
+
+    rows = []
+
+    def record(n, stage, seconds, items=None):
+        row = {"size": n, "stage": stage, "seconds": round(seconds, 6)}
+        if items:
+            row.update({"items": int(items), "per_s": round(items / seconds, 1) if seconds > 0 else None})
+        rows.append(row)
+        rate = f"  ({row['per_s']:>12,.0f} /s)" if items else ""
+        print(f"  {n:>9,d}  {stage:24s} {seconds * 1000:12.2f} ms{rate}")
+
+    record(0, "import.inference", _import_seconds())
+    cwd = os.getcwd()
+    trained = False
+    with tempfile.TemporaryDirectory() as work:
+        os.chdir(work)
+        os.makedirs("models")
+        try:
+            for n in sorted(sizes):
+                repeat = 3 if n <= 100_000 else 1
+                store = os.path.join(work, f"store_{n}")
+                with _quiet():
+                    t, _ = _timeit(lambda: write_synthetic_store(n, store), 1)
+                    cached = load_cache(os.path.join(work, "no_cache.json"), store)
+                    df = cache_to_frame(cached)
+                record(n, "synthetic_store", t, n)
+
+                t, feats = _timeit(lambda: add_basic_features(df), repeat)
+                record(n, "add_basic_features", t, len(df))
+                indices = np.arange(90, len(feats) - 5)
+                for name, fn in (("tme", build_tme_windows), ("vse", build_vse_grids),
+                                 ("gfe", build_gfe_geometries), ("engineered", build_engineered_matrix)):
+                    t, _ = _timeit(lambda: fn(feats, indices), repeat)
+                    record(n, f"windows.{name}", t, len(indices))
+                feats = None  # release before the next stage
+
+                samples = None
+                if n <= prepare_max:
+                    with _quiet():
+                        t, dataset = _timeit(lambda: prepare_dataset(cached_data=cached), 1)
+                    samples = len(dataset[4])
+                    del dataset
+                    record(n, "prepare_dataset", t, samples)
+                if n <= min(train_max, prepare_max):
+                    with _quiet():
+                        t, _ = _timeit(lambda: train_all(cached_data=cached, model_dir="models"), 1)
+                    record(n, "train_all", t, samples)
+                    trained = True
+
+                if trained:
+                    output_path = os.path.join(work, "omnispectrum.json")
+                    with _quiet():
+                        t_cold, _ = _timeit(lambda: run_inference(output_path, cached_data=cached), 1)
+                        models = load_models()
+                        warm = [_timeit(lambda: run_inference(output_path, models=models, cached_data=cached, df=df), 1)[0]
+                                for _ in range(warm_runs)]
+                    record(n, "run_inference.cold", t_cold)
+                    record(n, "run_inference.warm", float(np.median(warm)))
+        finally:
+            os.chdir(cwd)
+    return rows
+
+
+def nse_live_sequential(server, indices=None):
+    """Live quotes of every LIVE_INDICES index, one blocking request after another"""
+    from src.nse_data_fetcher import NSEDataFetcher, LIVE_INDICES
+    fetcher = NSEDataFetcher(server.api_url, server.home_url, warmup_delay=0.0)
+    quotes = {index: fetcher.get_index_live(index) for index in indices or LIVE_INDICES}
+    if not all(quotes.values()):
+        raise RuntimeError(f"{sum(q is None for q in quotes.values())} quote(s) missing")
+    return quotes
+
+
+def nse_live_async(server, indices=None, backoff_s=FETCH_BACKOFF_S):
+    """The same quotes in one AsyncNSEDataFetcher.get_indices_live gather"""
+    from src.nse_data_fetcher import AsyncNSEDataFetcher, LIVE_INDICES
+
+    async def run():
+        async with AsyncNSEDataFetcher(server.api_url, server.home_url, warmup_delay=0.0, backoff=backoff_s,
+                                       seed=0) as client:
+            return await client.get_indices_live(indices or LIVE_INDICES)
+    quotes = asyncio.run(run())
+    if not all(quotes.values()):
+        raise RuntimeError(f"{sum(q is None for q in quotes.values())} quote(s) missing")
+    return quotes
+
+
+def nse_backfill(server, cache_dir, days=None, chunk_days=None):
+    """BACKFILL_DAYS of NIFTY history through NSEDataFetcher (parallel chunks unless chunk_days > days)"""
+    from src.nse_data_fetcher import NSEDataFetcher, CHUNK_DAYS
+    fetcher = NSEDataFetcher(server.api_url, server.home_url, warmup_delay=0.0, cache_dir=cache_dir)
+    df = fetcher.get_nifty_historical(days or BACKFILL_DAYS, chunk_days=chunk_days or CHUNK_DAYS)
+    if df is None or df.empty:
+        raise RuntimeError("no history")
+    return df
+
+
+def bench_fetch(scenarios=None, backoff_s=FETCH_BACKOFF_S):
+    """
+    Wall time and request counts of each fetch client against an in-process
+    src.feed_server per fault scenario: data_fetcher.fetch_series (no planner,
+    planner, planner + concurrent) through the chart URL hook, NSEDataFetcher
+    sequential vs concurrent vs async, live quotes of LIVE_INDICES one by one vs
+    AsyncNSEDataFetcher.get_indices_live, a 10-year NSE history in one request vs
+    parallel chunks (no cache, cold, cached), and a live_data snapshot cold vs TTL-cached.
+    Retry backoff is cut to backoff_s so faulty runs measure retries, not sleeps.
+    """
+    from src import data_fetcher, live_data
+    from src.feed_server import FeedServer, FeedData
+    from src.nse_data_fetcher import NSEDataFetcher, fetch_all_nse_data
+
+    scenarios = scenarios or FETCH_SCENARIOS
+    data = FeedData.synthetic()
+    saved = (data_fetcher.CHART_URL, data_fetcher.BACKOFF_INITIAL, os.environ.get(data_fetcher.CHART_URL_ENV))
+    rows = []
+    print(f"  {'scenario':13s} {'client':10s} {'mode':18s} {'wall':>10s}  requests  5xx  429  401  status")
+    with tempfile.TemporaryDirectory() as work:
+        try:
+            for name, faults in scenarios.items():
+                with FeedServer(data, seed=0, **faults) as server:
+                    data_fetcher.CHART_URL = server.url
+                    data_fetcher.BACKOFF_INITIAL = backoff_s
+                    os.environ[data_fetcher.CHART_URL_ENV] = server.url
+                    nse = lambda concurrent, asynchronous=False: fetch_all_nse_data(
+                        os.path.join(work, "nse.json"), os.path.join(work, "store"), concurrent=concurrent,
+                        fetcher=NSEDataFetcher(server.api_url, server.home_url, warmup_delay=0.0, cache_dir=None),
+                        asynchronous=asynchronous)
+                    chunk_dir = os.path.join(work, f"chunks-{name}")
+                    backfill = lambda cache_dir: nse_backfill(server, cache_dir)
+                    runs = [
+                        ("yfinance", "no-plan", lambda: data_fetcher.fetch_series(plan=False)),
+                        ("yfinance", "plan", lambda: data_fetcher.fetch_series()),
+                        ("yfinance", "plan+concurrent", lambda: data_fetcher.fetch_series(concurrent=True)),
+                        ("nse", "sequential", lambda: nse(False)),
+                        ("nse", "concurrent", lambda: nse(True)),
+                        ("nse", "async", lambda: nse(False, True)),
+                        ("nse-live", "sequential", lambda: nse_live_sequential(server)),
+                        ("nse-live", "async", lambda: nse_live_async(server)),
+                        ("nse-10y", "single request", lambda: nse_backfill(server, None, chunk_days=BACKFILL_DAYS + 1)),
+                        ("nse-10y", "chunked", lambda: backfill(None)),
+                        ("nse-10y", "chunked, cold cache", lambda: backfill(chunk_dir)),
+                        ("nse-10y", "chunked, cached", lambda: backfill(chunk_dir)),
+                        ("live_data", "cold", lambda: (live_data._frame_cache.clear(), live_data.build_snapshot())),
+                        ("live_data", "ttl-cached", lambda: live_data.build_snapshot()),
+                    ]
+                    for client, mode, fn in runs:
+                        server.reset_stats()
+                        t0 = time.perf_counter()
+                        try:
+                            with _quiet():
+                                fn()
+                            status = "ok"
+                        except Exception as e:
+                            status = f"failed: {str(e).splitlines()[0][:40]}"
+                        wall = time.perf_counter() - t0
+                        st = server.stats()
+                        errors = sum(n for code, n in st["statuses"].items() if code.startswith("5"))
+                        row = {"scenario": name, "client": client, "mode": mode, "seconds": round(wall, 4),
+                               "requests": st["requests"], "errors_5xx": errors, "rate_limited": st["rate_limited"],
+                               "unauthorized": st["unauthorized"], "status": status}
+                        rows.append(row)
+                        print(f"  {name:13s} {client:10s} {mode:18s} {wall * 1000:8.1f} ms  {st['requests']:8d} "
+                              f"{errors:4d} {st['rate_limited']:4d} {st['unauthorized']:4d}  {status}")
+        finally:
+            data_fetcher.CHART_URL, data_fetcher.BACKOFF_INITIAL = saved[:2]
+            if saved[2] is None:
+                os.environ.pop(data_fetcher.CHART_URL_ENV, None)
+            else:
+                os.environ[data_fetcher.CHART_URL_ENV] = saved[2]
+    return rows
+
+
+def bench_ticks(rates=TICK_RATES, duration_s=TICK_DURATION_S, speed=TICK_SPEED):
+    """
+    Sustained tick throughput and tick-to-tile latency: a producer thread
+    streams ticks at each rate over a bounded queue and over loopback TCP into
+    TickPipeline (1m + 5m bars -> FeatureState -> model inputs).
+    """
+    from src.bar_aggregator import run_local
+    rows = []
+    print(f"  {'rate':>9s}  {'transport':9s} {'produced/s':>11s} {'consumed/s':>11s} {'lag ms':>7s}  "
+          f"{'tiles':>5s}  {'p50 ms':>7s} {'p99 ms':>7s} {'max ms':>7s}")
+    for rate in rates:
+        for transport in ("queue", "tcp"):
+            producer, report = run_local(rate, duration_s, ("1m", "5m"), speed, transport)
+            lat = report.get("latency_ms", {"p50": float("nan"), "p99": float("nan"), "max": float("nan")})
+            tiles = sum(report["tiles"].values())
+            rows.append({"rate": rate, "transport": transport, "producer": producer, **report})
+            print(f"  {rate:>9,d}  {transport:9s} {producer['rate']:>11,.0f} {report['ticks_per_s']:>11,.0f} "
+                  f"{producer['max_lag_ms']:7.1f}  {tiles:5d}  {lat['p50']:7.3f} {lat['p99']:7.3f} {lat['max']:7.3f}")
+    return rows
+
+
+def session_bars(n, seed=0):
+    """n 5m IST session bars (09:15-15:25, weekdays) as a market-store record array, ts in UTC ns"""
+    from src.market_store import frame_to_records
+    days = pd.bdate_range("2020-01-01", periods=-(-n // 75))
+    stamps = (days.values.astype("datetime64[ns]").astype(np.int64)[:, None]
+              + (np.arange(75) * 5 + 9 * 60 + 15 - 330) * 60 * 10**9).ravel()[:n]
+    df = random_ohlc(n, seed, volatility=0.001)
+    df.insert(0, "Date", pd.to_datetime(stamps, utc=True))
+    return frame_to_records(df)[0]
+
+
+def bench_resample(sizes=RESAMPLE_SIZES, repeat=3):
+    """
+    src.resample: one vectorized pass per timeframe vs pandas resample, and a
+    one-bar incremental update (sync and append) vs a full rebuild.
+    """
+    from src.resample import Resampler, TIMEFRAMES, resample_records, _frame
+    from src.market_store import write_market_store
+    rows = []
+    print(f"  {'bars':>9s}  {'timeframe':9s} {'out':>7s} {'vector ms':>10s} {'pandas ms':>10s} {'speedup':>8s}")
+    for n in sizes:
+        arr = session_bars(n)
+        src = _frame(arr).set_index("Date")
+        agg = {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}
+        for timeframe, minutes in TIMEFRAMES.items():
+            t_vec, (bars, _, _) = _timeit(lambda: resample_records(arr, minutes), repeat)
+            if minutes is None:
+                ref_fn = lambda: src.groupby(src.index.date).agg(agg)
+            else:
+                ref_fn = lambda: src.resample(f"{minutes}min", origin="start_day", offset="15min").agg(agg).dropna()
+            t_ref, _ = _timeit(ref_fn, repeat)
+            rows.append({"size": n, "timeframe": timeframe, "bars": len(bars), "seconds": round(t_vec, 6),
+                         "pandas_seconds": round(t_ref, 6)})
+            print(f"  {n:>9,d}  {timeframe:9s} {len(bars):>7,d} {t_vec * 1000:10.2f} {t_ref * 1000:10.2f} "
+                  f"{t_ref / t_vec:7.1f}x")
+        with tempfile.TemporaryDirectory() as store_dir:
+            def write(upto):
+                write_market_store({"nifty_5m": (_frame(arr[:upto]), {})}, store_dir=store_dir, merge=True)
+            write(n - 1)
+            Resampler(store_dir, sources=()).sync(rebuild=True)
+            write(n)
+            resampler = Resampler(store_dir, sources=())
+            t0 = time.perf_counter()
+            resampler.sync(persist=False)
+            t_sync = time.perf_counter() - t0
+            t_full, _ = _timeit(lambda: Resampler(store_dir, sources=()).sync(rebuild=True, persist=False), repeat)
+            write(n - 1)
+            resampler = Resampler(store_dir, sources=())
+            resampler.sync(persist=False)
+            t0 = time.perf_counter()
+            resampler.append(arr[n - 1:])
+            t_append = time.perf_counter() - t0
+        rows.append({"size": n, "timeframe": "update", "seconds": round(t_sync, 6), "full_seconds": round(t_full, 6),
+                     "append_seconds": round(t_append, 6)})
+        print(f"  {n:>9,d}  +1 bar: sync {t_sync * 1000:.2f} ms, append {t_append * 1000:.2f} ms, "
+              f"full rebuild {t_full * 1000:.2f} ms")
+    return rows
+
+
+def write_results(rows, path, suite="pipeline"):
+    """Results file: environment + one row per (size, stage)"""
+    import torch
+    payload = {
+        "suite": suite,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "env": {"python": platform.python_version(), "platform": platform.platform(),
+                "cpus": os.cpu_count(), "numpy": np.__version__, "pandas": pd.__version__,
+                "torch": torch.__version__},
+        "rows": rows,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2)
+    print(f"[OK] Results written: {path}")
+    return payload
+
+
+def compare_results(rows, baseline_path, tolerance=REGRESSION_TOLERANCE, min_delta=MIN_DELTA_S):
+    """
+    Compare rows with a stored results file by (size, stage). A stage regresses
+    when it is more than tolerance slower and at least min_delta seconds slower.
+    Returns the list of regressions.
+    """
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        base = {(r["size"], r["stage"]): r for r in json.load(f)["rows"]}
+    regressions = []
+    print(f"\n  vs baseline {baseline_path} (tolerance +{tolerance:.0%}, min {min_delta * 1000:.0f} ms)")
+    for row in rows:
+        ref = base.get((row["size"], row["stage"]))
+        if ref is None:
+            print(f"  {row['size']:>9,d}  {row['stage']:24s} {'(new)':>12s}")
+            continue
+        ratio = row["seconds"] / ref["seconds"] if ref["seconds"] > 0 else float("inf")
+        slower = ratio > 1 + tolerance and row["seconds"] - ref["seconds"] >= min_delta
+        flag = "REGRESSION" if slower else ("faster" if ratio < 1 - tolerance else "ok")
+        print(f"  {row['size']:>9,d}  {row['stage']:24s} {ref['seconds'] * 1000:12.2f} -> "
+              f"{row['seconds'] * 1000:12.2f} ms  x{ratio:5.2f}  {flag}")
+        if slower:
+            regressions.append({**row, "baseline_seconds": ref["seconds"], "ratio": round(ratio, 3)})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OmniSpectrum benchmarks")
+    parser.add_argument("suite", choices=["features", "state", "windows", "labels", "encoders", "memory", "pipeline", "fetch", "ticks",
+                                          "resample"],
+                        help="Benchmark suite to run")
+    parser.add_argument("--sizes", default=None, help="Comma-separated row counts (suite default if omitted)")
+    parser.add_argument("--reference-max", type=int, default=None,
+                        help="windows: largest size to also run the per-sample builders on")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--train-max", type=int, default=TRAIN_MAX, help="pipeline: largest size to train on")
+    parser.add_argument("--prepare-max", type=int, default=PREPARE_MAX, help="pipeline: largest size for prepare_dataset")
+    parser.add_argument("--output", default=RESULTS_FILE, help="pipeline: machine-readable results file")
+    parser.add_argument("--compare", default=None, metavar="BASELINE",
+                        help="pipeline: compare with a stored results file; exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE,
+                        help="pipeline: allowed slowdown vs baseline (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+    sizes = [int(x) for x in args.sizes.split(",") if x] if args.sizes else None
+
+    print("=" * 75)
+    print(f"OmniSpectrum benchmark: {args.suite}")
+    print("=" * 75)
+    if args.suite == "features":
+        bench_features(sizes or (1_000, 100_000, 1_000_000), args.repeat)
+    elif args.suite == "state":
+        bench_feature_state()
+    elif args.suite == "windows":
+        bench_windows(sizes or (10_000, 100_000), args.reference_max or 20_000)
+    elif args.suite == "labels":
+        bench_labels(sizes or (100_000, 1_000_000))
+    elif args.suite == "encoders":
+        bench_encoders(sizes or (1, 256), repeat=max(args.repeat, 20))
+    elif args.suite == "memory":
+        bench_memory(sizes or (100_000, 500_000))
+    elif args.suite == "pipeline":
+        rows = bench_pipeline(sizes or PIPELINE_SIZES, args.prepare_max, args.train_max)
+        write_results(rows, args.output)
+        if args.compare:
+            regressions = compare_results(rows, args.compare, args.tolerance)
+            if regressions:
+                print(f"[ERROR] {len(regressions)} stage(s) regressed vs {args.compare}")
+                return 1
+            print("[OK] No regressions")
+    elif args.suite == "fetch":
+        bench_fetch()
+    elif args.suite == "ticks":
+        bench_ticks(sizes or TICK_RATES)
+    elif args.suite == "resample":
+        bench_resample(sizes or RESAMPLE_SIZES, args.repeat)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
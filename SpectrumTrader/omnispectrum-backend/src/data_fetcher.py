@@ -9,16 +9,50 @@ TICKERS (canonical):
   - India VIX daily (2y): ^INDIAVIX
   - Sectors (daily 2-5y): ^NSEBANK, ^CNXIT, ^CNXPHARMA, ^CNXAUTO, ^CNXMETAL, ^CNXFMCG, ^CNXENERGY, NIFTY_FIN_SERVICE.NS
 
-Output: data/prediction_data.json (single canonical cache for train/inference)
+Output: data/market_store/ (columnar cache, see src.market_store; 15m/30m/1h/session bars via src.resample)
+        data/prediction_data.json (legacy JSON cache, kept for compatibility)
 Policy: Retries with exponential backoff; fail-fast if any series cannot be fetched
+
+Usage:
+  python -m src.data_fetcher                 # sequential
+  python -m src.data_fetcher --concurrent    # bounded worker pool, per-ticker deadlines
+  python -m src.data_fetcher --incremental   # daily series: fetch only new bars (+ overlap)
+  python -m src.data_fetcher --no-plan       # one download per series (no request merging)
+  python -m src.data_fetcher --chart-url http://127.0.0.1:8765   # chart API stand-in (src.feed_server)
+
+Request planning (default): series that share a ticker and interval are fetched
+once for the longest period and the shorter ones are sliced locally (the three
+^NSEI 5m sets come from one 3d download), and series that differ only by symbol
+go out as one multi-symbol yf.download. Symbols missing from a batch fall back
+to the per-series retry path.
+
+Incremental mode reads the last cached bar of each daily series, fetches from
+OVERLAP_DAYS before it, checks the overlapping closes against the cache and
+appends the new bars. A series is re-downloaded in full if it is not cached,
+if the overlap shows revised history, or with --full. Intraday series are
+period-relative and always fetched in full.
+
+Chart URL hook: with --chart-url (or $OMNI_CHART_URL) every download goes to
+BASE/v8/finance/chart/TICKER on that host instead of through yfinance, and
+the chart JSON is parsed into the same frame shape. Retries, deadlines,
+planning and the cache writers are unchanged, so they can be measured
+offline against python -m src.feed_server.
 """
 import os
 import time
 import json
-import traceback
-from typing import Optional, Dict
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional, Dict, Tuple
 import pandas as pd
+import requests
 import yfinance as yf
+from requests.adapters import HTTPAdapter
+from src.market_store import (
+    STORE_DIR, write_market_store, load_existing_frame, overlap_mismatch,
+    merge_series, last_bar_time, period_days
+)
 
 CACHE_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "data", "prediction_data.json")
 
@@ -48,6 +82,12 @@ TICKERS_CONFIG = {
 
 MAX_RETRIES = 5
 BACKOFF_INITIAL = 2.0  # exponential backoff (2s, 4s, 8s, 16s, 32s)
+DEFAULT_WORKERS = 6
+DEFAULT_DEADLINE_S = 120.0  # per ticker in --concurrent mode, covers all retries + backoff
+OVERLAP_DAYS = 10  # calendar days re-fetched before the last cached bar to catch revisions
+CHART_URL_ENV = "OMNI_CHART_URL"
+CHART_URL = os.environ.get(CHART_URL_ENV) or None  # chart API base URL; None = yfinance
+CHART_TIMEOUT_S = 10.0
 
 
 # VALIDATION & FETCHING HELPERS
@@ -68,75 +108,390 @@ def validate_df(df: pd.DataFrame, ticker: str, interval: str) -> bool:
         return False
     return True
 
-def fetch_ticker_yf_download(ticker: str, period: str, interval: str) -> Optional[pd.DataFrame]:
-    """Try yfinance.download (primary method)"""
+def _range_kwargs(period: str, start: Optional[str]) -> Dict:
+    return {"start": start} if start else {"period": period}
+
+def fetch_ticker_yf_download(ticker: str, period: str, interval: str, start: Optional[str] = None) -> Optional[pd.DataFrame]:
+    """Try yfinance.download (primary method); start (YYYY-MM-DD) overrides period"""
     try:
-        df = yf.download(ticker, period=period, interval=interval, progress=False, threads=False)
+        df = yf.download(ticker, interval=interval, progress=False, threads=False, **_range_kwargs(period, start))
         if isinstance(df, pd.DataFrame) and not df.empty:
             return df
     except Exception as e:
         print(f"    [WARN] yf.download({ticker}) failed: {str(e)[:80]}")
     return None
 
-def fetch_ticker_history(ticker: str, period: str, interval: str) -> Optional[pd.DataFrame]:
+def fetch_ticker_history(ticker: str, period: str, interval: str, start: Optional[str] = None) -> Optional[pd.DataFrame]:
     """Fallback: Ticker.history (alternate method)"""
     try:
         t = yf.Ticker(ticker)
-        df = t.history(period=period, interval=interval, timeout=10)
+        df = t.history(interval=interval, timeout=10, **_range_kwargs(period, start))
         if isinstance(df, pd.DataFrame) and not df.empty:
             return df
     except Exception as e:
         print(f"    [WARN] Ticker.history({ticker}) failed: {str(e)[:80]}")
     return None
 
-def robust_fetch_one(key: str, config: Dict) -> Optional[pd.DataFrame]:
+_chart_session = None
+_chart_lock = threading.Lock()
+
+def _get_chart_session() -> requests.Session:
+    global _chart_session
+    with _chart_lock:
+        if _chart_session is None:
+            _chart_session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=DEFAULT_WORKERS, pool_maxsize=DEFAULT_WORKERS * 2)
+            _chart_session.mount("http://", adapter)
+            _chart_session.mount("https://", adapter)
+        return _chart_session
+
+def chart_to_frame(payload: Dict) -> Optional[pd.DataFrame]:
+    """Chart API JSON -> OHLCV frame indexed like Ticker.history (exchange timezone)"""
+    result = (payload.get("chart") or {}).get("result") or []
+    if not result or not result[0].get("timestamp"):
+        return None
+    res = result[0]
+    meta = res.get("meta", {})
+    quote = res["indicators"]["quote"][0]
+    index = pd.to_datetime(res["timestamp"], unit="s", utc=True).tz_convert(meta.get("exchangeTimezoneName", "UTC"))
+    daily = meta.get("dataGranularity", "1d") in ("1d", "5d", "1wk", "1mo", "3mo")
+    if daily:
+        index = index.normalize()
+    df = pd.DataFrame({col.capitalize(): pd.to_numeric(pd.Series(quote.get(col)), errors="coerce").to_numpy()
+                       for col in ("open", "high", "low", "close", "volume")},
+                      index=pd.DatetimeIndex(index, name="Date" if daily else "Datetime"))
+    adjclose = res["indicators"].get("adjclose")
+    if adjclose:
+        df.insert(4, "Adj Close", pd.to_numeric(pd.Series(adjclose[0].get("adjclose")), errors="coerce").to_numpy())
+    df["Volume"] = df["Volume"].fillna(0).astype("int64")
+    return df.dropna(subset=["Open", "High", "Low", "Close"], how="all")
+
+def fetch_ticker_chart(ticker: str, period: str, interval: str, start: Optional[str] = None,
+                       base_url: Optional[str] = None) -> Optional[pd.DataFrame]:
+    """Chart API download from base_url (default CHART_URL); None on HTTP or parse errors"""
+    base_url = (base_url or CHART_URL).rstrip("/")
+    params = {"interval": interval, "includePrePost": "false", "events": "div,splits"}
+    if start:
+        params.update(period1=int(pd.Timestamp(start, tz="UTC").timestamp()), period2=int(time.time()))
+    else:
+        params["range"] = period
+    try:
+        response = _get_chart_session().get(f"{base_url}/v8/finance/chart/{ticker}", params=params,
+                                            timeout=CHART_TIMEOUT_S)
+        if response.status_code != 200:
+            print(f"    [WARN] chart({ticker}) HTTP {response.status_code}")
+            return None
+        return chart_to_frame(response.json())
+    except Exception as e:
+        print(f"    [WARN] chart({ticker}) failed: {str(e)[:80]}")
+    return None
+
+def robust_fetch_one(key: str, config: Dict, deadline: Optional[float] = None,
+                     cancel: Optional[threading.Event] = None, stats: Optional[Dict] = None,
+                     prefer_history: bool = False) -> Optional[pd.DataFrame]:
     """
     Fetch ONE series with retries + exponential backoff.
     Returns validated DataFrame or raises Exception.
+    
+    deadline: absolute time.monotonic() after which no new attempt or backoff starts.
+    cancel: event set by the concurrent driver to abort early (fail-fast).
+    stats: optional dict filled with attempt count.
+    prefer_history: try Ticker.history() before yf.download() (used by the
+        concurrent driver, since yf.download keeps results in module globals).
     """
     ticker = config["ticker"]
     period = config["period"]
     interval = config["interval"]
+    start = config.get("start")
+    span = f"from {start}" if start else period
     backoff = BACKOFF_INITIAL
     last_exc = None
+    methods = [("yf.download()", fetch_ticker_yf_download), ("Ticker.history()", fetch_ticker_history)]
+    if prefer_history:
+        methods.reverse()
+    if CHART_URL:
+        methods = [("chart API", fetch_ticker_chart)]
     
     print(f"\n  [{key}]")
     for attempt in range(1, MAX_RETRIES + 1):
+        if cancel is not None and cancel.is_set():
+            raise Exception(f"[CANCELLED] {key} ({ticker}): another series failed")
+        if deadline is not None and time.monotonic() >= deadline:
+            raise Exception(f"[FATAL] {key} ({ticker}) missed its deadline after {attempt - 1} attempts. Last error: {last_exc}")
+        if stats is not None:
+            stats["attempts"] = attempt
         try:
-            print(f"    Attempt {attempt}/{MAX_RETRIES}: {ticker} ({period}/{interval})")
-            
-            # Try method 1: download
-            df = fetch_ticker_yf_download(ticker, period, interval)
-            if validate_df(df, ticker, interval):
-                print(f"    [OK] {ticker}: {len(df)} rows via yf.download()")
-                return df
+            print(f"    [{key}] Attempt {attempt}/{MAX_RETRIES}: {ticker} ({span}/{interval})")
             
-            # Try method 2: history
-            df2 = fetch_ticker_history(ticker, period, interval)
-            if validate_df(df2, ticker, interval):
-                print(f"    [OK] {ticker}: {len(df2)} rows via Ticker.history()")
-                return df2
+            for label, method in methods:
+                df = method(ticker, period, interval, start)
+                if validate_df(df, ticker, interval):
+                    print(f"    [OK] {ticker}: {len(df)} rows via {label}")
+                    return df
             
             # Both methods failed, will retry
-            raise RuntimeError("Both yf.download() and Ticker.history() returned invalid/empty")
+            raise RuntimeError(f"{' and '.join(label for label, _ in methods)} returned invalid/empty")
             
         except Exception as exc:
             last_exc = exc
             if attempt < MAX_RETRIES:
-                print(f"    [RETRY] backing off {backoff:.0f}s (attempt {attempt}/{MAX_RETRIES})")
-                time.sleep(backoff)
+                if deadline is not None and time.monotonic() + backoff > deadline:
+                    print(f"    [ABORT] {key}: backoff {backoff:.0f}s would pass deadline")
+                    break
+                print(f"    [RETRY] {key}: backing off {backoff:.0f}s (attempt {attempt}/{MAX_RETRIES})")
+                if cancel is not None:
+                    if cancel.wait(backoff):
+                        raise Exception(f"[CANCELLED] {key} ({ticker}): another series failed")
+                else:
+                    time.sleep(backoff)
                 backoff *= 2.0
             else:
-                print(f"    [ABORT] max retries reached")
+                print(f"    [ABORT] {key}: max retries reached")
     
     # All retries exhausted
-    raise Exception(f"[FATAL] Failed to fetch {key} ({ticker}) after {MAX_RETRIES} attempts. Last error: {last_exc}")
+    raise Exception(f"[FATAL] Failed to fetch {key} ({ticker}) after {stats['attempts'] if stats else MAX_RETRIES} attempts. Last error: {last_exc}")
+
+def _timed_fetch(key: str, config: Dict, deadline_s: Optional[float], cancel: Optional[threading.Event],
+                 prefer_history: bool) -> Tuple[pd.DataFrame, Dict]:
+    """robust_fetch_one plus latency bookkeeping for the summary"""
+    stats = {"key": key, "ticker": config["ticker"], "attempts": 0,
+             "mode": "delta" if config.get("start") else "full"}
+    t0 = time.monotonic()
+    deadline = t0 + deadline_s if deadline_s else None
+    try:
+        df = robust_fetch_one(key, config, deadline=deadline, cancel=cancel, stats=stats,
+                              prefer_history=prefer_history)
+        stats.update(status="ok", rows=len(df))
+        return df, stats
+    except Exception:
+        stats["status"] = "failed"
+        raise
+    finally:
+        stats["seconds"] = time.monotonic() - t0
 
-def main():
+def fetch_all(config: Dict = TICKERS_CONFIG, concurrent: bool = False, max_workers: int = DEFAULT_WORKERS,
+              deadline_s: Optional[float] = None) -> Tuple[Dict[str, pd.DataFrame], list]:
+    """
+    Fetch every series in config. Fail-fast: the first failure aborts the run
+    (pending concurrent fetches are cancelled) so no partial cache is written.
+    Returns ({key: DataFrame}, [per-ticker stats]).
+    """
+    frames, summary = {}, []
+    if not concurrent:
+        for key, cfg in config.items():
+            try:
+                df, stats = _timed_fetch(key, cfg, deadline_s, None, prefer_history=False)
+            except Exception as e:
+                print(f"\n[FATAL] {key}: {e}")
+                raise
+            frames[key] = df
+            summary.append(stats)
+        return frames, summary
+    
+    cancel = threading.Event()
+    pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fetch")
+    futures = {pool.submit(_timed_fetch, key, cfg, deadline_s, cancel, True): key
+               for key, cfg in config.items()}
+    try:
+        for future in as_completed(futures):
+            df, stats = future.result()
+            frames[futures[future]] = df
+            summary.append(stats)
+    except Exception as e:
+        # fail fast: stop queued fetches, wake sleeping retries, don't wait for in-flight calls
+        cancel.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+        print(f"\n[FATAL] {futures[future]}: {e}")
+        raise
+    pool.shutdown()
+    
+    # keep config order for the cache / summary
+    frames = {key: frames[key] for key in config}
+    order = list(config)
+    summary.sort(key=lambda s: order.index(s["key"]))
+    return frames, summary
+
+def _session_slice(df: pd.DataFrame, period: str) -> pd.DataFrame:
+    """Last N trading sessions of an intraday frame, N from a period like '2d'"""
+    sessions = pd.DatetimeIndex(df.index).normalize()
+    keep = sessions.unique()[-period_days(period):]
+    return df[sessions.isin(keep)]
+
+def plan_requests(config: Dict) -> Tuple[Dict, list, Dict[str, Tuple[str, str]]]:
+    """
+    Group config into the fewest downloads.
+    Returns (single, batches, derived):
+      single:  {key: cfg} fetched one by one through robust_fetch_one
+      batches: [{"keys": [...], "tickers": [...], "period", "interval", "start"}]
+               symbols with the same interval/period/start, one multi-symbol call
+      derived: {key: (source_key, period)} same ticker+interval, shorter period,
+               sliced from source_key's frame
+    """
+    by_ticker = {}
+    for key, cfg in config.items():
+        by_ticker.setdefault((cfg["ticker"], cfg["interval"], cfg.get("start")), []).append(key)
+    
+    primary, derived = {}, {}
+    for keys in by_ticker.values():
+        if config[keys[0]]["interval"] == "1d":
+            # daily periods differ in history depth, not sessions; keep them separate
+            primary.update({key: config[key] for key in keys})
+            continue
+        source = max(keys, key=lambda k: period_days(config[k]["period"]) or 10**9)
+        primary[source] = config[source]
+        derived.update({key: (source, config[key]["period"]) for key in keys if key != source})
+    
+    groups = {}
+    for key, cfg in primary.items():
+        groups.setdefault((cfg["interval"], cfg["period"], cfg.get("start")), []).append(key)
+    single, batches = {}, []
+    for (interval, period, start), keys in groups.items():
+        if len(keys) == 1:
+            single[keys[0]] = primary[keys[0]]
+        else:
+            batches.append({"keys": keys, "tickers": [primary[k]["ticker"] for k in keys],
+                            "period": period, "interval": interval, "start": start})
+    return single, batches, derived
+
+def fetch_batch(batch: Dict) -> Tuple[Dict[str, pd.DataFrame], list]:
+    """
+    One multi-symbol yf.download for a batch. Returns ({key: DataFrame} for the
+    symbols that validated, [stats]); missing symbols are left to the caller.
+    """
+    t0 = time.monotonic()
+    tickers, interval, start = batch["tickers"], batch["interval"], batch["start"]
+    span = f"from {start}" if start else batch["period"]
+    print(f"\n  [batch] {len(tickers)} symbols ({span}/{interval}): {', '.join(tickers)}")
+    frames = {}
+    if CHART_URL:
+        # the chart API is one symbol per request: fetch the batch's symbols in parallel
+        with ThreadPoolExecutor(max_workers=min(len(tickers), DEFAULT_WORKERS), thread_name_prefix="chart") as pool:
+            got = pool.map(lambda t: fetch_ticker_chart(t, batch["period"], interval, start), tickers)
+            raw = {ticker: df for ticker, df in zip(tickers, got) if df is not None}
+        raw = pd.concat(raw, axis=1) if raw else None
+    else:
+        try:
+            raw = yf.download(tickers, interval=interval, group_by="ticker", progress=False, threads=True,
+                              **_range_kwargs(batch["period"], start))
+        except Exception as e:
+            print(f"    [WARN] batch yf.download failed: {str(e)[:80]}")
+            raw = None
+    for key, ticker in zip(batch["keys"], tickers):
+        if raw is None or not isinstance(raw.columns, pd.MultiIndex) or ticker not in raw.columns.get_level_values(0):
+            continue
+        df = raw[ticker].dropna(subset=["Open", "High", "Low", "Close"], how="all")
+        df.columns.name = None
+        if validate_df(df, ticker, interval):
+            frames[key] = df
+    seconds = time.monotonic() - t0
+    stats = [{"key": key, "ticker": ticker, "attempts": 1, "mode": "batch", "status": "ok",
+              "rows": len(frames[key]), "seconds": seconds}
+             for key, ticker in zip(batch["keys"], tickers) if key in frames]
+    missing = [key for key in batch["keys"] if key not in frames]
+    print(f"    [OK] {len(frames)}/{len(tickers)} symbols in {seconds:.2f}s"
+          + (f"; falling back per series for {', '.join(missing)}" if missing else ""))
+    return frames, stats
+
+def fetch_series(config: Dict = TICKERS_CONFIG, plan: bool = True, **fetch_kwargs) -> Tuple[Dict[str, pd.DataFrame], list]:
+    """
+    fetch_all with request planning: batched multi-symbol downloads first, then
+    the per-series path (retries, deadlines, fail-fast) for single requests and
+    batch misses, then locally sliced derived series. Same return as fetch_all.
+    """
+    if not plan:
+        return fetch_all(config, **fetch_kwargs)
+    single, batches, derived = plan_requests(config)
+    # a multi-symbol batch is one download call but still one HTTP request per symbol
+    n_requests = len(single) + sum(len(batch["tickers"]) for batch in batches)
+    print(f"\n[PLAN] {len(config)} series -> {len(single) + len(batches)} download batches "
+          f"({len(batches)} multi-symbol, {len(derived)} sliced locally); "
+          f"{n_requests} HTTP requests instead of {len(config)}")
+    
+    frames, summary = {}, []
+    for batch in batches:
+        got, stats = fetch_batch(batch)
+        frames.update(got)
+        summary += stats
+        single.update({key: config[key] for key in batch["keys"] if key not in got})
+    if single:
+        got, stats = fetch_all(single, **fetch_kwargs)
+        frames.update(got)
+        summary += stats
+    for key, (source, period) in derived.items():
+        frames[key] = _session_slice(frames[source], period)
+        if not validate_df(frames[key], config[key]["ticker"], config[key]["interval"]):
+            raise Exception(f"[FATAL] {key}: slice of {source} ({period}) is not a valid series")
+        summary.append({"key": key, "ticker": config[key]["ticker"], "attempts": 0, "mode": "slice",
+                        "status": "ok", "rows": len(frames[key]), "seconds": 0.0})
+    
+    frames = {key: frames[key] for key in config}
+    order = list(config)
+    summary.sort(key=lambda s: order.index(s["key"]))
+    return frames, summary
+
+def print_latency_summary(summary: list, wall_s: float):
+    print("\n" + "=" * 75)
+    print("LATENCY SUMMARY")
+    print("=" * 75)
+    for s in sorted(summary, key=lambda s: -s["seconds"]):
+        print(f"  {s['key']:15s} ({s['ticker']:20s}): {s['seconds']:6.2f}s  attempts={s['attempts']}  "
+              f"{s['mode']:5s}  rows={s.get('rows', 0)}  {s['status']}")
+    total = sum(s["seconds"] for s in summary)
+    slowest = max((s["seconds"] for s in summary), default=0.0)
+    print(f"  wall {wall_s:.2f}s | sum of tickers {total:.2f}s | slowest ticker {slowest:.2f}s")
+
+def plan_incremental(config: Dict = TICKERS_CONFIG, store_dir: str = STORE_DIR,
+                     json_path: str = CACHE_PATH) -> Tuple[Dict, Dict[str, pd.DataFrame]]:
+    """
+    Turn config into a fetch plan: daily series already in the cache get a
+    'start' date OVERLAP_DAYS before their last bar; everything else is fetched in full.
+    Returns (plan, {key: cached frame} for the delta series).
+    """
+    plan, existing = {}, {}
+    for key, cfg in config.items():
+        cached = load_existing_frame(key, store_dir, json_path) if cfg["interval"] == "1d" else None
+        if cached is None or len(cached) < 2:
+            plan[key] = cfg
+            continue
+        start = last_bar_time(cached) - pd.Timedelta(days=OVERLAP_DAYS)
+        plan[key] = {**cfg, "start": start.strftime("%Y-%m-%d")}
+        existing[key] = cached
+    return plan, existing
+
+def apply_deltas(frames: Dict[str, pd.DataFrame], existing: Dict[str, pd.DataFrame], config: Dict = TICKERS_CONFIG,
+                 **fetch_kwargs) -> Tuple[Dict[str, pd.DataFrame], list]:
+    """
+    Merge delta frames into cached history (dedup on date, new bars win).
+    Series whose overlapping closes disagree with the cache are re-downloaded in
+    full instead. Returns (frames, stats of the full re-downloads).
+    """
+    revised = {}
+    for key, cached in existing.items():
+        reason = overlap_mismatch(cached, frames[key])
+        if reason:
+            print(f"  [WARN] {key}: {reason}; re-downloading full history")
+            revised[key] = config[key]
+    full_frames, full_summary = fetch_series(revised, **fetch_kwargs) if revised else ({}, [])
+    
+    merged = {}
+    for key, df in frames.items():
+        if key in full_frames:
+            merged[key] = full_frames[key]
+        elif key in existing:
+            merged[key] = merge_series(existing[key], df, keep_days=period_days(config[key]["period"]))
+            print(f"  [OK] {key}: fetched {len(df)} bars, cache now {len(merged[key])} (was {len(existing[key])})")
+        else:
+            merged[key] = df
+    return merged, full_summary
+
+def main(concurrent: bool = False, max_workers: int = DEFAULT_WORKERS, deadline_s: Optional[float] = None,
+         incremental: bool = False, plan: bool = True):
     """
     Canonical OmniSpectrum data fetcher.
-    Fetches 13 series in sequence; fail-fast if any series cannot be fetched.
-    Writes single cache JSON: data/prediction_data.json
+    Fetches 13 series (in sequence, or concurrently with a bounded worker pool);
+    fail-fast if any series cannot be fetched. incremental=True only fetches
+    new daily bars on top of the existing cache.
+    Writes columnar store data/market_store/ and cache JSON data/prediction_data.json
     """
     print("\n" + "=" * 75)
     print("OmniSpectrum: Canonical Market Data Fetcher")
@@ -144,35 +499,51 @@ def main():
     print(f"Cache output: {CACHE_PATH}")
     print(f"Tickers to fetch: {len(TICKERS_CONFIG)}")
     print(f"Max retries per ticker: {MAX_RETRIES}")
+    if CHART_URL:
+        print(f"Chart API: {CHART_URL} (yfinance bypassed)")
+    print(f"Mode: {'concurrent (' + str(max_workers) + ' workers)' if concurrent else 'sequential'}"
+          f", per-ticker deadline: {str(deadline_s) + 's' if deadline_s else 'none'}"
+          f", refresh: {'incremental' if incremental else 'full'}, planner: {'on' if plan else 'off'}")
     print("=" * 75)
     
     # Fetch all tickers
+    fetch_kwargs = {"plan": plan, "concurrent": concurrent, "max_workers": max_workers, "deadline_s": deadline_s}
+    wall_start = time.monotonic()
+    if incremental:
+        delta_plan, existing = plan_incremental(TICKERS_CONFIG, STORE_DIR, CACHE_PATH)
+        print(f"Delta fetches: {len(existing)}/{len(delta_plan)} series (overlap {OVERLAP_DAYS}d)")
+        frames, summary = fetch_series(delta_plan, **fetch_kwargs)
+        frames, full_summary = apply_deltas(frames, existing, TICKERS_CONFIG, **fetch_kwargs)
+        summary += full_summary
+    else:
+        frames, summary = fetch_series(TICKERS_CONFIG, **fetch_kwargs)
+    wall_s = time.monotonic() - wall_start
+    
     fetched_data = {}
-    for key, config in TICKERS_CONFIG.items():
-        try:
-            df = robust_fetch_one(key, config)
-            # Convert to records for JSON serialization
-            df_reset = df.reset_index()
-            if 'Date' in df_reset.columns:
-                df_reset['Date'] = df_reset['Date'].astype(str)
-            elif 'Datetime' in df_reset.columns:
-                df_reset['Datetime'] = df_reset['Datetime'].astype(str)
-            
-            fetched_data[key] = {
-                "meta": {
-                    "ticker": config["ticker"],
-                    "period": config["period"],
-                    "interval": config["interval"],
-                    "purpose": config["purpose"]
-                },
-                "data": df_reset.to_dict(orient='records')
-            }
-        except Exception as e:
-            print(f"\n[FATAL] {key}: {e}")
-            raise
+    fetched_frames = {}
+    for key, df in frames.items():
+        config = TICKERS_CONFIG[key]
+        # Convert to records for JSON serialization (merged frames already carry a Date column)
+        df_reset = df.copy() if 'Date' in df.columns else df.reset_index()
+        if 'Date' in df_reset.columns:
+            df_reset['Date'] = df_reset['Date'].astype(str)
+        elif 'Datetime' in df_reset.columns:
+            df_reset['Datetime'] = df_reset['Datetime'].astype(str)
+        
+        meta = {
+            "ticker": config["ticker"],
+            "period": config["period"],
+            "interval": config["interval"],
+            "purpose": config["purpose"]
+        }
+        fetched_data[key] = {
+            "meta": meta,
+            "data": df_reset.to_dict(orient='records')
+        }
+        fetched_frames[key] = (df, meta)
     
     # Write canonical cache
-    print(f"\n" + "=" * 75)
+    print("\n" + "=" * 75)
     print("Writing canonical cache...")
     print("=" * 75)
     
@@ -187,10 +558,24 @@ def main():
         json.dump(cache_output, f, indent=2, default=str)
     
     print(f"[OK] Cache written: {CACHE_PATH}")
+    
+    # merge: keep the accumulated 5m history and derived timeframes (src.resample)
+    write_market_store(fetched_frames, extras={}, store_dir=STORE_DIR, source="yfinance", merge=True)
+    print(f"[OK] Market store written: {STORE_DIR}")
+    try:
+        from src.resample import Resampler
+        resampler = Resampler(STORE_DIR)
+        modes = resampler.sync()
+        print(f"[OK] Resampled {resampler.stats['source_rows']} 5m bars: "
+              + ", ".join(f"{tf} {mode}" for tf, mode in modes.items()))
+    except Exception as e:
+        print(f"[WARN] Intraday resampling skipped: {str(e).splitlines()[0]}")
     print(f"[OK] Total series fetched: {len(fetched_data)}/{len(TICKERS_CONFIG)}")
     
+    print_latency_summary(summary, wall_s)
+    
     # Summary
-    print(f"\n" + "=" * 75)
+    print("\n" + "=" * 75)
     print("FETCH SUMMARY")
     print("=" * 75)
     for key, data in fetched_data.items():
@@ -205,9 +590,19 @@ def main():
     print("=" * 75 + "\n")
 
 if __name__ == "__main__":
-    main()
-    print("\nCache ready at: data/prediction_data.json")
-    print("Next: python -m src.train\n")
-
-if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="OmniSpectrum canonical market data fetcher")
+    parser.add_argument("--concurrent", action="store_true", help="Fetch tickers in parallel (bounded pool)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Worker threads for --concurrent")
+    parser.add_argument("--deadline", type=float, default=None,
+                        help=f"Per-ticker deadline in seconds, 0 = none (default: {DEFAULT_DEADLINE_S:.0f} with --concurrent, none otherwise)")
+    parser.add_argument("--incremental", action="store_true",
+                        help=f"Fetch only new daily bars (+{OVERLAP_DAYS}d overlap) and append to the cache")
+    parser.add_argument("--no-plan", action="store_true",
+                        help="Disable request planning (one download per series)")
+    parser.add_argument("--chart-url", default=CHART_URL,
+                        help=f"Fetch from a chart API at this base URL instead of yfinance (default: ${CHART_URL_ENV})")
+    args = parser.parse_args()
+    CHART_URL = args.chart_url or None
+    deadline = args.deadline if args.deadline is not None else (DEFAULT_DEADLINE_S if args.concurrent else None)
+    main(concurrent=args.concurrent, max_workers=args.workers, deadline_s=deadline or None,
+         incremental=args.incremental, plan=not args.no_plan)
@@ -0,0 +1,100 @@
+"""
+OmniSpectrum: Fused Encoder Bundle
+==================================
+TME_LSTM, VSE_CNN and the GFE_AE encoder as one module that takes all three
+inputs and returns the concatenated embedding (tme 32 + vse 32 + gfe 16 = 80).
+
+train_all exports it as a frozen TorchScript graph (models/encoders_bundle.pt),
+so inference deserializes one artifact and runs one call instead of three
+state-dict loads and three eager forward passes. If the bundle is missing or
+older than the state dicts it was built from, load_encoders falls back to the
+eager modules wrapped in the same EncoderBundle interface.
+"""
+import os
+import numpy as np
+import torch
+import torch.nn as nn
+
+BUNDLE_FILE = "encoders_bundle.pt"
+STATE_FILES = ["tme_lstm.pt", "vse_cnn.pt", "gfe_ae.pt"]
+EXPORT_ATOL = 1e-5
+TME_DIM, VSE_DIM, GFE_DIM = 32, 32, 16
+GFE_SLICE = slice(TME_DIM + VSE_DIM, TME_DIM + VSE_DIM + GFE_DIM)
+
+
+class EncoderBundle(nn.Module):
+    def __init__(self, tme, vse, gfe):
+        super().__init__()
+        self.tme = tme
+        self.vse = vse
+        self.gfe_enc = gfe.enc
+
+    def forward(self, tme_x, vse_x, gfe_x):
+        return torch.cat([self.tme(tme_x), self.vse(vse_x), self.gfe_enc(gfe_x)], dim=1)
+
+
+def encoder_inputs(tme_in, vse_in, gfe_in):
+    """
+    Batched numpy windows -> float32 tensors in model layout.
+    tme (N, 90, 4), vse (N, H, W, C) -> (N, 1, H, W) first channel, gfe (N, 20).
+    """
+    vse = np.ascontiguousarray(np.asarray(vse_in)[..., 0:1].transpose(0, 3, 1, 2))
+    return (torch.as_tensor(np.asarray(tme_in), dtype=torch.float32),
+            torch.as_tensor(vse, dtype=torch.float32),
+            torch.as_tensor(np.asarray(gfe_in), dtype=torch.float32))
+
+
+def encode(encoder, tme_in, vse_in, gfe_in):
+    """(N, 80) embedding matrix for batched windows with either bundle flavour"""
+    with torch.no_grad():
+        return encoder(*encoder_inputs(tme_in, vse_in, gfe_in)).numpy()
+
+
+def load_eager_encoders(model_dir="models"):
+    from src.train import TME_LSTM, VSE_CNN, GFE_AE
+    modules = []
+    for cls, name in zip((TME_LSTM, VSE_CNN, GFE_AE), STATE_FILES):
+        m = cls()
+        m.load_state_dict(torch.load(os.path.join(model_dir, name), map_location="cpu"))
+        modules.append(m.eval())
+    return EncoderBundle(*modules).eval()
+
+
+def bundle_is_fresh(model_dir="models"):
+    """Bundle exists and is not older than any state dict it was built from"""
+    path = os.path.join(model_dir, BUNDLE_FILE)
+    if not os.path.exists(path):
+        return False
+    built = os.path.getmtime(path)
+    return all(not os.path.exists(os.path.join(model_dir, name)) or os.path.getmtime(os.path.join(model_dir, name)) <= built
+               for name in STATE_FILES)
+
+
+def load_encoders(model_dir="models", use_bundle=True):
+    """Scripted bundle if present and fresh, else eager modules. Returns (encoder, kind)."""
+    if use_bundle and bundle_is_fresh(model_dir):
+        try:
+            return torch.jit.load(os.path.join(model_dir, BUNDLE_FILE), map_location="cpu"), "bundle"
+        except Exception as e:
+            print(f"[WARN] Encoder bundle not loaded, using eager modules: {e}")
+    return load_eager_encoders(model_dir), "eager"
+
+
+def export_bundle(tme, vse, gfe, example_inputs, model_dir="models"):
+    """
+    Trace + freeze the three encoders into models/encoders_bundle.pt.
+    example_inputs: batched numpy windows (tme, vse, gfe) used for tracing and
+    for a parity check against the eager modules before the file is written.
+    """
+    bundle = EncoderBundle(tme, vse, gfe).eval()
+    example = encoder_inputs(*example_inputs)
+    with torch.no_grad():
+        scripted = torch.jit.freeze(torch.jit.trace(bundle, example))
+        for batch in (example, tuple(x[:1] for x in example)):
+            if not torch.allclose(scripted(*batch), bundle(*batch), atol=EXPORT_ATOL):
+                raise Exception("[ERROR] Encoder bundle output differs from eager encoders")
+    path = os.path.join(model_dir, BUNDLE_FILE)
+    tmp = path + ".tmp"
+    torch.jit.save(scripted, tmp)
+    os.replace(tmp, path)
+    return path
@@ -0,0 +1,240 @@
+"""
+OmniSpectrum: Streaming Feature State
+=====================================
+Incremental, O(1)-per-bar version of add_basic_features for intraday refreshes.
+
+Seed once from history (one vectorized add_basic_features pass), then feed new
+OHLC bars. Each update adjusts running sums for the rolling windows, steps the
+EMAs and appends to fixed-size ring buffers; nothing is recomputed over history.
+The state also keeps the trailing rows that build_tme_window (90),
+build_vse_grid (60) and build_gfe_geometry (20) read, so model inputs for the
+latest bar come straight from memory.
+
+A bar can be fed as provisional (e.g. today's still-forming daily candle): the
+next update rolls it back first, so repeated intraday refreshes revise the
+last bar instead of appending a new one each time.
+"""
+import numpy as np
+from src.features import (
+    RV_WINDOWS, EPS, TME_COLUMNS, add_basic_features, _ema,
+    tme_window_from_rows, vse_grid_from_rows, gfe_geometry_from_closes
+)
+
+ANNUALIZE = np.sqrt(252)
+RESYNC_EVERY = 1024  # recompute running sums from buffers to cancel float drift
+
+
+class _Ring:
+    """Fixed-capacity ring buffer of rows backed by one NumPy array"""
+
+    def __init__(self, capacity, width=None):
+        shape = (capacity,) if width is None else (capacity, width)
+        self.buf = np.zeros(shape)
+        self.capacity = capacity
+        self.head = 0  # next write position
+        self.size = 0
+
+    def ago(self, k):
+        """k-th most recent row (k=1 is the newest)"""
+        return self.buf[(self.head - k) % self.capacity]
+
+    def append(self, row):
+        self.buf[self.head] = row
+        self.head = (self.head + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def last(self, n):
+        """Most recent n rows in chronological order (copy)"""
+        n = min(n, self.size)
+        idx = (self.head - n + np.arange(n)) % self.capacity
+        return self.buf[idx]
+
+    def copy(self):
+        other = _Ring.__new__(_Ring)
+        other.buf = self.buf.copy()
+        other.capacity, other.head, other.size = self.capacity, self.head, self.size
+        return other
+
+
+class FeatureState:
+    def __init__(self, tme_window=90, vse_window=60, gfe_window=20):
+        self.tme_len = tme_window
+        self.vse_len = vse_window
+        self.gfe_len = gfe_window
+        self.max_rv = max(RV_WINDOWS)
+        self.alpha_8 = 2.0 / (8 + 1.0)
+        self.alpha_21 = 2.0 / (21 + 1.0)
+
+        # raw-bar state (includes warm-up bars dropped by add_basic_features)
+        self.returns = _Ring(self.max_rv)
+        self.ranges = _Ring(10)
+        self.ret_sum = {w: 0.0 for w in RV_WINDOWS}
+        self.ret_sumsq = {w: 0.0 for w in RV_WINDOWS}
+        self.range_sum = 0.0
+        self.prev_close = None
+        self.ema_8 = None
+        self.ema_21 = None
+        self.bars = 0
+        self._since_resync = 0
+
+        # trailing windows of valid (post-dropna) rows
+        self.tme_rows = _Ring(tme_window, len(TME_COLUMNS))
+        self.vse_rows = _Ring(vse_window, 2)
+        self.closes = _Ring(gfe_window)
+        self.features = None
+        self._provisional = None
+
+    # ------------------------------------------------------------------ seeding
+    @classmethod
+    def from_history(cls, df, **kwargs):
+        """Seed from an OHLCV DataFrame (one vectorized pass over history)"""
+        state = cls(**kwargs)
+        close = df['Close'].to_numpy(dtype=np.float64)
+        high = df['High'].to_numpy(dtype=np.float64)
+        low = df['Low'].to_numpy(dtype=np.float64)
+        if len(close) == 0:
+            return state
+        if np.isnan(close).any():
+            raise Exception("[ERROR] FeatureState requires NaN-free Close history")
+
+        ret = np.zeros(len(close))
+        ret[1:] = close[1:] / close[:-1] - 1.0
+        rng = (high - low) / (close + EPS)
+        for r in ret[-state.max_rv:]:
+            state.returns.append(r)
+        for x in rng[-10:]:
+            state.ranges.append(x)
+        state.prev_close = close[-1]
+        state.ema_8 = _ema(close, 8)[-1]
+        state.ema_21 = _ema(close, 21)[-1]
+        state.bars = len(close)
+        state._resync()
+
+        feats = add_basic_features(df)
+        if len(feats):
+            for row in feats[TME_COLUMNS].to_numpy()[-state.tme_len:]:
+                state.tme_rows.append(row)
+            for row in feats[['Return', 'range']].to_numpy()[-state.vse_len:]:
+                state.vse_rows.append(row)
+            for c in feats['Close'].to_numpy()[-state.gfe_len:]:
+                state.closes.append(c)
+            last = feats.iloc[-1]
+            state.features = {name: float(last[name]) for name in feats.columns if name != 'Volume'}
+        return state
+
+    def _resync(self):
+        """Recompute running sums exactly from the ring buffers"""
+        for w in RV_WINDOWS:
+            window = self.returns.last(w)
+            self.ret_sum[w] = float(window.sum())
+            self.ret_sumsq[w] = float((window * window).sum())
+        self.range_sum = float(self.ranges.last(10).sum())
+        self._since_resync = 0
+
+    # ------------------------------------------------------------------ updates
+    def _snapshot(self):
+        return {
+            "returns": self.returns.copy(), "ranges": self.ranges.copy(),
+            "ret_sum": dict(self.ret_sum), "ret_sumsq": dict(self.ret_sumsq),
+            "range_sum": self.range_sum, "prev_close": self.prev_close,
+            "ema_8": self.ema_8, "ema_21": self.ema_21, "bars": self.bars,
+            "tme_rows": self.tme_rows.copy(), "vse_rows": self.vse_rows.copy(),
+            "closes": self.closes.copy(), "features": self.features,
+            "_since_resync": self._since_resync,
+        }
+
+    def _restore(self, snap):
+        for key, value in snap.items():
+            setattr(self, key, value)
+
+    def update(self, open_, high, low, close, volume=0, provisional=False):
+        """
+        Feed one OHLC bar; returns the feature row for it (or None while warming up).
+        provisional=True marks the bar as still forming: the next update replaces it.
+        """
+        if self._provisional is not None:
+            self._restore(self._provisional)
+            self._provisional = None
+        if provisional:
+            self._provisional = self._snapshot()
+
+        close = float(close)
+        ret = 0.0 if self.prev_close is None else close / self.prev_close - 1.0
+        rng = (float(high) - float(low)) / (close + EPS)
+
+        # rolling windows: drop the value leaving each window, add the new one
+        n_ret = self.returns.size
+        for w in RV_WINDOWS:
+            if n_ret >= w:
+                old = self.returns.ago(w)
+                self.ret_sum[w] += ret - old
+                self.ret_sumsq[w] += ret * ret - old * old
+            else:
+                self.ret_sum[w] += ret
+                self.ret_sumsq[w] += ret * ret
+        self.returns.append(ret)
+        if self.ranges.size >= 10:
+            self.range_sum += rng - self.ranges.ago(10)
+        else:
+            self.range_sum += rng
+        self.ranges.append(rng)
+
+        self.ema_8 = close if self.ema_8 is None else self.alpha_8 * close + (1 - self.alpha_8) * self.ema_8
+        self.ema_21 = close if self.ema_21 is None else self.alpha_21 * close + (1 - self.alpha_21) * self.ema_21
+        self.prev_close = close
+        self.bars += 1
+        self._since_resync += 1
+        if self._since_resync >= RESYNC_EVERY:
+            self._resync()
+
+        if self.bars < self.max_rv:
+            return None
+
+        std = {}
+        for w in RV_WINDOWS:
+            s1, s2 = self.ret_sum[w], self.ret_sumsq[w]
+            std[w] = np.sqrt(max((s2 - s1 * s1 / w) / (w - 1), 0.0))
+        mean_20 = self.ret_sum[20] / 20
+        ema_slope = (self.ema_8 - self.ema_21) / (self.ema_21 + EPS)
+        feats = {
+            "Open": float(open_), "High": float(high), "Low": float(low), "Close": close,
+            "Return": ret,
+            **{f"rv_{w}": std[w] * ANNUALIZE for w in RV_WINDOWS},
+            "ema_8": self.ema_8, "ema_21": self.ema_21, "ema_slope": ema_slope,
+            "range": rng, "range_10": self.range_sum / 10,
+            "rv_ratio_10_60": std[10] * ANNUALIZE / (std[60] * ANNUALIZE + EPS),
+            "ret_z_20": (ret - mean_20) / (std[20] + EPS),
+        }
+
+        self.tme_rows.append([feats[c] for c in TME_COLUMNS])
+        self.vse_rows.append([ret, rng])
+        self.closes.append(close)
+        self.features = feats
+        return feats
+
+    # ------------------------------------------------------------------ model inputs
+    def tme_window(self):
+        return tme_window_from_rows(self.tme_rows.last(self.tme_len), self.tme_len)
+
+    def vse_grid(self):
+        return vse_grid_from_rows(self.vse_rows.last(self.vse_len))
+
+    def gfe_geometry(self):
+        return gfe_geometry_from_closes(self.closes.last(self.gfe_len))
+
+    def engineered_features(self):
+        f = self.features
+        return {
+            "close": float(f['Close']),
+            "rv_10": float(f['rv_10']),
+            "rv_20": float(f['rv_20']),
+            "range_10": float(f['range_10']),
+            "ema_slope": float(f['ema_slope']),
+            "ret_z_20": float(f['ret_z_20']),
+        }
+
+    def model_inputs(self):
+        """(tme_in, vse_in, gfe_in, eng) for the latest bar, same as the build_* helpers"""
+        if self.features is None:
+            raise Exception(f"[ERROR] FeatureState warming up: {self.bars} bars (need ≥{self.max_rv})")
+        return self.tme_window(), self.vse_grid(), self.gfe_geometry(), self.engineered_features()
@@ -1,36 +1,76 @@
 """
 Production-grade feature engineering for OmniSpectrum models.
-CRITICAL: Loads data ONLY from cache (data/prediction_data.json).
-No yfinance downloads. Cache-first, fail-fast pattern.
+CRITICAL: Loads data ONLY from cache (data/market_store/, falling back to
+data/prediction_data.json). No yfinance downloads. Cache-first, fail-fast pattern.
 """
 import json
 import os
 import pandas as pd
 import numpy as np
-from scipy.stats import zscore
-from pathlib import Path
+from scipy.signal import lfilter
+from src.market_store import STORE_DIR, MANIFEST, store_exists, read_manifest, load_series_frame
 
 CACHE_FILE = os.path.join(os.path.dirname(__file__), "..", "..", "data", "prediction_data.json")
 
-def load_cached_market_data(cache_file=CACHE_FILE):
+def load_cache(cache_file=CACHE_FILE, store_dir=STORE_DIR):
     """
-    Load market data from validated cache file.
-    Raises Exception if cache not found or invalid.
-    This enforces live-only operation: users must run data_fetcher first.
+    Load the market cache payload.
+    Prefers the columnar store (memory-mapped, see src.market_store) unless the
+    JSON cache is newer; the returned payload then carries 'store_dir' plus the
+    live extras (spot, vix, niftyOhlc, vixOhlc) instead of raw series rows.
     """
+    if store_exists(store_dir):
+        manifest_path = os.path.join(store_dir, MANIFEST)
+        if not os.path.exists(cache_file) or os.path.getmtime(manifest_path) >= os.path.getmtime(cache_file):
+            manifest = read_manifest(store_dir)
+            payload = dict(manifest.get("extras", {}))
+            payload["store_dir"] = store_dir
+            payload["manifest"] = manifest
+            return payload
+        print("[WARN] JSON cache is newer than market store; reading JSON (run 'python -m src.market_store' to convert)")
+    
     if not os.path.exists(cache_file):
         raise Exception(f"[ERROR] Cache not found: {cache_file}\nRun 'python -m src.data_fetcher' first to fetch live data")
     
     try:
         with open(cache_file, "r") as f:
-            payload = json.load(f)
+            return json.load(f)
     except json.JSONDecodeError as e:
         raise Exception(f"[ERROR] Invalid JSON in cache: {e}")
+
+def cache_to_frame(cached_data, key="nifty_daily", with_dates=False):
+    """Build an OHLCV DataFrame for one series from a cache payload (leading Date column if with_dates)"""
+    if "store_dir" in cached_data:
+        df = load_series_frame(key, cached_data["store_dir"], manifest=cached_data.get("manifest"),
+                               with_dates=with_dates)
+        print(f"[OK] Loaded {len(df)} days of market data")
+        return df
+    
+    dates = None
+    
+    # Handle both canonical (yfinance) and synthetic (generated) cache formats
+    if "series" in cached_data:
+        # Synthetic/new format with series.<key>.data
+        rows = cached_data["series"][key]["data"]
+        if with_dates and rows and "Date" in rows[0]:
+            dates = pd.to_datetime([row["Date"] for row in rows])
+        # Convert list of dicts to OHLCV dict structure
+        ohlc = {
+            "open": [row["Open"] for row in rows],
+            "high": [row["High"] for row in rows],
+            "low": [row["Low"] for row in rows],
+            "close": [row["Close"] for row in rows],
+            "volume": [row.get("Volume", 0) for row in rows]
+        }
+    else:
+        # Legacy/canonical format with direct ohlc dict
+        ohlc = cached_data.get("ohlc", {})
     
-    ohlc = payload.get("ohlc", {})
     if not ohlc or "close" not in ohlc or len(ohlc.get("close", [])) == 0:
         raise Exception("[ERROR] Cache invalid: missing or empty OHLC data")
     
+    print(f"[OK] Loaded {len(ohlc['close'])} days of market data")
+    
     # Reconstruct DataFrame from cache
     df = pd.DataFrame({
         "Open": ohlc.get("open", []),
@@ -39,6 +79,26 @@ def load_cached_market_data(cache_file=CACHE_FILE):
         "Close": ohlc.get("close", []),
         "Volume": ohlc.get("volume", [])
     })
+    if with_dates:
+        if dates is None:
+            raise Exception(f"[ERROR] Cache series '{key}' has no dates")
+        df.insert(0, "Date", dates)
+    return df
+
+def load_history(cached_data=None, key="nifty_daily"):
+    """(add_basic_features frame with a fresh RangeIndex, bar dates aligned with its rows)"""
+    raw = cache_to_frame(cached_data if cached_data is not None else load_cache(), key, with_dates=True)
+    dates = pd.DatetimeIndex(raw.pop("Date"))
+    feats = add_basic_features(raw)
+    return feats.reset_index(drop=True), dates[feats.index.to_numpy()]
+
+def load_cached_market_data(cache_file=CACHE_FILE):
+    """
+    Load market data from validated cache file.
+    Raises Exception if cache not found or invalid.
+    This enforces live-only operation: users must run data_fetcher first.
+    """
+    df = cache_to_frame(load_cache(cache_file))
     
     if len(df) < 100:
         raise Exception(f"[ERROR] Insufficient cached data: {len(df)} days (need ≥100)")
@@ -66,54 +126,114 @@ def download_nifty(period="2y", interval="1d"):
             raise
         raise Exception(f"[ERROR] Failed to load NIFTY: {e}")
 
+RV_WINDOWS = (5, 10, 20, 60)
+EPS = 1e-9
+
+def _rolling_sum(x, w):
+    """Trailing window sum; first w-1 entries are NaN"""
+    out = np.full(len(x), np.nan)
+    if len(x) >= w:
+        c = np.concatenate(([0.0], np.cumsum(x)))
+        out[w - 1:] = c[w:] - c[:-w]
+    return out
+
+def _rolling_mean_std(x, w):
+    """
+    Trailing rolling mean and sample std (ddof=1) from cumulative sums.
+    Values are centred first so the sum-of-squares form keeps its precision;
+    any window containing a NaN yields NaN (pandas min_periods=w semantics).
+    """
+    valid = np.isfinite(x)
+    shift = x[valid].mean() if valid.any() else 0.0
+    d = np.where(valid, x - shift, 0.0)
+    s1 = _rolling_sum(d, w)
+    s2 = _rolling_sum(d * d, w)
+    mean = s1 / w + shift
+    var = np.maximum((s2 - s1 * s1 / w) / (w - 1), 0.0)
+    std = np.sqrt(var)
+    if not valid.all():
+        bad = _rolling_sum((~valid).astype(np.float64), w) > 0
+        mean[bad] = np.nan
+        std[bad] = np.nan
+    return mean, std
+
+def _ema(x, span):
+    """ewm(span, adjust=False).mean() as a first-order IIR filter"""
+    if np.isnan(x).any():
+        return pd.Series(x).ewm(span=span, adjust=False).mean().to_numpy()
+    alpha = 2.0 / (span + 1.0)
+    if len(x) == 0:
+        return x.copy()
+    y, _ = lfilter([alpha], [1.0, alpha - 1.0], x, zi=[(1.0 - alpha) * x[0]])
+    return y
+
 def add_basic_features(df):
-    """Add technical indicators required by model heads"""
-    df = df.copy()
+    """
+    Add technical indicators required by model heads.
+    Vectorized kernel: every column comes from NumPy rolling sums / IIR
+    filters in one pass; the only frame allocated is the (dropna'd) result.
+    Matches the original pandas implementation to float rounding
+    (tests/test_features.py).
+    """
+    close = df['Close'].to_numpy(dtype=np.float64)
+    high = df['High'].to_numpy(dtype=np.float64)
+    low = df['Low'].to_numpy(dtype=np.float64)
+    n = len(close)
     
-    # Return series
-    df['Return'] = df['Close'].pct_change().fillna(0)
+    # Return series (pct_change pads missing closes, first bar 0)
+    filled = pd.Series(close).ffill().to_numpy() if np.isnan(close).any() else close
+    ret = np.zeros(n)
+    if n > 1:
+        ret[1:] = filled[1:] / filled[:-1] - 1.0
+    ret = np.nan_to_num(ret, nan=0.0)
     
-    # Realized Volatility (multiple windows)
-    for w in [5, 10, 20, 60]:
-        df[f"rv_{w}"] = df['Return'].rolling(w).std() * np.sqrt(252)
+    feats = {'Return': ret}
+    
+    # Realized Volatility (multiple windows); 20-bar stats reused for the z-score
+    for w in RV_WINDOWS:
+        mean_w, std_w = _rolling_mean_std(ret, w)
+        feats[f"rv_{w}"] = std_w * np.sqrt(252)
+        if w == 20:
+            mean_20, std_20 = mean_w, std_w
     
     # Exponential Moving Averages
-    df['ema_8'] = df['Close'].ewm(span=8, adjust=False).mean()
-    df['ema_21'] = df['Close'].ewm(span=21, adjust=False).mean()
-    df['ema_slope'] = (df['ema_8'] - df['ema_21']) / (df['ema_21'] + 1e-9)
+    feats['ema_8'] = _ema(close, 8)
+    feats['ema_21'] = _ema(close, 21)
+    feats['ema_slope'] = (feats['ema_8'] - feats['ema_21']) / (feats['ema_21'] + EPS)
     
     # Range metrics
-    df['range'] = (df['High'] - df['Low']) / (df['Close'] + 1e-9)
-    df['range_10'] = df['range'].rolling(10).mean()
+    feats['range'] = (high - low) / (close + EPS)
+    feats['range_10'], _ = _rolling_mean_std(feats['range'], 10)
     
     # Volatility ratio
-    df['rv_ratio_10_60'] = df['rv_10'] / (df['rv_60'] + 1e-9)
+    feats['rv_ratio_10_60'] = feats['rv_10'] / (feats['rv_60'] + EPS)
     
     # Z-score of returns
-    df['ret_z_20'] = df['Return'].rolling(20).apply(
-        lambda x: (x.iloc[-1] - x.mean()) / (x.std() + 1e-9) if len(x) > 1 else 0
-    )
+    feats['ret_z_20'] = (ret - mean_20) / (std_20 + EPS)
     
-    # Remove NaN rows
-    df = df.dropna()
-    return df
-
-def build_tme_window(df, end_idx, window=90):
-    """Build temporal window for LSTM model"""
-    start = max(0, end_idx - window + 1)
-    mat = df.iloc[start:end_idx+1][['Return', 'rv_10', 'rv_20', 'ema_slope']].values
+    # Remove NaN rows (same rule as dropna over input + feature columns)
+    keep = df.notna().all(axis=1).to_numpy().copy()
+    for col in feats.values():
+        keep &= ~np.isnan(col)
     
+    out = {col: df[col].to_numpy()[keep] for col in df.columns if col not in feats}
+    out.update({name: col[keep] for name, col in feats.items()})
+    return pd.DataFrame(out, index=df.index[keep])
+
+TME_COLUMNS = ['Return', 'rv_10', 'rv_20', 'ema_slope']
+VSE_COLUMNS = ['Return', 'range']
+ENG_COLUMNS = ['Close', 'rv_10', 'rv_20', 'range_10', 'ema_slope', 'ret_z_20']
+WINDOW_CHUNK = 16384  # samples per gather block in the batched window builders
+
+def tme_window_from_rows(mat, window=90):
+    """Front zero-pad trailing TME rows (n, 4) to (window, 4)"""
     if len(mat) < window:
-        pad = np.zeros((window - len(mat), 4))
+        pad = np.zeros((window - len(mat), mat.shape[1]))
         mat = np.vstack([pad, mat])
-    
     return mat.astype(np.float32)
 
-def build_vse_grid(df, end_idx, window=60):
-    """Build volatility surface grid for CNN model"""
-    start = max(0, end_idx - window + 1)
-    sub = df.iloc[start:end_idx+1]
-    arr = np.vstack([sub['Return'].values, sub['range'].values]).T
+def vse_grid_from_rows(arr):
+    """Trailing (Return, range) rows -> (8, 8, 1) VSE grid"""
     flat = arr.flatten()
     
     if len(flat) < 512:
@@ -124,11 +244,9 @@ def build_vse_grid(df, end_idx, window=60):
     grid = flat.reshape(8, 8, 8)[:, :, :1]
     return grid.astype(np.float32)
 
-def build_gfe_geometry(df, end_idx, window=20):
-    """Build geometric features for autoencoder"""
-    start = max(0, end_idx - window + 1)
-    sub = df.iloc[start:end_idx+1]
-    d = np.diff(sub['Close'].values)
+def gfe_geometry_from_closes(closes):
+    """Trailing closes -> 20 tick angles, zero-padded at the end"""
+    d = np.diff(closes)
     angles = np.arctan2(d, 1.0)
     
     arr = np.zeros(20, dtype=np.float32)
@@ -138,6 +256,25 @@ def build_gfe_geometry(df, end_idx, window=20):
     
     return arr
 
+def build_tme_window(df, end_idx, window=90):
+    """Build temporal window for LSTM model"""
+    start = max(0, end_idx - window + 1)
+    mat = df.iloc[start:end_idx+1][TME_COLUMNS].values
+    return tme_window_from_rows(mat, window)
+
+def build_vse_grid(df, end_idx, window=60):
+    """Build volatility surface grid for CNN model"""
+    start = max(0, end_idx - window + 1)
+    sub = df.iloc[start:end_idx+1]
+    arr = np.vstack([sub['Return'].values, sub['range'].values]).T
+    return vse_grid_from_rows(arr)
+
+def build_gfe_geometry(df, end_idx, window=20):
+    """Build geometric features for autoencoder"""
+    start = max(0, end_idx - window + 1)
+    sub = df.iloc[start:end_idx+1]
+    return gfe_geometry_from_closes(sub['Close'].values)
+
 def build_engineered_features(df, end_idx):
     """Build dictionary of scalar engineered features"""
     row = df.iloc[end_idx]
@@ -150,3 +287,57 @@ def build_engineered_features(df, end_idx):
         "ret_z_20": float(row['ret_z_20']),
     }
 
+def build_tme_windows(df, indices, window=90):
+    """
+    Batched build_tme_window: (N, window, 4) float32 for every end index.
+    Strided (n, window, 4) view over a front-zero-padded float32 copy of the
+    4 columns; fancy indexing materializes only the selected windows, directly
+    in output layout (no float64 or transposed intermediate).
+    """
+    indices = np.asarray(indices, dtype=np.int64)
+    mat = df[TME_COLUMNS].to_numpy(dtype=np.float32)
+    padded = np.vstack([np.zeros((window - 1, mat.shape[1]), dtype=np.float32), mat])
+    view = np.lib.stride_tricks.sliding_window_view(padded, window, axis=0)  # (n, 4, window)
+    return view.transpose(0, 2, 1)[indices]
+
+def build_vse_grids(df, indices, window=60):
+    """
+    Batched build_vse_grid: (N, 8, 8, 1) float32.
+    The grid keeps every 8th value of the flattened (Return, range) window,
+    so only those 64 positions are gathered per sample. Gathers run in
+    WINDOW_CHUNK blocks so index temporaries stay bounded.
+    """
+    indices = np.asarray(indices, dtype=np.int64)
+    arr = df[VSE_COLUMNS].to_numpy(dtype=np.float64)
+    pos = np.arange(64) * 8                      # flat positions kept by reshape(8,8,8)[:,:,:1]
+    rows, cols = pos // 2, pos % 2
+    out = np.empty((len(indices), 64), dtype=np.float32)
+    for lo in range(0, len(indices), WINDOW_CHUNK):
+        idx = indices[lo:lo + WINDOW_CHUNK]
+        start = np.maximum(0, idx - window + 1)
+        length = idx - start + 1
+        valid = pos[None, :] < np.minimum(2 * length, 512)[:, None]
+        src_rows = np.minimum(start[:, None] + rows[None, :], len(arr) - 1)
+        out[lo:lo + len(idx)] = np.where(valid, arr[src_rows, cols[None, :]], 0.0)
+    return out.reshape(len(indices), 8, 8, 1)
+
+def build_gfe_geometries(df, indices, window=20):
+    """Batched build_gfe_geometry: (N, 20) float32 of tick angles, zero-padded at the end (chunked gathers)"""
+    indices = np.asarray(indices, dtype=np.int64)
+    angles = np.arctan2(np.diff(df['Close'].to_numpy(dtype=np.float64)), 1.0)
+    if len(angles) == 0:
+        return np.zeros((len(indices), 20), dtype=np.float32)
+    j = np.arange(20)
+    out = np.empty((len(indices), 20), dtype=np.float32)
+    for lo in range(0, len(indices), WINDOW_CHUNK):
+        idx = indices[lo:lo + WINDOW_CHUNK]
+        start = np.maximum(0, idx - window + 1)
+        n_angles = np.minimum(idx - start, 20)
+        valid = j[None, :] < n_angles[:, None]
+        src = np.minimum(start[:, None] + j[None, :], len(angles) - 1)
+        out[lo:lo + len(idx)] = np.where(valid, angles[src], 0.0)
+    return out
+
+def build_engineered_matrix(df, indices):
+    """Batched build_engineered_features: (N, 6) in the dict's key order"""
+    return df[ENG_COLUMNS].to_numpy(dtype=np.float64)[np.asarray(indices, dtype=np.int64)]
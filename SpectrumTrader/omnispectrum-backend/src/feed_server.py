@@ -0,0 +1,519 @@
+"""
+OmniSpectrum: Local Market Feed Stand-in
+========================================
+An HTTP server that answers the requests the fetchers make, in the shapes the
+real endpoints return, so fetch performance (concurrency, retry/backoff,
+cookie and snapshot caching) can be measured offline and reproducibly.
+
+Routes:
+  /                                     NSE homepage; sets the nsit / bm_sv cookies
+  /api/equity-stockIndices?index=...    NSE live index quote (NIFTY 50, INDIA VIX, sectors)
+  /api/historical/indicesHistory?...    NSE daily OHLC (indexType, from, to as dd-mm-YYYY)
+  /v8/finance/chart/TICKER?...          chart-style OHLC (range= or period1=/period2=, interval=)
+  /__stats                              request / status / injected-fault counters
+  /__config?latency_ms=50&...           read or change the fault knobs while running
+
+Data is replayed from the market store / JSON cache (--source store) or
+generated with src.synthetic_data_gen (--source synthetic, default): 5 years
+of daily bars for every TICKERS_CONFIG symbol plus 5 sessions of 5-minute
+bars for ^NSEI and ^INDIAVIX.
+
+Fault knobs (API and chart routes; the homepage only gets latency):
+  latency_ms / jitter_ms   per-request delay, latency +- uniform jitter
+  error_rate               fraction of requests answered 500 / 502 / 503
+  rate_limit / burst       token bucket over all clients; 429 + Retry-After when empty
+  cookies                  API calls without a homepage cookie get 401
+  cookie_ttl               cookies expire after this many seconds (401 again)
+Faults are drawn from one seeded generator, so a sequential run is repeatable.
+
+Usage:
+  python -m src.feed_server                                   # http://127.0.0.1:8765
+  python -m src.feed_server --latency-ms 80 --jitter-ms 40 --error-rate 0.1 --rate-limit 20
+  python -m src.feed_server --source store                    # replay the cached market data
+
+  python -m src.nse_data_fetcher --base-url http://127.0.0.1:8765/api --home-url http://127.0.0.1:8765/
+  python -m src.data_fetcher --chart-url http://127.0.0.1:8765
+  OMNI_CHART_URL=http://127.0.0.1:8765 python -m src.live_data
+
+In-process (benchmarks):
+  with FeedServer(latency_ms=50, error_rate=0.1) as server:
+      NSEDataFetcher(base_url=server.api_url, home_url=server.home_url)
+"""
+import sys
+import json
+import time
+import random
+import secrets
+import argparse
+import threading
+from collections import Counter
+from datetime import datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs, unquote
+import numpy as np
+import pandas as pd
+from src.market_store import STORE_DIR, JSON_CACHE, load_existing_frame, period_days
+from src.data_fetcher import TICKERS_CONFIG
+from src.synthetic_data_gen import BARS_PER_SESSION, SYMBOLS, generate_market
+
+DEFAULT_PORT = 8765
+IST = "Asia/Kolkata"
+SESSION_OPEN = pd.Timedelta(hours=9, minutes=15)
+DAILY_YEARS = 5
+INTRADAY_SESSIONS = 5
+ERROR_STATUSES = (500, 502, 503)
+NSE_INDICES = {
+    "NIFTY 50": "^NSEI",
+    "INDIA VIX": "^INDIAVIX",
+    "NIFTY BANK": "^NSEBANK",
+    "NIFTY FINANCIAL SERVICES": "NIFTY_FIN_SERVICE.NS",
+    "NIFTY IT": "^CNXIT",
+    "NIFTY PHARMA": "^CNXPHARMA",
+    "NIFTY AUTO": "^CNXAUTO",
+    "NIFTY METAL": "^CNXMETAL",
+    "NIFTY FMCG": "^CNXFMCG",
+    "NIFTY ENERGY": "^CNXENERGY",
+}
+INTRADAY_MINUTES = {"5m": 5, "15m": 15, "30m": 30, "60m": 60, "1h": 60}
+
+
+def _session_times(days, bars_per_session=BARS_PER_SESSION):
+    """5-minute bar timestamps (IST) of every session in days, from 09:15"""
+    offsets = SESSION_OPEN + pd.to_timedelta(np.arange(bars_per_session) * 5, unit="min")
+    return pd.DatetimeIndex([day + offset for day in days for offset in offsets])
+
+
+def _epoch_s(dates):
+    """Unix seconds of tz-aware dates (whatever the frame's datetime resolution)"""
+    return pd.DatetimeIndex(dates).tz_convert("UTC").tz_localize(None).values.astype("datetime64[s]").astype(np.int64)
+
+
+def _ist(dates):
+    dates = pd.DatetimeIndex(pd.to_datetime(dates))
+    return dates.tz_localize(IST) if dates.tz is None else dates.tz_convert(IST)
+
+
+class FeedData:
+    """Daily and 5-minute OHLCV frames (Date column, IST) per ticker"""
+
+    def __init__(self, daily, intraday, source):
+        self.daily = daily
+        self.intraday = intraday
+        self.source = source
+
+    @classmethod
+    def synthetic(cls, seed=42, years=DAILY_YEARS, sessions=INTRADAY_SESSIONS):
+        end = pd.Timestamp.now(tz=IST).normalize().tz_localize(None)
+        frames = generate_market(int(years * 261), 'B', seed=seed, end=end)
+        ticker_of = {key: TICKERS_CONFIG[key]["ticker"] for key in SYMBOLS}
+        daily = {}
+        for key, df in frames.items():
+            df['Date'] = _ist(df['Date'])
+            daily[ticker_of[key]] = df
+        days = daily["^NSEI"]['Date'].iloc[-sessions:]
+        last = {key: float(frames[key]["Close"].iloc[-sessions - 1]) for key in ("nifty_daily", "vix")}
+        bars = generate_market(sessions * BARS_PER_SESSION, '5min', symbols=list(last), seed=seed + 1, bases=last)
+        intraday = {}
+        for key, df in bars.items():
+            df['Date'] = _session_times(days)
+            intraday[ticker_of[key]] = df
+        return cls(daily, intraday, f"synthetic (seed {seed})")
+
+    @classmethod
+    def from_store(cls, store_dir=STORE_DIR, json_path=JSON_CACHE):
+        daily, intraday = {}, {}
+        for key, cfg in TICKERS_CONFIG.items():
+            df = load_existing_frame(key, store_dir, json_path)
+            if df is None or df.empty:
+                continue
+            df['Date'] = _ist(df['Date'])
+            if cfg["interval"] == "1d":
+                daily[cfg["ticker"]] = df
+            elif len(df) > len(intraday.get(cfg["ticker"], ())):
+                intraday[cfg["ticker"]] = df  # longest intraday set (3d) serves every range
+        if not daily:
+            raise Exception(f"[ERROR] No cached series to replay in {store_dir} or {json_path}")
+        return cls(daily, intraday, f"replay ({store_dir})")
+
+    def bars(self, ticker, interval="1d", range_=None, period1=None, period2=None):
+        """Frame for a chart request, or None if the ticker / interval is not served"""
+        if interval == "1d":
+            df = self.daily.get(ticker)
+        elif interval in INTRADAY_MINUTES:
+            df = self.intraday.get(ticker)
+            minutes = INTRADAY_MINUTES[interval]
+            if df is not None and minutes > 5:
+                df = (df.set_index('Date')
+                      .resample(f"{minutes}min", origin="start_day", offset=SESSION_OPEN)
+                      .agg({'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'})
+                      .dropna(subset=['Close']).reset_index())
+        else:
+            return None
+        if df is None:
+            return None
+        if period1 is not None:
+            ts = _epoch_s(df['Date'])
+            return df[(ts >= int(period1)) & (ts <= int(period2 or time.time()))]
+        if range_ in (None, "max"):
+            return df
+        if range_ == "ytd":
+            return df[df['Date'] >= df['Date'].iloc[-1].replace(month=1, day=1, hour=0, minute=0)]
+        days = period_days(range_)
+        if days is None:
+            return None
+        if interval != "1d":
+            sessions = df['Date'].dt.normalize()
+            return df[sessions.isin(sessions.unique()[-days:])]
+        return df[df['Date'] > df['Date'].iloc[-1] - pd.Timedelta(days=days)]
+
+
+# ---------------------------------------------------------------------- payloads
+def chart_payload(ticker, df, interval, range_):
+    """Chart API JSON for one symbol"""
+    ts = _epoch_s(df['Date']).tolist()
+    last = df.iloc[-1]
+    quote = {col.lower(): [round(float(v), 2) for v in df[col]] for col in ('Open', 'High', 'Low', 'Close')}
+    quote["volume"] = [int(v) for v in df['Volume']]
+    return {"chart": {"result": [{
+        "meta": {
+            "currency": "INR", "symbol": ticker, "exchangeName": "NSI", "instrumentType": "INDEX",
+            "gmtoffset": 19800, "timezone": "IST", "exchangeTimezoneName": IST,
+            "regularMarketPrice": round(float(last['Close']), 2),
+            "regularMarketTime": ts[-1], "dataGranularity": interval, "range": range_ or "",
+        },
+        "timestamp": ts,
+        "indicators": {"quote": [quote], "adjclose": [{"adjclose": quote["close"]}]},
+    }], "error": None}}
+
+
+def chart_error(code, description):
+    return {"chart": {"result": None, "error": {"code": code, "description": description}}}
+
+
+def nse_quote_payload(name, daily, intraday=None):
+    """equity-stockIndices JSON: the index row first, as NSE returns it"""
+    prev_close = float(daily['Close'].iloc[-2])
+    if intraday is not None and len(intraday):
+        session = intraday[intraday['Date'].dt.normalize() == intraday['Date'].iloc[-1].normalize()]
+        open_, high, low = float(session['Open'].iloc[0]), float(session['High'].max()), float(session['Low'].min())
+        last, stamp = float(session['Close'].iloc[-1]), session['Date'].iloc[-1]
+    else:
+        row = daily.iloc[-1]
+        open_, high, low, last = float(row['Open']), float(row['High']), float(row['Low']), float(row['Close'])
+        stamp = row['Date'] + pd.Timedelta(hours=15, minutes=30)
+    change = last - prev_close
+    row = {
+        "priority": 1, "symbol": name, "identifier": name,
+        "open": round(open_, 2), "dayHigh": round(high, 2), "dayLow": round(low, 2),
+        "last": round(last, 2), "lastPrice": round(last, 2), "previousClose": round(prev_close, 2),
+        "change": round(change, 2), "pChange": round(change / prev_close * 100, 2),
+        "yearHigh": round(float(daily['High'].iloc[-252:].max()), 2),
+        "yearLow": round(float(daily['Low'].iloc[-252:].min()), 2),
+        "lastUpdateTime": stamp.strftime("%d-%b-%Y %H:%M:%S"),
+    }
+    return {"name": name, "timestamp": row["lastUpdateTime"], "data": [row],
+            "metadata": {k: row[k] for k in ("open", "last", "previousClose", "change", "pChange")}}
+
+
+def nse_history_payload(name, df):
+    """indicesHistory JSON (indexCloseOnlineRecords, newest first like NSE)"""
+    records = [{
+        "EOD_INDEX_NAME": name,
+        "EOD_OPEN_INDEX_VAL": round(float(r.Open), 2),
+        "EOD_HIGH_INDEX_VAL": round(float(r.High), 2),
+        "EOD_LOW_INDEX_VAL": round(float(r.Low), 2),
+        "EOD_CLOSE_INDEX_VAL": round(float(r.Close), 2),
+        "EOD_TIMESTAMP": r.Date.strftime("%d-%b-%Y"),
+        "TIMESTAMP": r.Date.strftime("%Y-%m-%dT00:00:00.000Z"),
+    } for r in df.iloc[::-1].itertuples(index=False)]
+    return {"data": {"indexCloseOnlineRecords": records, "indexTurnoverRecords": []}}
+
+
+# ---------------------------------------------------------------------- faults
+class FaultInjector:
+    """Latency, jitter, random 5xx and a token-bucket rate limit, from one seeded generator"""
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, rate_limit=None, burst=None, seed=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.burst = burst
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._tokens = None
+        self._refilled = time.monotonic()
+
+    def config(self):
+        return {"latency_ms": self.latency_ms, "jitter_ms": self.jitter_ms, "error_rate": self.error_rate,
+                "rate_limit": self.rate_limit, "burst": self.burst}
+
+    def delay_s(self):
+        with self._lock:
+            jitter = self._rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        return max(self.latency_ms + jitter, 0.0) / 1000.0
+
+    def error_status(self):
+        """500/502/503 with probability error_rate, else None"""
+        with self._lock:
+            if self.error_rate and self._rng.random() < self.error_rate:
+                return self._rng.choice(ERROR_STATUSES)
+        return None
+
+    def admit(self):
+        """Take a token; returns None if admitted, else seconds until the next token"""
+        if not self.rate_limit:
+            return None
+        burst = self.burst or max(self.rate_limit, 1.0)
+        with self._lock:
+            now = time.monotonic()
+            if self._tokens is None:
+                self._tokens = burst
+            self._tokens = min(burst, self._tokens + (now - self._refilled) * self.rate_limit)
+            self._refilled = now
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return None
+            return (1.0 - self._tokens) / self.rate_limit
+
+
+# ---------------------------------------------------------------------- server
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so pooled client sessions reuse connections
+    server_version = "OmniFeed/1.0"
+
+    def log_message(self, fmt, *args):
+        if self.server.feed.verbose:
+            sys.stderr.write(f"[FEED] {self.address_string()} {fmt % args}\n")
+
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8") if payload is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json" if payload is not None else "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or []):
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        return status
+
+    def do_GET(self):
+        feed = self.server.feed
+        t0 = time.perf_counter()
+        url = urlsplit(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        route = feed.route_name(url.path)
+        try:
+            status = feed.handle(self, route, url.path, query)
+        except Exception as e:
+            status = self._send(500, {"error": f"{type(e).__name__}: {e}"})
+        feed.count(route, status, time.perf_counter() - t0)
+
+
+class FeedServer:
+    def __init__(self, data=None, host="127.0.0.1", port=0, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0,
+                 rate_limit=None, burst=None, cookies=True, cookie_ttl=None, seed=0, verbose=False):
+        self.data = data or FeedData.synthetic(seed=42)
+        self.faults = FaultInjector(latency_ms, jitter_ms, error_rate, rate_limit, burst, seed)
+        self.cookies = cookies
+        self.cookie_ttl = cookie_ttl
+        self.verbose = verbose
+        self._issued = {}  # cookie token -> monotonic issue time
+        self._lock = threading.Lock()
+        self.reset_stats()
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.feed = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def api_url(self):
+        return self.url + "/api"
+
+    @property
+    def home_url(self):
+        return self.url + "/"
+
+    # ------------------------------------------------------------------ lifecycle
+    def start(self):
+        """Serve from a background thread; returns self"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="feed-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ------------------------------------------------------------------ stats
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {"requests": 0, "statuses": Counter(), "routes": Counter(), "injected_errors": 0,
+                           "rate_limited": 0, "unauthorized": 0, "cookies_issued": 0, "seconds": 0.0}
+
+    def count(self, route, status, seconds):
+        with self._lock:
+            s = self._stats
+            s["requests"] += 1
+            s["statuses"][str(status)] += 1
+            s["routes"][route] += 1
+            s["seconds"] += seconds
+
+    def _bump(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        with self._lock:
+            s = {k: (dict(v) if isinstance(v, Counter) else v) for k, v in self._stats.items()}
+        s["mean_ms"] = round(s.pop("seconds") / s["requests"] * 1000, 2) if s["requests"] else 0.0
+        return s
+
+    # ------------------------------------------------------------------ routing
+    @staticmethod
+    def route_name(path):
+        if path.startswith("/v8/finance/chart/"):
+            return "chart"
+        if path.startswith("/api/"):
+            return path[len("/api/"):]
+        return path.strip("/") or "home"
+
+    def _cookie_ok(self, handler):
+        header = handler.headers.get("Cookie", "")
+        tokens = [part.split("=", 1)[1] for part in header.split(";") if part.strip().startswith("nsit=")]
+        with self._lock:
+            issued = [self._issued.get(token) for token in tokens]
+        now = time.monotonic()
+        return any(t is not None and (not self.cookie_ttl or now - t < self.cookie_ttl) for t in issued)
+
+    def handle(self, handler, route, path, query):
+        if route == "__stats":
+            return handler._send(200, self.stats())
+        if route == "__config":
+            for name, value in query.items():
+                if name in self.faults.config():
+                    setattr(self.faults, name, float(value) if value not in ("", "none") else None)
+            return handler._send(200, self.faults.config())
+
+        retry_after = self.faults.admit() if route != "home" else None
+        if retry_after is not None:
+            self._bump("rate_limited")
+            return handler._send(429, {"message": "Too Many Requests"},
+                                 [("Retry-After", str(max(int(np.ceil(retry_after)), 1)))])
+        time.sleep(self.faults.delay_s())
+        if route == "home":
+            token = secrets.token_hex(16)
+            with self._lock:
+                self._issued[token] = time.monotonic()
+                self._stats["cookies_issued"] += 1
+            return handler._send(200, None, [("Set-Cookie", f"nsit={token}; Path=/; HttpOnly"),
+                                             ("Set-Cookie", f"bm_sv={secrets.token_hex(8)}; Path=/")])
+        status = self.faults.error_status()
+        if status is not None:
+            self._bump("injected_errors")
+            return handler._send(status, {"message": "injected fault"})
+        if route == "chart":
+            return self._chart(handler, unquote(path.rsplit("/", 1)[-1]), query)
+        if route in ("equity-stockIndices", "historical/indicesHistory"):
+            if self.cookies and not self._cookie_ok(handler):
+                self._bump("unauthorized")
+                return handler._send(401, {"message": "Unauthorized"})
+            if route == "equity-stockIndices":
+                return self._nse_quote(handler, query)
+            return self._nse_history(handler, query)
+        return handler._send(404, {"message": f"no route for {path}"})
+
+    def _chart(self, handler, ticker, query):
+        interval = query.get("interval", "1d")
+        range_ = query.get("range")
+        if ticker not in self.data.daily and ticker not in self.data.intraday:
+            return handler._send(404, chart_error("Not Found", "No data found, symbol may be delisted"))
+        df = self.data.bars(ticker, interval, range_, query.get("period1"), query.get("period2"))
+        if df is None:
+            return handler._send(400, chart_error("Bad Request", f"Invalid input - interval={interval} range={range_}"))
+        if df.empty:
+            return handler._send(200, {"chart": {"result": [{"meta": {"symbol": ticker, "dataGranularity": interval,
+                                                                      "exchangeTimezoneName": IST}}],
+                                                 "error": None}})
+        return handler._send(200, chart_payload(ticker, df, interval, range_))
+
+    def _index(self, name):
+        name = (name or "").upper()
+        return NSE_INDICES.get(name)
+
+    def _nse_quote(self, handler, query):
+        ticker = self._index(query.get("index"))
+        if ticker not in self.data.daily:
+            return handler._send(404, {"message": f"unknown index {query.get('index')}"})
+        name = query["index"].upper()
+        return handler._send(200, nse_quote_payload(name, self.data.daily[ticker], self.data.intraday.get(ticker)))
+
+    def _nse_history(self, handler, query):
+        ticker = self._index(query.get("indexType"))
+        if ticker not in self.data.daily:
+            return handler._send(404, {"message": f"unknown index {query.get('indexType')}"})
+        try:
+            start = pd.Timestamp(datetime.strptime(query["from"], "%d-%m-%Y"), tz=IST)
+            end = pd.Timestamp(datetime.strptime(query["to"], "%d-%m-%Y"), tz=IST)
+        except (KeyError, ValueError):
+            return handler._send(400, {"message": "from / to must be dd-mm-YYYY"})
+        df = self.data.daily[ticker]
+        df = df[(df['Date'] >= start) & (df['Date'] <= end)]
+        return handler._send(200, nse_history_payload(query["indexType"].upper(), df))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OmniSpectrum local market feed stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--source", choices=["synthetic", "store"], default="synthetic",
+                        help="Generate data, or replay the market store / JSON cache")
+    parser.add_argument("--store-dir", default=STORE_DIR)
+    parser.add_argument("--json-path", default=JSON_CACHE)
+    parser.add_argument("--seed", type=int, default=0, help="Fault generator seed (synthetic data uses 42)")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Uniform +- jitter around --latency-ms")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of API requests answered 5xx")
+    parser.add_argument("--rate-limit", type=float, default=None, help="Requests/second over all clients (429 beyond)")
+    parser.add_argument("--burst", type=float, default=None, help="Token bucket size (default: one second of --rate-limit)")
+    parser.add_argument("--no-cookies", action="store_true", help="Do not require homepage cookies on NSE API routes")
+    parser.add_argument("--cookie-ttl", type=float, default=None, help="Seconds before an issued cookie is rejected")
+    parser.add_argument("--verbose", action="store_true", help="Log every request to stderr")
+    args = parser.parse_args(argv)
+
+    data = FeedData.from_store(args.store_dir, args.json_path) if args.source == "store" else FeedData.synthetic()
+    server = FeedServer(data, args.host, args.port, args.latency_ms, args.jitter_ms, args.error_rate,
+                        args.rate_limit, args.burst, cookies=not args.no_cookies, cookie_ttl=args.cookie_ttl,
+                        seed=args.seed, verbose=args.verbose)
+    print("=" * 75)
+    print("OmniSpectrum: Market Feed Stand-in")
+    print("=" * 75)
+    print(f"Data: {data.source} | {len(data.daily)} daily symbols, {len(data.intraday)} intraday")
+    print(f"Faults: {server.faults.config()} | cookies: {'required' if server.cookies else 'off'}")
+    print(f"\n  NSE:    --base-url {server.api_url} --home-url {server.home_url}")
+    print(f"  chart:  --chart-url {server.url}   (or OMNI_CHART_URL={server.url})")
+    print(f"  stats:  {server.url}/__stats")
+    print("=" * 75)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(f"\n[OK] Feed stopped: {json.dumps(server.stats())}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
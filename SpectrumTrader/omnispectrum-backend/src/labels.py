@@ -0,0 +1,108 @@
+"""
+OmniSpectrum: Training Label Engine
+===================================
+All training targets as whole-series array operations (no per-sample loops).
+
+  - direction: 3-class tilt (0=bear, 1=neutral, 2=bull) from the mean forward
+    return over a horizon, against a +/- threshold
+  - expansion: volatility expansion (short-window realized vol > long-window)
+
+Horizons and thresholds can be swept in one call; every returned array is
+aligned with the given end indices (one label per sample).
+"""
+from typing import Dict, Iterable, Tuple
+import numpy as np
+
+ANNUALIZE = np.sqrt(252)
+
+
+def _returns(close):
+    """Simple returns r[t] = close[t] / close[t-1] - 1 (r[0] = 0)"""
+    close = np.asarray(close, dtype=np.float64)
+    ret = np.zeros(len(close))
+    if len(close) > 1:
+        ret[1:] = close[1:] / close[:-1] - 1.0
+    return ret
+
+
+def forward_mean_return(close, end_indices, horizon=5):
+    """
+    Mean forward return used by the tilt label, for every end index at once.
+
+    Matches the original per-sample definition
+        df['Close'].iloc[idx+1:idx+1+h].pct_change().fillna(0).mean()
+    i.e. the mean over the h bars after idx, where the first bar contributes 0
+    (pct_change has no prior bar inside the slice). Near the end of the series
+    the slice is shorter and the mean is over what is available (NaN if empty).
+    """
+    end_indices = np.asarray(end_indices, dtype=np.int64)
+    ret = _returns(close)
+    csum = np.concatenate(([0.0], np.cumsum(ret)))
+    n = len(ret)
+    avail = np.clip(n - 1 - end_indices, 0, horizon)       # bars in the forward slice
+    lo = np.minimum(end_indices + 2, n)                    # first return inside the slice
+    hi = np.minimum(end_indices + avail + 1, n)            # one past the last bar
+    total = csum[np.maximum(hi, lo)] - csum[lo]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(avail > 0, total / avail, np.nan)
+
+
+def direction_labels(close, end_indices, horizon=5, threshold=0.005):
+    """3-class tilt label: 2 if mean forward return > threshold, 0 if < -threshold, else 1"""
+    mean_future = forward_mean_return(close, end_indices, horizon)
+    return _classify(mean_future, threshold)
+
+
+def _classify(mean_future, threshold):
+    labels = np.ones(len(mean_future), dtype=np.int64)
+    labels[mean_future > threshold] = 2
+    labels[mean_future < -threshold] = 0
+    return labels
+
+
+def direction_label_sweep(close, end_indices, horizons: Iterable[int] = (1, 3, 5, 10),
+                          thresholds: Iterable[float] = (0.0025, 0.005, 0.01)) -> Dict[Tuple[int, float], np.ndarray]:
+    """{(horizon, threshold): labels} for every combination; one forward pass per horizon"""
+    out = {}
+    for h in horizons:
+        mean_future = forward_mean_return(close, end_indices, h)
+        for thr in thresholds:
+            out[(h, thr)] = _classify(mean_future, thr)
+    return out
+
+
+def expansion_labels_from_windows(return_windows, short=3):
+    """
+    Volatility-expansion label from per-sample return windows (N, window),
+    e.g. X_tme[:, :, 0]: 1 if std of the last `short` values exceeds the std
+    of the whole window (population std, both annualized, +1e-9 on the long leg).
+    """
+    return_windows = np.asarray(return_windows)
+    rv_short = np.std(return_windows[:, -short:], axis=1) * ANNUALIZE
+    rv_long = np.std(return_windows, axis=1) * ANNUALIZE + 1e-9
+    return (rv_short > rv_long).astype(int)
+
+
+def _trailing_pop_std(ret, end_indices, window):
+    """Population std over the trailing window ending at each index, zero-padded at the front"""
+    padded = np.concatenate((np.zeros(window), ret))
+    c1 = np.concatenate(([0.0], np.cumsum(padded)))
+    c2 = np.concatenate(([0.0], np.cumsum(padded * padded)))
+    hi = end_indices + window + 1
+    lo = hi - window
+    s1 = c1[hi] - c1[lo]
+    s2 = c2[hi] - c2[lo]
+    return np.sqrt(np.maximum(s2 / window - (s1 / window) ** 2, 0.0))
+
+
+def expansion_label_sweep(returns, end_indices, shorts: Iterable[int] = (3, 5, 10),
+                          longs: Iterable[int] = (60, 90)) -> Dict[Tuple[int, int], np.ndarray]:
+    """
+    {(short, long): labels} straight from a return series, with the same
+    front-zero-padded windows as build_tme_window.
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    end_indices = np.asarray(end_indices, dtype=np.int64)
+    shorts, longs = list(shorts), list(longs)
+    stds = {w: _trailing_pop_std(returns, end_indices, w) * ANNUALIZE for w in set(shorts) | set(longs)}
+    return {(s, l): (stds[s] > stds[l] + 1e-9).astype(int) for s in shorts for l in longs}
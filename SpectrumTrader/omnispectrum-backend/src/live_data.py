@@ -1,89 +1,88 @@
+"""
+Live dashboard snapshot (spot/VIX series, price, OHLC, 52-week VIX range).
+
+build_snapshot makes one intraday and one daily history() call per symbol and
+derives every dashboard field from those two frames. Frames are kept in memory
+for SNAPSHOT_TTL_S so bursts of refreshes reuse them. With $OMNI_CHART_URL set
+the frames come from that chart API (e.g. src.feed_server) instead of yfinance.
+"""
+import os
+import time
+import threading
 import yfinance as yf
 from datetime import datetime, timezone
 from pathlib import Path
 
-def get_series(ticker, period="5d", interval="5m", n=120):
-    """Fetch intraday price series"""
-    try:
-        df = yf.Ticker(ticker).history(period=period, interval=interval, auto_adjust=False)
-        if df.empty:
-            return []
-        return [float(x) for x in df["Close"].tail(n).values]
-    except Exception as e:
-        print(f"[WARN] Failed to get intraday series for {ticker}: {e}")
-        return []
+SNAPSHOT_TTL_S = 30.0
+INTRADAY = ("5d", "5m")
+DAILY = ("1y", "1d")
+SERIES_POINTS = 120
 
-def get_daily_series(ticker, period="1y"):
-    """Fetch daily price series"""
-    try:
-        df = yf.Ticker(ticker).history(period=period, interval="1d", auto_adjust=False)
-        if df.empty:
-            return []
-        return [float(x) for x in df["Close"].values]
-    except Exception as e:
-        print(f"[WARN] Failed to get daily series for {ticker}: {e}")
-        return []
+_frame_cache = {}  # (ticker, period, interval) -> (fetched_at, DataFrame)
+_cache_lock = threading.Lock()
 
-def get_current_price(ticker):
-    """Get current/live price from yfinance"""
+def _history(ticker, period, interval, ttl=SNAPSHOT_TTL_S):
+    """Ticker.history with an in-memory TTL cache; None on failure"""
+    key = (ticker, period, interval)
+    with _cache_lock:
+        hit = _frame_cache.get(key)
+        if hit is not None and time.monotonic() - hit[0] < ttl:
+            return hit[1]
+    chart_url = os.environ.get("OMNI_CHART_URL")
     try:
-        ticker_obj = yf.Ticker(ticker)
-        
-        # Try info first (real-time during market hours)
-        try:
-            info = ticker_obj.info
-            price = info.get("regularMarketPrice") or info.get("currentPrice") or info.get("previousClose")
-            if price is not None:
-                return float(price)
-        except:
-            pass
-        
-        # Try fast_info
-        try:
-            fast_info = ticker_obj.fast_info
-            price = fast_info.get("lastPrice") or fast_info.get("regularMarketPrice")
-            if price is not None:
-                return float(price)
-        except:
-            pass
-        
-        # Fallback to latest 1-minute data
-        try:
-            hist = ticker_obj.history(period="1d", interval="1m", auto_adjust=False)
-            if not hist.empty:
-                return float(hist["Close"].iloc[-1])
-        except:
-            pass
-        
-        # Final fallback to latest 5-minute data
-        hist = ticker_obj.history(period="5d", interval="5m", auto_adjust=False)
-        if not hist.empty:
-            return float(hist["Close"].iloc[-1])
-        
-        return None
+        if chart_url:
+            from src.data_fetcher import fetch_ticker_chart
+            df = fetch_ticker_chart(ticker, period, interval, base_url=chart_url)
+        else:
+            df = yf.Ticker(ticker).history(period=period, interval=interval, auto_adjust=False)
     except Exception as e:
-        print(f"[WARN] Error fetching current price for {ticker}: {e}")
+        print(f"[WARN] history({ticker}, {period}/{interval}) failed: {e}")
         return None
+    if df is None or df.empty:
+        return None
+    with _cache_lock:
+        _frame_cache[key] = (time.monotonic(), df)
+    return df
 
-def get_ohlc(ticker, days=5):
-    """Get OHLC data for specified days"""
-    try:
-        ticker_obj = yf.Ticker(ticker)
-        hist = ticker_obj.history(period=f"{days}d", interval="1d", auto_adjust=False)
-        
-        if hist.empty or len(hist) == 0:
-            return {}
-        
-        latest = hist.iloc[-1]
-        return {
-            "open": float(latest["Open"]) if "Open" in latest else None,
-            "high": float(latest["High"]) if "High" in latest else None,
-            "low": float(latest["Low"]) if "Low" in latest else None,
-            "close": float(latest["Close"]) if "Close" in latest else None
-        }
-    except Exception as e:
-        print(f"[WARN] Error fetching OHLC for {ticker}: {e}")
+def _ohlc_row(df):
+    if df is None or df.empty:
         return {}
+    latest = df.iloc[-1]
+    return {k.lower(): float(latest[k]) for k in ("Open", "High", "Low", "Close")}
+
+def symbol_snapshot(ticker, ttl=SNAPSHOT_TTL_S, points=SERIES_POINTS):
+    """
+    All dashboard fields for one symbol from two (cached) downloads:
+    intraday 5m for the series and current price, daily 1y for OHLC and the
+    52-week range.
+    """
+    intraday = _history(ticker, *INTRADAY, ttl=ttl)
+    daily = _history(ticker, *DAILY, ttl=ttl)
+    series = [float(x) for x in intraday["Close"].tail(points).values] if intraday is not None else []
+    daily_closes = [float(x) for x in daily["Close"].values] if daily is not None else []
+    if series:
+        price = series[-1]
+    elif daily_closes:
+        price = daily_closes[-1]
+    else:
+        price = None
+    return {
+        "series": series,
+        "price": price,
+        "ohlc": _ohlc_row(daily),
+        "daily": daily_closes,
+        "high_52w": max(daily_closes) if daily_closes else None,
+        "low_52w": min(daily_closes) if daily_closes else None,
+    }
+
+def build_snapshot(tickers=("^NSEI", "^INDIAVIX"), ttl=SNAPSHOT_TTL_S):
+    """{ticker: symbol_snapshot} for every ticker"""
+    return {ticker: symbol_snapshot(ticker, ttl=ttl) for ticker in tickers}
+
+def get_current_price(ticker, ttl=SNAPSHOT_TTL_S):
+    """Get current/live price (last 5m close, from the cached intraday frame only)"""
+    intraday = _history(ticker, *INTRADAY, ttl=ttl)
+    return float(intraday["Close"].iloc[-1]) if intraday is not None else None
 
 def fetch_market_data():
     """Fetch all market data for dashboard"""
@@ -91,32 +90,21 @@ def fetch_market_data():
     
     Path("data").mkdir(exist_ok=True)
     
-    # Fetch NIFTY data
-    spot_series = get_series("^NSEI", "5d", "5m", 120)
-    current_spot = get_current_price("^NSEI")
-    nifty_ohlc = get_ohlc("^NSEI", 5)
-    
-    # Fetch VIX data
-    vix_series = get_series("^INDIAVIX", "5d", "5m", 120)
-    vix_daily = get_daily_series("^INDIAVIX", "1y")
-    current_vix = get_current_price("^INDIAVIX")
-    vix_ohlc = get_ohlc("^INDIAVIX", 5)
-    
-    # Calculate VIX 52-week high/low
-    vix_52w_high = max(vix_daily) if vix_daily else None
-    vix_52w_low = min(vix_daily) if vix_daily else None
+    # One intraday + one daily download per symbol (cached for SNAPSHOT_TTL_S)
+    snap = build_snapshot(("^NSEI", "^INDIAVIX"))
+    nifty, vix = snap["^NSEI"], snap["^INDIAVIX"]
     
     out = {
         "updatedAt": datetime.now(timezone.utc).isoformat(),
-        "spotSeries": spot_series,
-        "vixSeries": vix_series,
-        "spot": current_spot,
-        "vix": current_vix,
-        "vixDaily": vix_daily,
-        "vix52wHigh": vix_52w_high,
-        "vix52wLow": vix_52w_low,
-        "vixOhlc": vix_ohlc,
-        "niftyOhlc": nifty_ohlc
+        "spotSeries": nifty["series"],
+        "vixSeries": vix["series"],
+        "spot": nifty["price"],
+        "vix": vix["price"],
+        "vixDaily": vix["daily"],
+        "vix52wHigh": vix["high_52w"],
+        "vix52wLow": vix["low_52w"],
+        "vixOhlc": vix["ohlc"],
+        "niftyOhlc": nifty["ohlc"]
     }
     
     # Save to file
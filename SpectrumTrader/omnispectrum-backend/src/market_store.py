@@ -0,0 +1,322 @@
+"""
+OmniSpectrum: Columnar Market Store
+===================================
+Binary, per-series replacement for the indented prediction_data.json blob.
+
+Layout (data/market_store/):
+  manifest.json        row counts, date range, sha256 per series, fetch meta,
+                       plus live extras (spot, vix, niftyOhlc, vixOhlc)
+  <series>.<hash>.npy  one structured array per series (hash: first 12 hex of its sha256):
+                         ts      int64   (ns since epoch, UTC)
+                         Open    float32
+                         High    float32
+                         Low     float32
+                         Close   float32
+                         Volume  int64
+
+Series files are plain .npy so readers can memory-map just the series they need
+(np.load(..., mmap_mode="r")). Unused yfinance columns (Dividends, Stock Splits)
+are dropped. Writes are all-or-nothing: series files are content-addressed, so a
+write only adds new file names and never touches a file an existing manifest
+points at; the manifest is replaced last and is the only commit point. A crash
+before that leaves the old store intact, and a concurrent reader sees either
+the old or the new manifest with matching files. Files referenced by neither
+the new nor the previous manifest are removed after the swap (the previous
+generation is kept for readers that loaded the old manifest just before it).
+
+Delta refresh helpers (normalize_ohlcv, overlap_mismatch, merge_series) let the
+fetchers append new bars to a cached series instead of re-downloading it.
+
+One-shot conversion from the legacy JSON cache:
+  python -m src.market_store [path/to/prediction_data.json]
+"""
+import os
+import sys
+import json
+import hashlib
+from datetime import timedelta, timezone
+from typing import Dict, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+from src.store_manifest import STORE_DIR, JSON_CACHE, MANIFEST, EXTRA_KEYS, store_exists, read_manifest
+
+STORE_VERSION = 1
+
+SERIES_DTYPE = np.dtype([
+    ("ts", "<i8"),
+    ("Open", "<f4"),
+    ("High", "<f4"),
+    ("Low", "<f4"),
+    ("Close", "<f4"),
+    ("Volume", "<i8"),
+])
+PRICE_COLUMNS = ["Open", "High", "Low", "Close"]
+
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def frame_to_records(df: pd.DataFrame) -> Tuple[np.ndarray, Optional[int]]:
+    """
+    Convert an OHLCV DataFrame (Date/Datetime column or DatetimeIndex) to a
+    SERIES_DTYPE array. Returns (array, utc_offset_minutes or None if naive).
+    """
+    if "Date" in df.columns:
+        raw_ts = df["Date"]
+    elif "Datetime" in df.columns:
+        raw_ts = df["Datetime"]
+    elif isinstance(df.index, pd.DatetimeIndex):
+        raw_ts = df.index.to_series()
+    else:
+        raise Exception("[ERROR] Series has no Date/Datetime column or DatetimeIndex")
+
+    # yfinance may return MultiIndex columns (field, ticker) for single downloads
+    if isinstance(df.columns, pd.MultiIndex):
+        df = df.copy()
+        df.columns = df.columns.get_level_values(0)
+
+    parsed = pd.to_datetime(raw_ts, utc=False)
+    offset_min = None
+    if getattr(parsed.dt, "tz", None) is not None:
+        first = parsed.iloc[0]
+        offset_min = int(first.utcoffset().total_seconds() // 60)
+        ts = parsed.dt.tz_convert("UTC").dt.tz_localize(None)
+    else:
+        ts = parsed
+
+    out = np.empty(len(df), dtype=SERIES_DTYPE)
+    out["ts"] = ts.values.astype("datetime64[ns]").astype(np.int64)
+    for col in PRICE_COLUMNS:
+        out[col] = df[col].to_numpy(dtype=np.float64)
+    if "Volume" in df.columns:
+        out["Volume"] = np.nan_to_num(df["Volume"].to_numpy(dtype=np.float64)).astype(np.int64)
+    else:
+        out["Volume"] = 0
+    return out, offset_min
+
+
+def write_market_store(series: Dict[str, Tuple[pd.DataFrame, dict]], extras: Optional[dict] = None,
+                       store_dir: str = STORE_DIR, source: Optional[str] = None, merge: bool = False) -> dict:
+    """
+    Write {key: (DataFrame, meta)} to the columnar store. Fail-fast: any
+    conversion error aborts before the manifest is touched.
+    merge=True adds / replaces just these series and keeps the rest of the
+    existing store (other series, extras and source unless given).
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    staged = {}
+    entries = {}
+    try:
+        for key, (df, meta) in series.items():
+            records, offset_min = frame_to_records(df)
+            tmp_path = os.path.join(store_dir, f".{key}.npy.tmp")
+            with open(tmp_path, "wb") as f:
+                np.save(f, records)
+            staged[key] = tmp_path
+            digest = _sha256(tmp_path)
+            entries[key] = {
+                "file": f"{key}.{digest[:12]}.npy",
+                "rows": int(len(records)),
+                "start": str(pd.Timestamp(records["ts"][0])) if len(records) else None,
+                "end": str(pd.Timestamp(records["ts"][-1])) if len(records) else None,
+                "utc_offset_min": offset_min,
+                "sha256": digest,
+                "meta": meta or {},
+            }
+    except Exception:
+        for tmp_path in staged.values():
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        raise
+
+    for key, tmp_path in staged.items():
+        os.replace(tmp_path, os.path.join(store_dir, entries[key]["file"]))
+
+    existing = read_manifest(store_dir) if store_exists(store_dir) else {}
+    previous = existing if merge else {}
+    manifest = {
+        "version": STORE_VERSION,
+        "timestamp": pd.Timestamp.now(tz="UTC").isoformat(),
+        "source": source if source is not None else previous.get("source"),
+        "series": {**previous.get("series", {}), **entries},
+        "extras": extras if extras is not None else previous.get("extras", {}),
+    }
+    tmp_manifest = os.path.join(store_dir, f".{MANIFEST}.tmp")
+    with open(tmp_manifest, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, default=str)
+    os.replace(tmp_manifest, os.path.join(store_dir, MANIFEST))
+
+    keep = {e["file"] for m in (manifest, existing) for e in m.get("series", {}).values()}
+    for name in os.listdir(store_dir):
+        if name.endswith(".npy") and name not in keep:
+            try:
+                os.remove(os.path.join(store_dir, name))
+            except OSError:
+                pass
+    return manifest
+
+
+def load_series(key: str, store_dir: str = STORE_DIR, mmap: bool = True,
+                verify: bool = False, manifest: Optional[dict] = None) -> np.ndarray:
+    """Memory-map (or read) one series as a SERIES_DTYPE array"""
+    manifest = manifest or read_manifest(store_dir)
+    entry = manifest["series"].get(key)
+    if entry is None:
+        raise Exception(f"[ERROR] Series '{key}' not in market store ({', '.join(manifest['series'])})")
+    path = os.path.join(store_dir, entry["file"])
+    if verify and _sha256(path) != entry["sha256"]:
+        raise Exception(f"[ERROR] Checksum mismatch for series '{key}': {path}")
+    arr = np.load(path, mmap_mode="r" if mmap else None)
+    if len(arr) != entry["rows"]:
+        raise Exception(f"[ERROR] Row count mismatch for series '{key}': {len(arr)} != {entry['rows']}")
+    return arr
+
+
+def series_dates(arr: np.ndarray, utc_offset_min: Optional[int] = None) -> pd.DatetimeIndex:
+    """Timestamps of a stored series, restored to the source's UTC offset"""
+    dates = pd.to_datetime(np.asarray(arr["ts"]), utc=utc_offset_min is not None)
+    if utc_offset_min is not None:
+        dates = dates.tz_convert(timezone(timedelta(minutes=utc_offset_min)))
+    return dates
+
+
+def load_series_frame(key: str, store_dir: str = STORE_DIR, manifest: Optional[dict] = None,
+                      with_dates: bool = False) -> pd.DataFrame:
+    """OHLCV DataFrame (float64 prices) for one series, read via memory map"""
+    manifest = manifest or read_manifest(store_dir)
+    arr = load_series(key, store_dir, manifest=manifest)
+    cols = {col: np.asarray(arr[col], dtype=np.float64) for col in PRICE_COLUMNS}
+    cols["Volume"] = np.asarray(arr["Volume"])
+    df = pd.DataFrame(cols)
+    if with_dates:
+        df.insert(0, "Date", series_dates(arr, manifest["series"][key].get("utc_offset_min")))
+    return df
+
+
+def normalize_ohlcv(df: pd.DataFrame) -> pd.DataFrame:
+    """Date + OHLCV columns only, whatever shape the fetcher returned (index, MultiIndex, extras)"""
+    if isinstance(df.columns, pd.MultiIndex):
+        df = df.copy()
+        df.columns = df.columns.get_level_values(0)
+    if "Date" not in df.columns:
+        df = df.reset_index()
+        if "Datetime" in df.columns:
+            df = df.rename(columns={"Datetime": "Date"})
+        elif "Date" not in df.columns:
+            df = df.rename(columns={df.columns[0]: "Date"})
+    out = df[["Date"] + PRICE_COLUMNS].copy()
+    out["Volume"] = df["Volume"] if "Volume" in df.columns else 0
+    out["Date"] = pd.to_datetime(out["Date"])
+    return out.reset_index(drop=True)
+
+
+def _utc_keys(dates: pd.Series) -> np.ndarray:
+    return pd.to_datetime(dates, utc=True).values.astype("datetime64[ns]").astype(np.int64)
+
+
+def overlap_mismatch(existing: pd.DataFrame, delta: pd.DataFrame, rtol: float = 1e-4) -> Optional[str]:
+    """
+    Check a freshly fetched delta against the cached rows it overlaps.
+    Returns None if history is consistent, else a reason (revised closes, or no
+    overlap at all so continuity cannot be verified). The newest cached bar is
+    left out: it is usually a still-forming bar, and merge_series replaces it
+    with the delta's version.
+    """
+    existing, delta = normalize_ohlcv(existing), normalize_ohlcv(delta)
+    old = pd.Series(existing["Close"].to_numpy(), index=_utc_keys(existing["Date"]))
+    new = pd.Series(delta["Close"].to_numpy(), index=_utc_keys(delta["Date"]))
+    common = old.index.intersection(new.index)
+    common = common[common < old.index.max()]
+    if len(common) == 0:
+        return "no overlapping bars between cache and delta"
+    a, b = old.loc[common].to_numpy(), new.loc[common].to_numpy()
+    bad = ~np.isclose(a, b, rtol=rtol)
+    if bad.any():
+        return f"{int(bad.sum())}/{len(common)} overlapping closes revised"
+    return None
+
+
+def merge_series(existing: pd.DataFrame, delta: pd.DataFrame, keep_days: Optional[int] = None) -> pd.DataFrame:
+    """
+    Append delta to existing rows; on duplicate timestamps the delta wins. Sorted by date.
+    keep_days: drop rows older than this many days before the newest bar, so the
+    cache spans the same window a full download would.
+    """
+    merged = pd.concat([normalize_ohlcv(existing), normalize_ohlcv(delta)], ignore_index=True)
+    merged["_key"] = _utc_keys(merged["Date"])
+    merged = merged.drop_duplicates("_key", keep="last").sort_values("_key")
+    if keep_days is not None and len(merged):
+        cutoff = merged["_key"].iloc[-1] - keep_days * 86_400 * 10**9
+        merged = merged[merged["_key"] >= cutoff]
+    return merged.drop(columns="_key").reset_index(drop=True)
+
+
+def last_bar_time(df: pd.DataFrame) -> pd.Timestamp:
+    return pd.to_datetime(normalize_ohlcv(df)["Date"]).iloc[-1]
+
+
+def period_days(period: str) -> Optional[int]:
+    """yfinance-style period ('5y', '6mo', '730d') in calendar days; None for 'max'"""
+    for suffix, days in (("mo", 31), ("y", 366), ("wk", 7), ("d", 1)):
+        if period.endswith(suffix) and period[:-len(suffix)].isdigit():
+            return int(period[:-len(suffix)]) * days
+    return None
+
+
+def load_existing_frame(key: str, store_dir: str = STORE_DIR, json_path: str = JSON_CACHE) -> Optional[pd.DataFrame]:
+    """Cached rows for one series (store first, then JSON), normalized; None if not cached"""
+    if store_exists(store_dir):
+        manifest = read_manifest(store_dir)
+        if key in manifest["series"]:
+            return normalize_ohlcv(load_series_frame(key, store_dir, manifest=manifest, with_dates=True))
+    if os.path.exists(json_path):
+        with open(json_path, "r", encoding="utf-8") as f:
+            payload = json.load(f)
+        entry = payload.get("series", {}).get(key)
+        if entry and entry.get("data"):
+            return normalize_ohlcv(pd.DataFrame(entry["data"]))
+    return None
+
+
+def json_cache_to_series(payload: dict) -> Dict[str, Tuple[pd.DataFrame, dict]]:
+    """Legacy JSON payload -> {key: (DataFrame, meta)}"""
+    if "series" not in payload:
+        ohlc = payload.get("ohlc", {})
+        if not ohlc:
+            raise Exception("[ERROR] JSON cache has neither 'series' nor 'ohlc'")
+        df = pd.DataFrame({
+            "Date": pd.date_range(end=pd.Timestamp.now(tz="UTC").normalize(), periods=len(ohlc["close"]), freq="B"),
+            "Open": ohlc["open"], "High": ohlc["high"], "Low": ohlc["low"],
+            "Close": ohlc["close"], "Volume": ohlc.get("volume", [0] * len(ohlc["close"])),
+        })
+        return {"nifty_daily": (df, {"note": "converted from legacy ohlc cache; dates synthesized"})}
+    return {key: (pd.DataFrame(entry["data"]), entry.get("meta", {})) for key, entry in payload["series"].items()}
+
+
+def convert_json_cache(json_path: str = JSON_CACHE, store_dir: str = STORE_DIR) -> dict:
+    """One-shot converter: prediction_data.json -> columnar store"""
+    if not os.path.exists(json_path):
+        raise Exception(f"[ERROR] Cache not found: {json_path}")
+    with open(json_path, "r", encoding="utf-8") as f:
+        payload = json.load(f)
+    extras = {k: payload[k] for k in EXTRA_KEYS if k in payload}
+    manifest = write_market_store(json_cache_to_series(payload), extras=extras, store_dir=store_dir,
+                                  source=payload.get("source", "converted from prediction_data.json"))
+    return manifest
+
+
+if __name__ == "__main__":
+    src_path = sys.argv[1] if len(sys.argv) > 1 else JSON_CACHE
+    manifest = convert_json_cache(src_path)
+    total = 0
+    for key, entry in manifest["series"].items():
+        size = os.path.getsize(os.path.join(STORE_DIR, entry["file"]))
+        total += size
+        print(f"  {key:15s}: {entry['rows']:6d} rows  {entry['start']} -> {entry['end']}  ({size / 1024:.1f} KB)")
+    print(f"[OK] Market store written: {os.path.abspath(STORE_DIR)} ({total / 1024:.1f} KB total)")
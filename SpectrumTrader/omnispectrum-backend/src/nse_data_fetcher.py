@@ -7,155 +7,537 @@ More reliable than yfinance for Indian market data.
 Endpoints used:
 - https://www.nseindia.com/api/equity-stockIndices?index=NIFTY%2050
 - https://www.nseindia.com/api/historical/indicesHistory (historical OHLC)
+
+Session handling: one requests.Session with a pooled keep-alive adapter is
+shared by every call. Homepage cookies are loaded once and reused for
+COOKIE_TTL_S; a 401/403 from an API endpoint forces one refresh + retry.
+
+AsyncNSEDataFetcher exposes the same methods as coroutines plus a bulk
+get_indices_live([...]). Requests run on the same pooled session from a
+bounded worker pool, at most `concurrency` in flight. Each request has a
+deadline that covers its retries. 5xx, 429 and connection errors are
+retried with jittered exponential backoff (429 honours Retry-After), so a
+live snapshot of NIFTY, VIX and the sectors takes about one round trip.
+
+Historical ranges are split into CHUNK_DAYS date chunks on a fixed calendar
+grid and fetched in parallel. Each chunk is retried on its own, and the
+results are merged and de-duplicated by date. Chunks that lie entirely in
+the past are cached in data/nse_chunks/<host>/. An interrupted 10-year
+backfill resumes where it stopped, and later runs only fetch the current
+chunk.
+
+Usage:
+  python -m src.nse_data_fetcher                # full 730-day history
+  python -m src.nse_data_fetcher --incremental  # only bars after the cached history (+ overlap)
+  python -m src.nse_data_fetcher --concurrent   # live, historical and VIX in parallel
+  python -m src.nse_data_fetcher --async        # same over AsyncNSEDataFetcher (retries, deadlines)
+  python -m src.nse_data_fetcher --snapshot     # live quotes of NIFTY, VIX and sectors, one gather
+  python -m src.nse_data_fetcher --days 3650    # 10-year backfill (parallel chunks, resumable)
+  python -m src.nse_data_fetcher --base-url http://127.0.0.1:8765/api --home-url http://127.0.0.1:8765/
 """
 import os
 import json
 import time
+import random
+import asyncio
+import argparse
+import threading
 import requests
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from datetime import date, datetime, timedelta
 import pandas as pd
+from src.store_manifest import DATA_DIR
+from src.market_store import (
+    STORE_DIR, write_market_store, load_existing_frame, overlap_mismatch, merge_series, last_bar_time
+)
+
+HISTORY_DAYS = 730
+OVERLAP_DAYS = 10
+BASE_URL = "https://www.nseindia.com/api"
+HOME_URL = "https://www.nseindia.com"
+COOKIE_TTL_S = 300.0  # reuse homepage cookies for this long
+POOL_SIZE = 8
+AUTH_STATUSES = (401, 403)
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+REQUEST_TIMEOUT_S = 10.0
+HISTORY_TIMEOUT_S = 15.0
+DEADLINE_S = 30.0          # per request, retries included
+RETRIES = 3
+BACKOFF_S = 0.5            # first retry waits up to this long (full jitter), doubling after
+MAX_CONCURRENCY = 10       # in-flight requests of one AsyncNSEDataFetcher (one live snapshot)
+CHUNK_DAYS = 365           # days per indicesHistory request
+CHUNK_EPOCH = date(2000, 1, 1)  # chunk grid origin: boundaries stay put from run to run
+CHUNK_CACHE_DIR = os.path.join(DATA_DIR, "nse_chunks")
+SECTOR_INDICES = ["NIFTY BANK", "NIFTY FINANCIAL SERVICES", "NIFTY IT", "NIFTY PHARMA", "NIFTY AUTO",
+                  "NIFTY METAL", "NIFTY FMCG", "NIFTY ENERGY"]
+LIVE_INDICES = ["NIFTY 50", "INDIA VIX"] + SECTOR_INDICES
+
+
+def parse_index_quote(data, symbol) -> dict:
+    """equity-stockIndices JSON -> quote dict (the index row comes first)"""
+    row = data['data'][0]
+    return {
+        'symbol': symbol,
+        'price': float(row['last']),
+        'open': float(row['open']),
+        'high': float(row['dayHigh']),
+        'low': float(row['dayLow']),
+        'prev_close': float(row['previousClose']),
+        'change': float(row['change']),
+        'change_pct': float(row['pChange']),
+        'timestamp': datetime.now().isoformat(),
+        'source': 'NSE official'
+    }
+
+
+def parse_index_history(data) -> pd.DataFrame:
+    """indicesHistory JSON -> daily OHLC frame sorted by Date"""
+    records = data.get('data', {}).get('indexCloseOnlineRecords', [])
+    raw = pd.DataFrame(records, columns=['EOD_TIMESTAMP', 'EOD_OPEN_INDEX_VAL', 'EOD_HIGH_INDEX_VAL',
+                                         'EOD_LOW_INDEX_VAL', 'EOD_CLOSE_INDEX_VAL'])
+    df = pd.DataFrame({
+        'Date': pd.to_datetime(raw['EOD_TIMESTAMP']),
+        'Open': raw['EOD_OPEN_INDEX_VAL'].astype(float),
+        'High': raw['EOD_HIGH_INDEX_VAL'].astype(float),
+        'Low': raw['EOD_LOW_INDEX_VAL'].astype(float),
+        'Close': raw['EOD_CLOSE_INDEX_VAL'].astype(float),
+        'Volume': 0  # NSE doesn't provide volume for indices
+    })
+    return df.sort_values('Date').reset_index(drop=True)
+
+
+def history_params(days=HISTORY_DAYS, start_date=None, end_date=None, index="NIFTY 50") -> dict:
+    end_date = end_date or datetime.now()
+    if start_date is None:
+        start_date = end_date - timedelta(days=days)
+    return {'indexType': index, 'from': start_date.strftime('%d-%m-%Y'), 'to': end_date.strftime('%d-%m-%Y')}
+
+
+def history_chunks(start_date, end_date, chunk_days=CHUNK_DAYS):
+    """
+    [(from, to)] inclusive date ranges covering start_date..end_date: the
+    CHUNK_EPOCH-aligned grid cells they touch (last one clipped at end_date)
+    """
+    start, end = _as_date(start_date), _as_date(end_date)
+    first = (start - CHUNK_EPOCH).days // chunk_days
+    last = (end - CHUNK_EPOCH).days // chunk_days
+    return [(CHUNK_EPOCH + timedelta(days=i * chunk_days),
+             min(CHUNK_EPOCH + timedelta(days=(i + 1) * chunk_days - 1), end)) for i in range(first, last + 1)]
+
+
+def _as_date(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
+def merge_history(frames, start_date=None) -> pd.DataFrame:
+    """Concatenate chunk frames, de-duplicate by Date (later chunk wins), sort, trim to start_date"""
+    df = pd.concat([f for f in frames if f is not None and len(f)] or [parse_index_history({})], ignore_index=True)
+    df = df.drop_duplicates('Date', keep='last').sort_values('Date').reset_index(drop=True)
+    if start_date is not None:
+        df = df[df['Date'] >= pd.Timestamp(_as_date(start_date))].reset_index(drop=True)
+    return df
+
+
+def run_blocking(coro):
+    """
+    Run coro to completion from sync code. Inside a running event loop (where
+    asyncio.run refuses) it gets its own loop on a helper thread, so the sync
+    API keeps working there; the caller's loop is blocked meanwhile, as it was
+    by the old blocking requests.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="nse-sync") as pool:
+        return pool.submit(asyncio.run, coro).result()
+
+
+def _chunk_path(cache_dir, index, start, end):
+    slug = index.lower().replace(" ", "_")
+    return os.path.join(cache_dir, f"{slug}_{start:%Y%m%d}_{end:%Y%m%d}.json")
+
 
 class NSEDataFetcher:
-    def __init__(self):
+    def __init__(self, base_url=BASE_URL, home_url=HOME_URL, cookie_ttl=COOKIE_TTL_S,
+                 pool_size=POOL_SIZE, warmup_delay=1.0, cache_dir=CHUNK_CACHE_DIR):
+        self.pool_size = pool_size
+        self.cache_dir = cache_dir  # history chunk cache (None: off)
         self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
             'Accept': 'application/json',
             'Accept-Language': 'en-US,en;q=0.9',
             'Connection': 'keep-alive'
         })
-        self.base_url = "https://www.nseindia.com/api"
+        self.base_url = base_url.rstrip("/")
+        self.home_url = home_url
+        self.cookie_ttl = cookie_ttl
+        self.warmup_delay = warmup_delay
+        self._cookie_time = None
+        self._cookie_lock = threading.Lock()
+        self.stats = {"homepage_loads": 0, "requests": 0, "auth_refreshes": 0}
+        self._stats_lock = threading.Lock()  # counters are bumped from pool threads and the event loop
     
-    def _get_cookies(self):
-        """Get cookies from NSE homepage (required for API calls)"""
-        try:
-            self.session.get("https://www.nseindia.com", timeout=10)
-            time.sleep(1)
-        except Exception as e:
-            print(f"[WARN] Could not fetch NSE homepage cookies: {e}")
+    def _bump(self, name):
+        with self._stats_lock:
+            self.stats[name] = self.stats.get(name, 0) + 1
     
-    def get_nifty_live(self) -> dict:
-        """Fetch current NIFTY 50 price"""
+    def _get_cookies(self, force=False):
+        """Get cookies from NSE homepage (required for API calls); cached for cookie_ttl"""
+        with self._cookie_lock:
+            fresh = self._cookie_time is not None and time.monotonic() - self._cookie_time < self.cookie_ttl
+            if fresh and not force:
+                return
+            try:
+                self.session.get(self.home_url, timeout=10)
+                self._bump("homepage_loads")
+                time.sleep(self.warmup_delay)
+                self._cookie_time = time.monotonic()
+            except Exception as e:
+                print(f"[WARN] Could not fetch NSE homepage cookies: {e}")
+    
+    def _get(self, path, params=None, timeout=REQUEST_TIMEOUT_S):
+        """GET an API path with cached cookies; on 401/403 refresh cookies once and retry"""
         self._get_cookies()
-        
+        url = f"{self.base_url}/{path}"
+        response = self.session.get(url, params=params, timeout=timeout)
+        self._bump("requests")
+        if response.status_code in AUTH_STATUSES:
+            print(f"[INFO] NSE returned {response.status_code}; refreshing cookies")
+            self._bump("auth_refreshes")
+            self._get_cookies(force=True)
+            response = self.session.get(url, params=params, timeout=timeout)
+            self._bump("requests")
+        return response
+    
+    def get_index_live(self, index, symbol=None) -> dict:
+        """Fetch the current quote of one NSE index (e.g. 'NIFTY BANK')"""
         try:
-            url = f"{self.base_url}/equity-stockIndices?index=NIFTY%2050"
-            response = self.session.get(url, timeout=10)
+            response = self._get("equity-stockIndices", params={"index": index})
             
             if response.status_code == 200:
-                data = response.json()
-                nifty = data['data'][0]
-                
-                return {
-                    'symbol': 'NIFTY50',
-                    'price': float(nifty['last']),
-                    'open': float(nifty['open']),
-                    'high': float(nifty['dayHigh']),
-                    'low': float(nifty['dayLow']),
-                    'prev_close': float(nifty['previousClose']),
-                    'change': float(nifty['change']),
-                    'change_pct': float(nifty['pChange']),
-                    'timestamp': datetime.now().isoformat(),
-                    'source': 'NSE official'
-                }
+                return parse_index_quote(response.json(), symbol or index)
         except Exception as e:
-            print(f"[ERROR] NSE live fetch failed: {e}")
+            print(f"[ERROR] NSE live fetch failed ({index}): {e}")
         
         return None
     
-    def get_nifty_historical(self, days=730) -> pd.DataFrame:
-        """Fetch historical NIFTY OHLC from NSE"""
-        self._get_cookies()
-        
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=days)
-        
+    def get_nifty_live(self) -> dict:
+        """Fetch current NIFTY 50 price"""
+        return self.get_index_live("NIFTY 50", "NIFTY50")
+    
+    def get_nifty_historical(self, days=HISTORY_DAYS, start_date=None, chunk_days=CHUNK_DAYS) -> pd.DataFrame:
+        """
+        Fetch historical NIFTY OHLC from NSE (last `days`, or from start_date if
+        given) in parallel date chunks over this session; see AsyncNSEDataFetcher.
+        """
+        client = AsyncNSEDataFetcher(fetcher=self, concurrency=self.pool_size)
         try:
-            url = f"{self.base_url}/historical/indicesHistory"
-            params = {
-                'indexType': 'NIFTY 50',
-                'from': start_date.strftime('%d-%m-%Y'),
-                'to': end_date.strftime('%d-%m-%Y')
-            }
-            
-            response = self.session.get(url, params=params, timeout=15)
-            
-            if response.status_code == 200:
-                data = response.json()
-                records = data.get('data', {}).get('indexCloseOnlineRecords', [])
-                
-                parsed = []
-                for item in records:
-                    parsed.append({
-                        'Date': pd.to_datetime(item['EOD_TIMESTAMP']),
-                        'Open': float(item['EOD_OPEN_INDEX_VAL']),
-                        'High': float(item['EOD_HIGH_INDEX_VAL']),
-                        'Low': float(item['EOD_LOW_INDEX_VAL']),
-                        'Close': float(item['EOD_CLOSE_INDEX_VAL']),
-                        'Volume': 0  # NSE doesn't provide volume for indices
-                    })
-                
-                df = pd.DataFrame(parsed)
-                df = df.sort_values('Date').reset_index(drop=True)
-                
-                print(f"[OK] NSE historical: {len(df)} days")
-                return df
-        
-        except Exception as e:
-            print(f"[ERROR] NSE historical fetch failed: {e}")
-        
-        return None
+            return run_blocking(client.get_nifty_historical(days, start_date, chunk_days))
+        finally:
+            client.close()
     
     def get_indiavix_live(self) -> dict:
         """Fetch current India VIX"""
-        self._get_cookies()
-        
+        quote = self.get_index_live("INDIA VIX", "INDIAVIX")
+        return _vix_quote(quote) if quote else None
+
+
+def _vix_quote(quote):
+    return {k: quote[k] for k in ('symbol', 'price', 'change', 'change_pct', 'timestamp', 'source')}
+
+
+class AsyncNSEDataFetcher:
+    """
+    asyncio client over NSEDataFetcher's pooled keep-alive session (cookies,
+    401/403 refresh and stats are shared with it). Blocking requests run in a
+    dedicated pool of `concurrency` threads, gated by a semaphore, so
+    concurrency is not capped by the default executor (cpu + 4 threads).
+    Methods return None on failure and print an [ERROR], like the sync client.
+    """
+
+    def __init__(self, base_url=BASE_URL, home_url=HOME_URL, cookie_ttl=COOKIE_TTL_S, concurrency=MAX_CONCURRENCY,
+                 deadline=DEADLINE_S, retries=RETRIES, backoff=BACKOFF_S, warmup_delay=1.0, seed=None, fetcher=None,
+                 cache_dir=CHUNK_CACHE_DIR):
+        self.fetcher = fetcher or NSEDataFetcher(base_url, home_url, cookie_ttl, pool_size=concurrency,
+                                                 warmup_delay=warmup_delay, cache_dir=cache_dir)
+        self.concurrency = concurrency
+        self.deadline = deadline
+        self.retries = retries
+        self.backoff = backoff
+        self.rng = random.Random(seed)
+        self.stats = self.fetcher.stats
+        with self.fetcher._stats_lock:
+            for key in ("retries", "timeouts", "chunks", "chunk_cache_hits"):
+                self.stats.setdefault(key, 0)
+        self._pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="nse-async")
+        self._semaphores = {}
+
+    def close(self):
+        self._pool.shutdown(wait=False)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+    def _semaphore(self):
+        # one per event loop: asyncio primitives bind to the loop that first uses them
+        loop = asyncio.get_running_loop()
+        if loop not in self._semaphores:
+            self._semaphores[loop] = asyncio.Semaphore(self.concurrency)
+        return self._semaphores[loop]
+
+    def _retry_delay(self, attempt, response):
+        """Full-jitter backoff, after the server's Retry-After if it sent one (spreads 429'd bursts)"""
+        jitter = self.rng.uniform(0, self.backoff * 2 ** attempt)
+        retry_after = response.headers.get("Retry-After") if response is not None else None
         try:
-            url = f"{self.base_url}/equity-stockIndices?index=India%20VIX"
-            response = self.session.get(url, timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                vix = data['data'][0]
-                
-                return {
-                    'symbol': 'INDIAVIX',
-                    'price': float(vix['last']),
-                    'change': float(vix['change']),
-                    'change_pct': float(vix['pChange']),
-                    'timestamp': datetime.now().isoformat(),
-                    'source': 'NSE official'
-                }
+            return float(retry_after) + jitter if retry_after else jitter
+        except ValueError:
+            return jitter
+
+    async def request(self, path, params=None, timeout=REQUEST_TIMEOUT_S, deadline=None):
+        """GET path and return the decoded JSON; retries 5xx / 429 / connection errors until the deadline"""
+        loop = asyncio.get_running_loop()
+        expires = loop.time() + (deadline or self.deadline)
+        attempt = 0
+        while True:
+            remaining = expires - loop.time()
+            response, error = None, None
+            async with self._semaphore():
+                try:
+                    response = await asyncio.wait_for(
+                        loop.run_in_executor(self._pool, self.fetcher._get, path, params, min(timeout, remaining)),
+                        remaining)
+                except asyncio.TimeoutError:
+                    self.fetcher._bump("timeouts")
+                    error = f"deadline {deadline or self.deadline:.1f}s exceeded"
+                except requests.RequestException as e:
+                    error = f"{type(e).__name__}: {e}"
+            if response is not None:
+                if response.status_code == 200:
+                    return response.json()
+                error = f"HTTP {response.status_code}"
+                if response.status_code not in RETRY_STATUSES:
+                    raise RuntimeError(f"{path}: {error}")
+            delay = self._retry_delay(attempt, response)
+            if attempt >= self.retries or loop.time() + delay >= expires:
+                raise RuntimeError(f"{path}: {error} after {attempt + 1} attempt(s)")
+            attempt += 1
+            self.fetcher._bump("retries")
+            await asyncio.sleep(delay)
+
+    async def get_index_live(self, index, symbol=None) -> dict:
+        try:
+            return parse_index_quote(await self.request("equity-stockIndices", {"index": index}), symbol or index)
         except Exception as e:
-            print(f"[ERROR] India VIX fetch failed: {e}")
-        
+            print(f"[ERROR] NSE live fetch failed ({index}): {e}")
+        return None
+
+    async def get_indices_live(self, indices=LIVE_INDICES) -> dict:
+        """{index: quote or None} for every index, fetched concurrently"""
+        quotes = await asyncio.gather(*[self.get_index_live(index) for index in indices])
+        return dict(zip(indices, quotes))
+
+    async def get_nifty_live(self) -> dict:
+        return await self.get_index_live("NIFTY 50", "NIFTY50")
+
+    async def get_indiavix_live(self) -> dict:
+        quote = await self.get_index_live("INDIA VIX", "INDIAVIX")
+        return _vix_quote(quote) if quote else None
+
+    async def _history_chunk(self, index, start, end):
+        """One chunk's daily frame; chunks that ended before today are read from / written to the cache"""
+        cache_dir = self.fetcher.cache_dir
+        if cache_dir:
+            # one subdirectory per API host, so stand-in servers never feed the real cache
+            cache_dir = os.path.join(cache_dir, urlsplit(self.fetcher.base_url).netloc.replace(":", "_"))
+        path = _chunk_path(cache_dir, index, start, end) if cache_dir else None
+        complete = end < date.today()
+        if path and complete and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                records = json.load(f)
+            self.fetcher._bump("chunk_cache_hits")
+        else:
+            data = await self.request("historical/indicesHistory", history_params(start_date=start, end_date=end,
+                                                                                  index=index),
+                                      timeout=HISTORY_TIMEOUT_S)
+            records = data.get('data', {}).get('indexCloseOnlineRecords', [])
+            self.fetcher._bump("chunks")
+            if path and complete:
+                os.makedirs(cache_dir, exist_ok=True)
+                tmp_path = f"{path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(records, f)
+                os.replace(tmp_path, path)
+        return parse_index_history({'data': {'indexCloseOnlineRecords': records}})
+
+    async def get_index_history(self, index="NIFTY 50", days=HISTORY_DAYS, start_date=None, end_date=None,
+                                chunk_days=CHUNK_DAYS) -> pd.DataFrame:
+        """
+        Daily OHLC of index from start_date (default: `days` back) to end_date
+        (default: now), one request per history_chunks cell, all in flight at
+        once under the semaphore. Every chunk gets its own retries and
+        deadline; if any still fails, the completed ones stay cached and the
+        call raises.
+        """
+        end_date = end_date or datetime.now()
+        start_date = start_date or end_date - timedelta(days=days)
+        chunks = history_chunks(start_date, end_date, chunk_days)
+        frames = await asyncio.gather(*[self._history_chunk(index, a, b) for a, b in chunks],
+                                      return_exceptions=True)
+        failed = [(chunk, f) for chunk, f in zip(chunks, frames) if isinstance(f, BaseException)]
+        if failed:
+            (a, b), exc = failed[0]
+            raise RuntimeError(f"{len(failed)}/{len(chunks)} chunk(s) failed, first {a:%Y-%m-%d}..{b:%Y-%m-%d}: {exc}")
+        return merge_history(frames, start_date)
+
+    async def get_nifty_historical(self, days=HISTORY_DAYS, start_date=None, chunk_days=CHUNK_DAYS) -> pd.DataFrame:
+        try:
+            hits, fetched = self.stats["chunk_cache_hits"], self.stats["chunks"]
+            df = await self.get_index_history("NIFTY 50", days, start_date, chunk_days=chunk_days)
+            print(f"[OK] NSE historical: {len(df)} days ({self.stats['chunks'] - fetched} chunk(s) fetched, "
+                  f"{self.stats['chunk_cache_hits'] - hits} cached)")
+            return df
+        except Exception as e:
+            print(f"[ERROR] NSE historical fetch failed: {e}")
         return None
 
+    def bind(self, loop):
+        """Blocking NSEDataFetcher-style view for sync helpers run in a worker thread while loop runs"""
+        return _BoundFetcher(self, loop)
+
+
+class _BoundFetcher:
+    def __init__(self, client, loop):
+        self.client, self.loop = client, loop
+
+    def get_nifty_historical(self, days=HISTORY_DAYS, start_date=None):
+        return asyncio.run_coroutine_threadsafe(self.client.get_nifty_historical(days, start_date), self.loop).result()
+
+
+async def fetch_live_async(client, output_path, store_dir, incremental=False, days=HISTORY_DAYS):
+    """Live NIFTY, VIX and the (incremental) history in one gather over client"""
+    loop = asyncio.get_running_loop()
+    history = loop.run_in_executor(None, fetch_nifty_history, client.bind(loop), output_path, store_dir,
+                                   incremental, days)
+    nifty_live, vix_live, nifty_hist = await asyncio.gather(client.get_nifty_live(), client.get_indiavix_live(),
+                                                            history)
+    return nifty_live, nifty_hist, vix_live
+
+
+def print_snapshot(client, indices=LIVE_INDICES):
+    """Live quotes of indices in one concurrent round"""
+    async def run():
+        async with client:
+            return await client.get_indices_live(indices)
+    t0 = time.monotonic()
+    quotes = asyncio.run(run())
+    print(f"[OK] {sum(q is not None for q in quotes.values())}/{len(indices)} quotes in "
+          f"{time.monotonic() - t0:.2f}s | API requests {client.stats['requests']}, retries {client.stats['retries']}, "
+          f"timeouts {client.stats['timeouts']}")
+    for index, quote in quotes.items():
+        if quote:
+            print(f"  {index:26s} {quote['price']:>10.2f}  {quote['change_pct']:+6.2f}%")
+        else:
+            print(f"  {index:26s} {'unavailable':>10s}")
+    return quotes
+
+
+def fetch_nifty_history(fetcher, output_path, store_dir, incremental=False, days=HISTORY_DAYS):
+    """
+    NIFTY daily history, either the full `days` window or (incremental)
+    only the bars after the cached history plus an overlap. The overlap must
+    match the cache, otherwise the full window is downloaded again.
+    """
+    cached = load_existing_frame("nifty_daily", store_dir, output_path) if incremental else None
+    if cached is not None and len(cached) >= 100:
+        start = (last_bar_time(cached) - pd.Timedelta(days=OVERLAP_DAYS)).tz_localize(None).to_pydatetime()
+        print(f"    incremental from {start:%Y-%m-%d} ({len(cached)} bars cached)")
+        delta = fetcher.get_nifty_historical(start_date=start)
+        if delta is not None and len(delta):
+            reason = overlap_mismatch(cached, delta)
+            if reason is None:
+                merged = merge_series(cached, delta, keep_days=days)
+                print(f"    [OK] fetched {len(delta)} bars, cache now {len(merged)} (was {len(cached)})")
+                return merged
+            print(f"    [WARN] {reason}; re-downloading {days} days")
+        else:
+            print(f"    [WARN] delta fetch failed; re-downloading {days} days")
+    elif incremental:
+        print("    [INFO] no usable cached history; full download")
+    
+    nifty_hist = fetcher.get_nifty_historical(days=days)
+    if nifty_hist is None or len(nifty_hist) < 100:
+        raise Exception("[FATAL] Cannot fetch historical NIFTY")
+    return nifty_hist
+
 
-def fetch_all_nse_data(output_path="data/prediction_data.json"):
+def fetch_all_nse_data(output_path="data/prediction_data.json", store_dir=STORE_DIR, incremental=False,
+                       concurrent=False, fetcher=None, asynchronous=False, days=HISTORY_DAYS):
     """
     Fetch complete market data from NSE official APIs.
-    Writes canonical cache JSON.
+    Writes canonical cache JSON and the columnar market store.
+    incremental=True appends new daily bars to the cached history instead of
+    downloading all `days` again (default HISTORY_DAYS; longer ranges are
+    fetched as parallel, cached chunks). concurrent=True issues the live,
+    historical and VIX requests in parallel over the shared session.
+    asynchronous=True does the same through AsyncNSEDataFetcher (jittered
+    retries and per-request deadlines).
     """
     print("\n" + "=" * 75)
     print("OmniSpectrum: NSE Official Data Fetcher (Alternative)")
     print("=" * 75)
     
-    fetcher = NSEDataFetcher()
-    
-    print("\n[1/3] Fetching NIFTY 50 live...")
-    nifty_live = fetcher.get_nifty_live()
-    if not nifty_live:
-        raise Exception("[FATAL] Cannot fetch live NIFTY")
-    print(f"    ₹{nifty_live['price']:.2f} (Change: {nifty_live['change_pct']:.2f}%)")
+    fetcher = fetcher or NSEDataFetcher()
+    t0 = time.monotonic()
     
-    print("\n[2/3] Fetching NIFTY 50 historical (730 days)...")
-    nifty_hist = fetcher.get_nifty_historical(days=730)
-    if nifty_hist is None or len(nifty_hist) < 100:
-        raise Exception("[FATAL] Cannot fetch historical NIFTY")
+    if asynchronous:
+        print("\n[1-3/3] Fetching NIFTY 50 live, historical and India VIX (async)...")
+        client = AsyncNSEDataFetcher(fetcher=fetcher, concurrency=fetcher.pool_size)
+        try:
+            nifty_live, nifty_hist, vix_live = asyncio.run(fetch_live_async(client, output_path, store_dir,
+                                                                               incremental, days))
+        finally:
+            client.close()
+        if not nifty_live:
+            raise Exception("[FATAL] Cannot fetch live NIFTY")
+        print(f"    ₹{nifty_live['price']:.2f} (Change: {nifty_live['change_pct']:.2f}%)")
+    elif concurrent:
+        print("\n[1-3/3] Fetching NIFTY 50 live, historical and India VIX concurrently...")
+        with ThreadPoolExecutor(max_workers=3, thread_name_prefix="nse") as pool:
+            live_f = pool.submit(fetcher.get_nifty_live)
+            hist_f = pool.submit(fetch_nifty_history, fetcher, output_path, store_dir, incremental, days)
+            vix_f = pool.submit(fetcher.get_indiavix_live)
+            nifty_live, vix_live = live_f.result(), vix_f.result()
+            nifty_hist = hist_f.result()
+        if not nifty_live:
+            raise Exception("[FATAL] Cannot fetch live NIFTY")
+        print(f"    ₹{nifty_live['price']:.2f} (Change: {nifty_live['change_pct']:.2f}%)")
+    else:
+        print("\n[1/3] Fetching NIFTY 50 live...")
+        nifty_live = fetcher.get_nifty_live()
+        if not nifty_live:
+            raise Exception("[FATAL] Cannot fetch live NIFTY")
+        print(f"    ₹{nifty_live['price']:.2f} (Change: {nifty_live['change_pct']:.2f}%)")
+        
+        print(f"\n[2/3] Fetching NIFTY 50 historical ({days} days)...")
+        nifty_hist = fetch_nifty_history(fetcher, output_path, store_dir, incremental=incremental, days=days)
+        
+        print("\n[3/3] Fetching India VIX...")
+        vix_live = fetcher.get_indiavix_live()
     
-    print("\n[3/3] Fetching India VIX...")
-    vix_live = fetcher.get_indiavix_live()
+    print(f"    fetched in {time.monotonic() - t0:.2f}s | homepage loads {fetcher.stats['homepage_loads']}, "
+          f"API requests {fetcher.stats['requests']}, cookie refreshes {fetcher.stats['auth_refreshes']}"
+          + (f", retries {fetcher.stats['retries']}, timeouts {fetcher.stats['timeouts']}" if asynchronous else ""))
     if not vix_live:
         print("    [WARN] VIX unavailable, using default 15.0")
         vix_live = {'price': 15.0}
@@ -171,7 +553,7 @@ def fetch_all_nse_data(output_path="data/prediction_data.json"):
             "nifty_daily": {
                 "meta": {
                     "ticker": "NIFTY50",
-                    "period": "730d",
+                    "period": f"{days}d",
                     "interval": "1d",
                     "source": "NSE official",
                     "purpose": "Training history, technical indicators"
@@ -198,6 +580,14 @@ def fetch_all_nse_data(output_path="data/prediction_data.json"):
         json.dump(cache, f, indent=2, default=str)
     
     print(f"\n[OK] Cache written: {output_path}")
+    
+    write_market_store(
+        {"nifty_daily": (nifty_hist, cache["series"]["nifty_daily"]["meta"])},
+        extras={"spot": cache["spot"], "vix": cache["vix"]},
+        store_dir=store_dir,
+        source=cache["source"],
+    )
+    print(f"[OK] Market store written: {store_dir}")
     print("=" * 75)
     print(f"Spot: ₹{nifty_live['price']:.2f}")
     print(f"VIX: {vix_live['price']:.2f}")
@@ -206,8 +596,27 @@ def fetch_all_nse_data(output_path="data/prediction_data.json"):
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OmniSpectrum NSE official data fetcher")
+    parser.add_argument("--incremental", action="store_true",
+                        help=f"Fetch only new daily bars (+{OVERLAP_DAYS}d overlap) and append to the cache")
+    parser.add_argument("--concurrent", action="store_true", help="Fetch live, historical and VIX in parallel")
+    parser.add_argument("--async", dest="asynchronous", action="store_true",
+                        help="Fetch through AsyncNSEDataFetcher (retries, per-request deadlines)")
+    parser.add_argument("--days", type=int, default=HISTORY_DAYS,
+                        help=f"Daily history to keep (default {HISTORY_DAYS}; e.g. 3650 for a 10-year backfill)")
+    parser.add_argument("--snapshot", action="store_true", help="Print live quotes of NIFTY, VIX and sectors and exit")
+    parser.add_argument("--base-url", default=BASE_URL, help="API base URL (e.g. a local stand-in server)")
+    parser.add_argument("--home-url", default=HOME_URL, help="Homepage URL used to obtain cookies")
+    parser.add_argument("--cookie-ttl", type=float, default=COOKIE_TTL_S, help="Seconds to reuse homepage cookies")
+    args = parser.parse_args()
     try:
-        fetch_all_nse_data()
+        if args.snapshot:
+            print_snapshot(AsyncNSEDataFetcher(base_url=args.base_url, home_url=args.home_url, cookie_ttl=args.cookie_ttl))
+        else:
+            fetcher = NSEDataFetcher(base_url=args.base_url, home_url=args.home_url, cookie_ttl=args.cookie_ttl,
+                                     pool_size=MAX_CONCURRENCY if args.asynchronous else POOL_SIZE)
+            fetch_all_nse_data(incremental=args.incremental, concurrent=args.concurrent, fetcher=fetcher,
+                               asynchronous=args.asynchronous, days=args.days)
     except Exception as e:
         print(f"\n[ERROR] {e}\n")
         raise
@@ -0,0 +1,317 @@
+"""
+OmniSpectrum: GFE Pattern Index
+===============================
+Nearest-neighbour search over the GFE latent of every historical 20-bar
+geometry window (build_gfe_geometry -> GFE_AE.enc).
+
+Layout (data/pattern_index/):
+  manifest.json      rows, latent dim, generation, last bar date, hash of gfe_ae.pt
+  latents.<gen>.f32  (rows, dim) float32, memory-mapped for queries
+  close.<gen>.f64    close of the bar each window ends on (forward outcomes)
+  ts.<gen>.i8        bar timestamps (ns since epoch, UTC)
+
+Rows are appended in bar order. sync() encodes only bars newer than the last
+indexed one; the index is rebuilt when the GFE weights change or cached
+history no longer lines up with it. The manifest is written last and is the
+only commit point: an append only writes past manifest["rows"] (an interrupted
+append is ignored and overwritten), and a rebuild writes a new generation of
+files next to the one readers may have mapped, deleting the old generation
+only after the manifest swap. Files shorter than the manifest says are treated
+as no index, so sync() rebuilds.
+
+Query latents come from PatternIndex.encode, i.e. the same eager float GFE
+encoder the rows were built with, never the scripted bundle or int8 encoders
+the fusion model runs on, so distances compare like with like.
+
+Queries are brute-force squared-L2 over the memory-mapped latents
+(precomputed row norms, one matrix-vector product, argpartition), which is
+well under a millisecond for daily history.
+
+Usage:
+  python -m src.pattern_index            # build / sync from the market cache
+  python -m src.pattern_index --rebuild
+"""
+import os
+import sys
+import re
+import json
+import hashlib
+from datetime import timedelta, timezone
+import numpy as np
+import pandas as pd
+import torch
+from src.features import load_cache, load_history, build_gfe_geometries
+
+INDEX_DIR = os.path.join("data", "pattern_index")
+MANIFEST = "manifest.json"
+GFE_WINDOW = 20
+EXCLUDE_RECENT = GFE_WINDOW  # skip matches whose window overlaps the query's
+OUTCOME_HORIZONS = (1, 5, 21)
+ENCODE_BATCH = 4096
+DATA_FILES = {"latents": ("latents", "f32"), "close": ("close", "f64"), "ts": ("ts", "i8")}
+_GENERATION_FILE = re.compile(r"^(latents\.f32|close\.f64|ts\.i8|(latents|close|ts)\.(\d+)\.(f32|f64|i8))$")
+
+
+def _file_hash(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        h.update(f.read())
+    return h.hexdigest()
+
+
+def load_gfe_encoder(model_dir="models"):
+    from src.train import GFE_AE
+    gfe = GFE_AE()
+    gfe.load_state_dict(torch.load(os.path.join(model_dir, "gfe_ae.pt"), map_location="cpu"))
+    return gfe.enc.eval()
+
+
+def encode_windows(enc, feats, indices):
+    """GFE latents (N, dim) float32 for the 20-bar windows ending at indices"""
+    out = []
+    with torch.no_grad():
+        for lo in range(0, len(indices), ENCODE_BATCH):
+            geo = build_gfe_geometries(feats, indices[lo:lo + ENCODE_BATCH], window=GFE_WINDOW)
+            out.append(enc(torch.as_tensor(geo, dtype=torch.float32)).numpy())
+    return np.concatenate(out).astype(np.float32) if out else np.empty((0, 0), np.float32)
+
+
+def _utc_ns(dates):
+    dates = pd.DatetimeIndex(dates)
+    if dates.tz is not None:
+        dates = dates.tz_convert("UTC").tz_localize(None)
+    return dates.values.astype("datetime64[ns]").astype(np.int64)
+
+
+class PatternIndex:
+    def __init__(self, index_dir=INDEX_DIR):
+        self.index_dir = index_dir
+        self.manifest = None
+        self.latents = None
+        self.close = None
+        self.ts = None
+        self._sqnorm = None
+        self._mtime = None
+        self._encoder = None
+
+    # ------------------------------------------------------------------ storage
+    def _path(self, name):
+        return os.path.join(self.index_dir, name)
+
+    def _files(self, manifest):
+        """Data file names of a manifest's generation (plain names for pre-generation indexes)"""
+        gen = manifest.get("generation")
+        return {key: f"{stem}.{ext}" if gen is None else f"{stem}.{gen}.{ext}" for key, (stem, ext) in DATA_FILES.items()}
+
+    def open(self):
+        """(Re)map the index files; returns False if there is no (usable) index yet"""
+        path = self._path(MANIFEST)
+        if not os.path.exists(path):
+            return False
+        mtime = os.path.getmtime(path)
+        if self._mtime == mtime:
+            return True
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        rows, dim = manifest["rows"], manifest["dim"]
+        files = self._files(manifest)
+        sizes = {"latents": rows * dim * 4, "close": rows * 8, "ts": rows * 8}
+        short = [files[k] for k, n in sizes.items()
+                 if n and (not os.path.exists(self._path(files[k])) or os.path.getsize(self._path(files[k])) < n)]
+        if short:
+            print(f"[WARN] Pattern index files shorter than manifest ({', '.join(short)}); treating as no index")
+            self.manifest, self._mtime = None, None
+            return False
+        self.manifest = manifest
+        if rows:
+            self.latents = np.memmap(self._path(files["latents"]), dtype=np.float32, mode="r", shape=(rows, dim))
+            self.close = np.memmap(self._path(files["close"]), dtype=np.float64, mode="r", shape=(rows,))
+            self.ts = np.memmap(self._path(files["ts"]), dtype=np.int64, mode="r", shape=(rows,))
+            self._sqnorm = np.einsum("ij,ij->i", self.latents, self.latents)
+        else:
+            self.latents = np.empty((0, dim), np.float32)
+            self.close, self.ts, self._sqnorm = np.empty(0), np.empty(0, np.int64), np.empty(0, np.float32)
+        self._mtime = mtime
+        return True
+
+    @property
+    def rows(self):
+        return self.manifest["rows"] if self.manifest else 0
+
+    def _next_generation(self):
+        gens = [int(m.group(3)) for m in map(_GENERATION_FILE.match, os.listdir(self.index_dir)) if m and m.group(3)]
+        return max(gens + [(self.manifest or {}).get("generation") or 0]) + 1
+
+    def _write(self, latents, close, ts, meta, append):
+        """
+        Append to the current generation's files, or write a new generation
+        (append=False); then replace the manifest and drop other generations
+        """
+        os.makedirs(self.index_dir, exist_ok=True)
+        keep = self.rows if append else 0
+        generation = self.manifest.get("generation") if append else self._next_generation()
+        files = self._files({"generation": generation})
+        for key, arr in (("latents", latents), ("close", close), ("ts", ts)):
+            path = self._path(files[key])
+            mode = "r+b" if append and os.path.exists(path) else "wb"
+            with open(path, mode) as f:
+                # appends only cut bytes past manifest["rows"], which no reader maps
+                f.truncate(keep * arr.itemsize * (arr.shape[1] if arr.ndim == 2 else 1))
+                f.seek(0, os.SEEK_END)
+                f.write(np.ascontiguousarray(arr).tobytes())
+        manifest = {
+            "rows": keep + len(ts),
+            "dim": int(latents.shape[1]),
+            "generation": generation,
+            "window": GFE_WINDOW,
+            "last_ts": int(ts[-1]) if len(ts) else (self.manifest or {}).get("last_ts"),
+            "utc_offset_min": meta.get("utc_offset_min"),
+            "gfe_sha256": meta["gfe_sha256"],
+            "updated": pd.Timestamp.now(tz="UTC").isoformat(),
+        }
+        tmp = self._path(f".{MANIFEST}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, self._path(MANIFEST))
+        # readers still mapping the old generation keep their pages (POSIX);
+        # where the OS refuses to delete a mapped file it is retried next rebuild
+        current = set(files.values())
+        for name in os.listdir(self.index_dir):
+            if _GENERATION_FILE.match(name) and name not in current:
+                try:
+                    os.remove(self._path(name))
+                except OSError:
+                    pass
+        self._mtime = None
+        self.open()
+
+    # ------------------------------------------------------------------ build / sync
+    def sync(self, feats, dates, model_dir="models", rebuild=False):
+        """
+        Bring the index up to date with history. Appends only the new bars;
+        rebuilds on rebuild=True, new GFE weights, or history that no longer
+        matches the indexed rows. Returns the number of rows encoded.
+        """
+        gfe_hash = _file_hash(os.path.join(model_dir, "gfe_ae.pt"))
+        ts = _utc_ns(dates)
+        close = feats["Close"].to_numpy(dtype=np.float64)
+        first = GFE_WINDOW - 1
+        meta = {"gfe_sha256": gfe_hash,
+                "utc_offset_min": int(dates[0].utcoffset().total_seconds() // 60) if dates.tz is not None else None}
+
+        start = first
+        if not rebuild and self.open() and self.manifest["gfe_sha256"] == gfe_hash and self.rows:
+            pos = int(np.searchsorted(ts, self.manifest["last_ts"]))
+            consistent = (pos < len(ts) and ts[pos] == self.manifest["last_ts"]
+                          and pos - first + 1 == self.rows
+                          and np.allclose(close[first:pos + 1], self.close, rtol=1e-6))
+            if consistent:
+                start = pos + 1
+            else:
+                print("[WARN] Pattern index does not match cached history; rebuilding")
+        append = start > first
+        indices = np.arange(start, len(feats))
+        if len(indices) == 0:
+            return 0
+        latents = encode_windows(load_gfe_encoder(model_dir), feats, indices)
+        self._write(latents, close[indices], ts[indices], meta, append=append)
+        return len(indices)
+
+    # ------------------------------------------------------------------ queries
+    def encode(self, geometries, model_dir="models"):
+        """(N, dim) query latents for (N, 20) GFE geometries, with the encoder the index was built with"""
+        key = (model_dir, self.manifest["gfe_sha256"])
+        if self._encoder is None or self._encoder[0] != key:
+            self._encoder = (key, load_gfe_encoder(model_dir))
+        with torch.no_grad():
+            return self._encoder[1](torch.as_tensor(np.asarray(geometries), dtype=torch.float32)).numpy()
+
+    def search(self, z, k=20, exclude_recent=EXCLUDE_RECENT, before=None):
+        """
+        Top-k rows nearest to latent z: (row indices, L2 distances), nearest first.
+        Only rows < before - exclude_recent are candidates (default: the whole
+        index minus the last exclude_recent rows, i.e. windows overlapping now).
+        """
+        limit = (self.rows if before is None else before) - exclude_recent
+        if limit <= 0:
+            return np.empty(0, np.int64), np.empty(0)
+        z = np.asarray(z, dtype=np.float32)
+        d2 = self._sqnorm[:limit] - 2.0 * (self.latents[:limit] @ z) + float(z @ z)
+        k = min(k, limit)
+        top = np.argpartition(d2, k - 1)[:k]
+        top = top[np.argsort(d2[top])]
+        return top, np.sqrt(np.maximum(d2[top], 0.0))
+
+    def outcomes(self, rows, horizons=OUTCOME_HORIZONS):
+        """Forward returns after each matched bar ({h: array}, NaN past the end of the index)"""
+        rows = np.asarray(rows)
+        out = {}
+        for h in horizons:
+            fwd = rows + h
+            valid = fwd < self.rows
+            ret = np.full(len(rows), np.nan)
+            ret[valid] = self.close[fwd[valid]] / self.close[rows[valid]] - 1.0
+            out[h] = ret
+        return out
+
+    def dates(self, rows):
+        """Bar dates of index rows, in the source's UTC offset"""
+        offset = self.manifest.get("utc_offset_min")
+        dates = pd.to_datetime(np.asarray(self.ts)[rows], utc=offset is not None)
+        return dates.tz_convert(timezone(timedelta(minutes=offset))) if offset is not None else dates
+
+    def matches(self, z, k=20, exclude_recent=EXCLUDE_RECENT):
+        """Top-k matches for z as dicts: date, distance, similarity, forward returns"""
+        rows, dist = self.search(z, k, exclude_recent)
+        fwd = self.outcomes(rows)
+        dates = self.dates(rows)
+        return [{
+            "date": str(dates[i].date()),
+            "distance": round(float(dist[i]), 6),
+            "similarity": round(float(similarity(dist[i])), 4),
+            **{f"fwd_return_{h}d": (None if np.isnan(fwd[h][i]) else round(float(fwd[h][i]), 6)) for h in fwd},
+        } for i in range(len(rows))]
+
+
+def similarity(distance):
+    """Map L2 distance to (0, 1]: 1 for an identical latent"""
+    return 1.0 / (1.0 + np.asarray(distance))
+
+
+_shared = {}
+
+
+def get_index(cached_data=None, index_dir=INDEX_DIR, model_dir="models"):
+    """
+    Process-wide PatternIndex, synced with the market cache. The sync only
+    encodes new bars, and is skipped entirely when the cached history's
+    fingerprint (rows + last date) is unchanged since the previous call.
+    """
+    cached_data = cached_data if cached_data is not None else load_cache()
+    index = _shared.get(index_dir) or PatternIndex(index_dir)
+    _shared[index_dir] = index
+    fingerprint = _history_fingerprint(cached_data)
+    gfe_mtime = os.path.getmtime(os.path.join(model_dir, "gfe_ae.pt"))
+    if index.open() and fingerprint is not None and _shared.get((index_dir, "synced")) == (fingerprint, gfe_mtime):
+        return index
+    feats, dates = load_history(cached_data)
+    added = index.sync(feats, dates, model_dir)
+    if added:
+        print(f"[INFO] Pattern index: +{added} windows ({index.rows} total)")
+    _shared[(index_dir, "synced")] = (fingerprint, gfe_mtime)
+    return index
+
+
+def _history_fingerprint(cached_data, key="nifty_daily"):
+    if "manifest" in cached_data:
+        entry = cached_data["manifest"]["series"].get(key, {})
+        return (entry.get("rows"), entry.get("end"), entry.get("sha256"))
+    rows = cached_data.get("series", {}).get(key, {}).get("data")
+    return (len(rows), rows[-1].get("Date")) if rows else None
+
+
+if __name__ == "__main__":
+    index = PatternIndex()
+    feats, dates = load_history()
+    added = index.sync(feats, dates, rebuild="--rebuild" in sys.argv)
+    print(f"[OK] Pattern index: {index.rows} windows ({added} encoded) -> {INDEX_DIR}")
@@ -0,0 +1,153 @@
+"""
+OmniSpectrum: Int8 Encoder Quantization
+=======================================
+Optional dynamically quantized encoders for CPU-only hosts
+(torch.ao.quantization.quantize_dynamic on every LSTM and Linear layer;
+the VSE convolutions stay float).
+
+Before an int8 encoder is used it is compared with the float encoders on the
+most recent CHECK_BARS windows of history:
+  - embedding drift: relative L2 error per window
+  - directional_tilt: max abs error of the fusion MLP probabilities
+  - volatility_expansion_prob: max abs error of the LightGBM output
+If any error exceeds its tolerance the quantized model is refused and
+inference stays on float.
+
+Accepted models are cached as a traced graph (models/encoders_int8.pt) with a
+report (models/encoders_int8.json) keyed to the float state dicts they were
+built from, so the check only reruns after retraining.
+
+Usage:
+  python -m src.quantize             # build + check, print the report
+  python run_inference.py --quantize int8
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import numpy as np
+import torch
+import torch.nn as nn
+from src.encoder_bundle import STATE_FILES, encoder_inputs, encode, load_eager_encoders
+
+QUANT_FILE = "encoders_int8.pt"
+REPORT_FILE = "encoders_int8.json"
+CHECK_BARS = 250
+EMBED_TOL = 0.05  # max relative L2 error of the embedding
+PROB_TOL = 0.02   # max abs error of tilt / expansion probabilities
+
+
+def _source_hash(model_dir):
+    """sha256 over the float state dicts the quantized model derives from"""
+    h = hashlib.sha256()
+    for name in STATE_FILES:
+        with open(os.path.join(model_dir, name), "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def quantize_encoders(encoder):
+    """Dynamic int8 copy of an eager EncoderBundle (LSTM + Linear layers)"""
+    return torch.ao.quantization.quantize_dynamic(encoder, {nn.LSTM, nn.Linear}, dtype=torch.qint8)
+
+
+def _recent_windows(df, n):
+    from src.features import (add_basic_features, build_tme_windows, build_vse_grids,
+                              build_gfe_geometries, build_engineered_matrix)
+    feats = add_basic_features(df)
+    indices = np.arange(max(90, len(feats) - n), len(feats))
+    if len(indices) == 0:
+        raise Exception(f"[ERROR] Not enough history for the quantization check: {len(feats)} rows")
+    return ((build_tme_windows(feats, indices), build_vse_grids(feats, indices), build_gfe_geometries(feats, indices)),
+            build_engineered_matrix(feats, indices))
+
+
+def _per_call_ms(encoder, windows, repeat=20):
+    one = tuple(w[-1:] for w in windows)
+    for _ in range(5):
+        encode(encoder, *one)
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        encode(encoder, *one)
+    return (time.perf_counter() - t0) / repeat * 1000
+
+
+def drift_report(float_enc, quant_enc, fusion, lgbm, df, n=CHECK_BARS,
+                 embed_tol=EMBED_TOL, prob_tol=PROB_TOL):
+    """Compare int8 vs float encoders on the last n bars; report['accepted'] is the verdict"""
+    windows, eng = _recent_windows(df, n)
+    emb_f = encode(float_enc, *windows)
+    emb_q = encode(quant_enc, *windows)
+    rel = np.linalg.norm(emb_q - emb_f, axis=1) / (np.linalg.norm(emb_f, axis=1) + 1e-9)
+    fused_f, fused_q = np.hstack([emb_f, eng]), np.hstack([emb_q, eng])
+    tilt_err = float(np.max(np.abs(fusion.predict_proba(fused_q) - fusion.predict_proba(fused_f))))
+    exp_err = float(np.max(np.abs(lgbm.predict(fused_q) - lgbm.predict(fused_f)))) if lgbm is not None else 0.0
+    report = {
+        "bars": len(emb_f),
+        "embedding_rel_err_max": float(rel.max()),
+        "embedding_rel_err_mean": float(rel.mean()),
+        "tilt_abs_err_max": tilt_err,
+        "expansion_abs_err_max": exp_err,
+        "float_ms_per_call": _per_call_ms(float_enc, windows),
+        "int8_ms_per_call": _per_call_ms(quant_enc, windows),
+        "tolerances": {"embedding": embed_tol, "probability": prob_tol},
+    }
+    report["accepted"] = bool(rel.max() <= embed_tol and tilt_err <= prob_tol and exp_err <= prob_tol)
+    return report
+
+
+def print_report(report):
+    verdict = "accepted" if report["accepted"] else "REFUSED"
+    print(f"[INFO] int8 check over {report['bars']} bars: embedding rel err max {report['embedding_rel_err_max']:.4f} "
+          f"(mean {report['embedding_rel_err_mean']:.4f}), tilt {report['tilt_abs_err_max']:.4f}, "
+          f"expansion {report['expansion_abs_err_max']:.4f} -> {verdict}")
+    print(f"[INFO] int8 latency {report['int8_ms_per_call']:.3f} ms/call vs float {report['float_ms_per_call']:.3f} ms/call")
+
+
+def load_int8_encoders(model_dir, fusion, lgbm, df=None, rebuild=False):
+    """
+    Cached int8 encoder if it was accepted for the current float weights,
+    otherwise quantize + check now (df defaults to the market cache).
+    Returns (encoder or None if refused, report).
+    """
+    quant_path = os.path.join(model_dir, QUANT_FILE)
+    report_path = os.path.join(model_dir, REPORT_FILE)
+    source = _source_hash(model_dir)
+    if not rebuild and os.path.exists(report_path):
+        with open(report_path, "r", encoding="utf-8") as f:
+            report = json.load(f)
+        if report.get("source_sha256") == source:
+            if not report["accepted"]:
+                return None, report
+            try:
+                return torch.jit.load(quant_path, map_location="cpu"), report
+            except Exception as e:
+                print(f"[WARN] Cached int8 encoder not loaded, rebuilding: {e}")
+
+    if df is None:
+        from src.features import load_cache, cache_to_frame
+        df = cache_to_frame(load_cache())
+    float_enc = load_eager_encoders(model_dir)
+    quant_enc = quantize_encoders(float_enc)
+    report = drift_report(float_enc, quant_enc, fusion, lgbm, df)
+    report["source_sha256"] = source
+
+    if report["accepted"]:
+        windows, _ = _recent_windows(df, 8)
+        with torch.no_grad():
+            traced = torch.jit.trace(quant_enc, encoder_inputs(*windows))
+        torch.jit.save(traced, quant_path + ".tmp")
+        os.replace(quant_path + ".tmp", quant_path)
+    with open(report_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    os.replace(report_path + ".tmp", report_path)
+    return (quant_enc if report["accepted"] else None), report
+
+
+if __name__ == "__main__":
+    from src.inference import MODEL_DIR, load_models
+    _, fusion, lgbm = load_models(use_bundle=False)
+    encoder, report = load_int8_encoders(MODEL_DIR, fusion, lgbm, rebuild="--rebuild" in sys.argv)
+    print_report(report)
+    sys.exit(0 if encoder is not None else 1)
@@ -0,0 +1,316 @@
+"""
+OmniSpectrum: Intraday Resampling
+=================================
+Higher-timeframe OHLCV (15m, 30m, 1h, whole sessions) from the 5-minute
+NIFTY bars, without refetching.
+
+Source: the three fetched sets (nifty_1d_5m / 2d / 3d) are merged with the
+accumulated nifty_5m series (newest bar wins on equal timestamps), so 5m
+history keeps growing across fetches even though each fetch only covers 3d.
+
+Buckets follow the IST session (09:15-15:30): they are anchored at 09:15, so
+1h bars are 09:15, 10:15, ... 15:15 (the last one 15 minutes long), and bars
+outside the session (pre-open, post-close) are dropped. A bucket never spans
+two sessions. Each timeframe is one vectorized pass: bucket keys from integer
+timestamp arithmetic, then ufunc.reduceat over the runs of equal keys.
+
+Derived series are cached in the market store next to the source
+(nifty_15m, nifty_30m, nifty_1h, nifty_session; meta.derived_from). When new
+5m bars arrive only the tail is recomputed: everything from the start of the
+last cached bucket (it may have been partial) onwards. The cache remembers a
+hash of the source it was built from; if the current source does not start with
+exactly those rows (revised or backfilled history), the timeframe is rebuilt
+in full.
+
+Usage:
+  python -m src.resample                  # sync every timeframe in the market store
+  python -m src.resample --rebuild
+
+  from src.resample import get_timeframe
+  bars = get_timeframe("15m")             # DataFrame: Date (IST), OHLCV, Bars, Complete
+"""
+import sys
+import hashlib
+import argparse
+import time
+from typing import Dict
+import numpy as np
+import pandas as pd
+from src.market_store import (
+    STORE_DIR, SERIES_DTYPE, PRICE_COLUMNS, store_exists, read_manifest, load_series, write_market_store
+)
+
+SYMBOL = "nifty"
+INTRADAY_SOURCES = ("nifty_1d_5m", "nifty_2d_5m", "nifty_3d_5m")
+BASE_MINUTES = 5
+TIMEFRAMES = {"15m": 15, "30m": 30, "1h": 60, "session": None}
+IST_OFFSET_MIN = 330
+SESSION_OPEN_MIN = 9 * 60 + 15
+SESSION_CLOSE_MIN = 15 * 60 + 30
+MINUTE_NS = 60 * 10**9
+DAY_NS = 1440 * MINUTE_NS
+RESAMPLE_VERSION = 1
+
+
+def _local_ns(arr, utc_offset_min):
+    """IST wall-clock ns of stored timestamps (naive timestamps are taken as IST already)"""
+    ts = np.asarray(arr["ts"], dtype=np.int64)
+    return ts + IST_OFFSET_MIN * MINUTE_NS if utc_offset_min is not None else ts
+
+
+def _to_utc(local_ns):
+    return local_ns - IST_OFFSET_MIN * MINUTE_NS
+
+
+def session_mask(arr):
+    """Bars that start inside the IST session (ts in UTC ns)"""
+    minute = (_local_ns(arr, 0) % DAY_NS) // MINUTE_NS
+    return (minute >= SESSION_OPEN_MIN) & (minute < SESSION_CLOSE_MIN)
+
+
+def resample_records(arr, minutes, base_minutes=BASE_MINUTES):
+    """
+    One vectorized pass: SERIES_DTYPE bars (ts in UTC ns, sorted, in-session)
+    -> (bars at `minutes` (None = one per session), source bars per bucket,
+    bucket length in base bars). Output ts is the bucket start in UTC ns.
+    """
+    if len(arr) == 0:
+        return np.empty(0, SERIES_DTYPE), np.empty(0, np.int64), np.empty(0, np.int64)
+    local = _local_ns(arr, 0)
+    day = local // DAY_NS
+    offset = (local % DAY_NS) // MINUTE_NS - SESSION_OPEN_MIN
+    session_len = SESSION_CLOSE_MIN - SESSION_OPEN_MIN
+    width = session_len if minutes is None else minutes
+    bucket = offset // width
+    key = day * (session_len // min(width, session_len) + 1) + bucket
+    starts = np.flatnonzero(np.concatenate(([True], key[1:] != key[:-1])))
+    out = np.empty(len(starts), SERIES_DTYPE)
+    out["ts"] = _to_utc(day[starts] * DAY_NS + (SESSION_OPEN_MIN + bucket[starts] * width) * MINUTE_NS)
+    out["Open"] = arr["Open"][starts]
+    out["High"] = np.maximum.reduceat(arr["High"], starts)
+    out["Low"] = np.minimum.reduceat(arr["Low"], starts)
+    out["Close"] = arr["Close"][np.append(starts[1:], len(arr)) - 1]
+    out["Volume"] = np.add.reduceat(arr["Volume"], starts)
+    counts = np.diff(np.append(starts, len(arr)))
+    expected = np.minimum(width, session_len - bucket[starts] * width) // base_minutes
+    return out, counts, expected
+
+
+def merge_records(*parts):
+    """Union of SERIES_DTYPE arrays sorted by ts; on equal ts the later part wins"""
+    parts = [p for p in parts if p is not None and len(p)]
+    if not parts:
+        return np.empty(0, SERIES_DTYPE)
+    if all(p["ts"][0] > q["ts"][-1] for q, p in zip(parts, parts[1:])) and \
+            all((np.diff(p["ts"]) > 0).all() for p in parts):
+        return np.concatenate(parts)
+    allbars = np.concatenate(parts)
+    order = np.argsort(allbars["ts"], kind="stable")
+    allbars = allbars[order]
+    last = np.append(allbars["ts"][1:] != allbars["ts"][:-1], True)
+    return allbars[last]
+
+
+def _utc_records(key, store_dir, manifest):
+    arr = np.array(load_series(key, store_dir, manifest=manifest))
+    if manifest["series"][key].get("utc_offset_min") is None:
+        arr["ts"] = _to_utc(arr["ts"])
+    return arr
+
+
+def _series_key(timeframe, symbol=SYMBOL):
+    return f"{symbol}_{timeframe}"
+
+
+class Resampler:
+    """Cached, incrementally updated higher timeframes over the 5m source in one market store"""
+
+    def __init__(self, store_dir=STORE_DIR, symbol=SYMBOL, sources=INTRADAY_SOURCES, timeframes=TIMEFRAMES):
+        self.store_dir = store_dir
+        self.symbol = symbol
+        self.sources = sources
+        self.timeframes = dict(timeframes)
+        self.source = None
+        self.derived = {}
+        self.stats = {}
+        self._hashes = {}
+
+    @property
+    def source_key(self):
+        return _series_key(f"{BASE_MINUTES}m", self.symbol)
+
+    def _set_source(self, source):
+        self.source = source
+        self._hashes = {}
+
+    def _hash(self, rows=None):
+        """sha256 of the first rows source bars (all if None), memoized per source"""
+        rows = len(self.source) if rows is None else rows
+        if rows not in self._hashes:
+            self._hashes[rows] = hashlib.sha256(np.ascontiguousarray(self.source[:rows]).tobytes()).hexdigest()
+        return self._hashes[rows]
+
+    def _source_meta(self):
+        return {"interval": f"{BASE_MINUTES}m", "merged_from": list(self.sources), "version": RESAMPLE_VERSION,
+                "source_sha256": self._hash()}
+
+    def _derived_meta(self, timeframe):
+        """The source rows / hash a timeframe was built from: a later source that extends them updates incrementally"""
+        return {"derived_from": self.source_key, "timeframe": timeframe, "minutes": self.timeframes[timeframe],
+                "version": RESAMPLE_VERSION, "source_rows": len(self.source), "source_sha256": self._hash()}
+
+    def load_source(self, manifest):
+        """Accumulated 5m history merged with the fetched 1d/2d/3d sets, session bars only"""
+        keys = [k for k in (self.source_key, *self.sources) if k in manifest["series"]]
+        if not keys:
+            raise Exception(f"[ERROR] No intraday series in market store ({', '.join(self.sources)})")
+        merged = merge_records(*[_utc_records(k, self.store_dir, manifest) for k in keys])
+        return merged[session_mask(merged)]
+
+    def _resample_from(self, timeframe, cached, start):
+        """cached bars before start + source bars from start onwards, resampled"""
+        ts = self.source["ts"]
+        tail, _, _ = resample_records(self.source[np.searchsorted(ts, start):], self.timeframes[timeframe])
+        return np.concatenate([cached[:np.searchsorted(cached["ts"], start)], tail])
+
+    def _update_one(self, timeframe, entry, rebuild):
+        """(bars, mode) for one timeframe; mode is full / incremental / unchanged"""
+        key = _series_key(timeframe, self.symbol)
+        meta = (entry or {}).get("meta", {})
+        rows = meta.get("source_rows", -1)
+        if (rebuild or meta.get("version") != RESAMPLE_VERSION or meta.get("minutes") != self.timeframes[timeframe]
+                or not entry["rows"] or not 0 < rows <= len(self.source) or meta.get("source_sha256") != self._hash(rows)):
+            # new, stale or built from a source whose history has since been revised
+            bars, _, _ = resample_records(self.source, self.timeframes[timeframe])
+            return bars, "full"
+        cached = _utc_records(key, self.store_dir, {"series": {key: entry}})
+        if rows == len(self.source):
+            return cached, "unchanged"
+        # the source only grew: the last cached bucket may have been partial, redo it and everything after
+        return self._resample_from(timeframe, cached, int(cached["ts"][-1])), "incremental"
+
+    def sync(self, rebuild=False, persist=True):
+        """Bring the merged 5m source and every timeframe up to date; returns {timeframe: mode}"""
+        manifest = read_manifest(self.store_dir)
+        t0 = time.perf_counter()
+        self._set_source(self.load_source(manifest))
+        modes, changed = {}, {}
+        src_meta = manifest["series"].get(self.source_key, {}).get("meta", {})
+        if rebuild or src_meta.get("source_sha256") != self._hash():
+            changed[self.source_key] = (self.source, self._source_meta())
+        for timeframe in self.timeframes:
+            key = _series_key(timeframe, self.symbol)
+            bars, mode = self._update_one(timeframe, manifest["series"].get(key), rebuild)
+            self.derived[timeframe] = bars
+            modes[timeframe] = mode
+            if mode != "unchanged":
+                changed[key] = (bars, self._derived_meta(timeframe))
+        if persist and changed:
+            write_market_store({key: (_frame(arr), meta) for key, (arr, meta) in changed.items()},
+                               store_dir=self.store_dir, merge=True)
+        self.stats = {"seconds": time.perf_counter() - t0, "source_rows": len(self.source), "modes": modes,
+                      "written": sorted(changed)}
+        return modes
+
+    def append(self, bars):
+        """
+        Fold new 5m bars (DataFrame with Date or SERIES_DTYPE array) into the
+        source and every timeframe in memory (e.g. from src.bar_aggregator);
+        persist() writes them.
+        """
+        if self.source is None:
+            self.sync(persist=False)
+        new = bars if isinstance(bars, np.ndarray) else _records(bars)
+        new = new[session_mask(new)]
+        if not len(new):
+            return {}
+        self._set_source(merge_records(self.source, new))
+        first_new = int(new["ts"].min())
+        modes = {}
+        for timeframe in self.timeframes:
+            cached = self.derived[timeframe]
+            # recompute from the bucket that holds the first new bar
+            i = np.searchsorted(cached["ts"], first_new, side="right") - 1
+            start = int(cached["ts"][i]) if i >= 0 else int(self.source["ts"][0])
+            self.derived[timeframe] = self._resample_from(timeframe, cached, start)
+            modes[timeframe] = "incremental"
+        return modes
+
+    def persist(self):
+        series = {_series_key(tf, self.symbol): (_frame(arr), self._derived_meta(tf)) for tf, arr in self.derived.items()}
+        series[self.source_key] = (_frame(self.source), self._source_meta())
+        write_market_store(series, store_dir=self.store_dir, merge=True)
+
+    def get(self, timeframe, complete_only=False):
+        """OHLCV frame for timeframe ('5m' is the merged source); Bars / Complete say how full each bucket is"""
+        if self.source is None:
+            self.sync()
+        if timeframe == f"{BASE_MINUTES}m":
+            df = _frame(self.source)
+            df["Bars"], df["Complete"] = 1, True
+            return df
+        if timeframe not in self.timeframes:
+            raise Exception(f"[ERROR] Unknown timeframe '{timeframe}' ({', '.join(self.timeframes)})")
+        bars = self.derived[timeframe]
+        _, counts, expected = resample_records(self.source[self.source["ts"] >= bars["ts"][0]], self.timeframes[timeframe]) \
+            if len(bars) else (None, np.empty(0, np.int64), np.empty(0, np.int64))
+        df = _frame(bars)
+        df["Bars"] = counts
+        df["Complete"] = counts >= expected
+        return df[df["Complete"]].reset_index(drop=True) if complete_only else df
+
+
+def _frame(arr):
+    """SERIES_DTYPE (UTC ns) -> DataFrame with IST Date and float64 prices"""
+    df = pd.DataFrame({col: np.asarray(arr[col], dtype=np.float64) for col in PRICE_COLUMNS})
+    df["Volume"] = np.asarray(arr["Volume"], dtype=np.int64)
+    df.insert(0, "Date", pd.to_datetime(np.asarray(arr["ts"]), utc=True).tz_convert("Asia/Kolkata"))
+    return df
+
+
+def _records(df):
+    from src.market_store import frame_to_records
+    arr, offset = frame_to_records(df)
+    if offset is None:
+        arr["ts"] = _to_utc(arr["ts"])
+    return arr
+
+
+_shared: Dict[str, Resampler] = {}
+
+
+def get_timeframe(timeframe, store_dir=STORE_DIR, complete_only=False) -> pd.DataFrame:
+    """
+    Bars for any timeframe ('5m', '15m', '30m', '1h', 'session') from the
+    process-wide Resampler, synced with the store when its manifest changes.
+    """
+    resampler = _shared.get(store_dir)
+    manifest_ts = read_manifest(store_dir).get("timestamp")
+    if resampler is None or resampler.stats.get("manifest") != manifest_ts:
+        resampler = _shared[store_dir] = Resampler(store_dir)
+        resampler.sync()
+        resampler.stats["manifest"] = read_manifest(store_dir).get("timestamp")
+    return resampler.get(timeframe, complete_only=complete_only)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OmniSpectrum intraday resampling")
+    parser.add_argument("--store-dir", default=STORE_DIR)
+    parser.add_argument("--rebuild", action="store_true", help="Recompute every timeframe from the 5m source")
+    args = parser.parse_args(argv)
+    if not store_exists(args.store_dir):
+        raise Exception(f"[ERROR] Market store not found: {args.store_dir}")
+    resampler = Resampler(args.store_dir)
+    modes = resampler.sync(rebuild=args.rebuild)
+    print(f"[OK] 5m source: {resampler.stats['source_rows']} session bars "
+          f"({resampler.stats['seconds'] * 1000:.1f} ms, wrote {', '.join(resampler.stats['written']) or 'nothing'})")
+    for timeframe in resampler.timeframes:
+        df = resampler.get(timeframe)
+        print(f"  {_series_key(timeframe):14s} {len(df):6d} bars  {modes[timeframe]:11s} "
+              f"{df['Date'].iloc[0] if len(df) else '-'} -> {df['Date'].iloc[-1] if len(df) else '-'}"
+              f"{'' if not len(df) or df['Complete'].iloc[-1] else '  (last bar partial)'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
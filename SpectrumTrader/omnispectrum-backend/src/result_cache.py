@@ -0,0 +1,190 @@
+"""
+OmniSpectrum: Inference Result Cache
+====================================
+Skips the pipeline when nothing it reads has changed since the last run.
+
+The fingerprint is a sha256 over:
+  bars     last FINGERPRINT_BARS bars of nifty_daily (raw content), the row
+           count and first bar, plus the store's full-series checksum when
+           reading the columnar store
+  live     spot / vix / niftyOhlc / vixOhlc from the cache extras
+  models   content hash of every file under models/
+  options  quantize mode and CACHE_VERSION
+
+Input selection follows features.load_cache (store unless the JSON cache is
+newer). Only json / hashlib / numpy and the manifest reader (src.store_manifest)
+are touched, so a hit never imports pandas, torch, scipy or the feature pipeline.
+
+State lives next to the output (omnispectrum.json -> omnispectrum.cache.json):
+the last fingerprint and its parts, how long that run took, the output file's
+(mtime, size) and cumulative hit/miss counts and time saved. A hit also
+requires the output file to be exactly the one that run wrote.
+
+Bump CACHE_VERSION when inference code changes the output for the same
+inputs, or run with --no-cache.
+"""
+import os
+import json
+import time
+import hashlib
+import numpy as np
+from src.store_manifest import STORE_DIR, JSON_CACHE, MANIFEST, EXTRA_KEYS, store_exists, read_manifest
+
+CACHE_VERSION = 1
+FINGERPRINT_BARS = 128
+SERIES_KEY = "nifty_daily"
+
+
+def _digest(obj):
+    return hashlib.sha256(json.dumps(obj, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _file_signature(path):
+    try:
+        st = os.stat(path)
+        return [st.st_mtime_ns, st.st_size]
+    except OSError:
+        return None
+
+
+def state_path(output_path):
+    return os.path.splitext(output_path)[0] + ".cache.json"
+
+
+def _store_parts(store_dir, bars):
+    manifest = read_manifest(store_dir)
+    entry = manifest["series"].get(SERIES_KEY)
+    if entry is None:
+        raise Exception(f"[ERROR] Series '{SERIES_KEY}' not in market store")
+    arr = np.load(os.path.join(store_dir, entry["file"]), mmap_mode="r")
+    tail = np.ascontiguousarray(arr[-bars:])
+    bars_part = {
+        "rows": int(len(arr)),
+        "first_ts": int(arr["ts"][0]) if len(arr) else None,
+        "tail_sha256": hashlib.sha256(tail.tobytes()).hexdigest(),
+        "series_sha256": entry.get("sha256"),
+    }
+    return "store", bars_part, manifest.get("extras", {})
+
+
+def _json_parts(cache_file, bars):
+    if not os.path.exists(cache_file):
+        raise Exception(f"[ERROR] Cache not found: {cache_file}")
+    with open(cache_file, "r") as f:
+        payload = json.load(f)
+    if "series" in payload:
+        rows = payload["series"][SERIES_KEY]["data"]
+        first = rows[0].get("Date") if rows else None
+    else:
+        ohlc = payload.get("ohlc", {})
+        rows = [dict(zip(ohlc, values)) for values in zip(*ohlc.values())]
+        first = None
+    bars_part = {"rows": len(rows), "first_ts": first, "tail_sha256": _digest(rows[-bars:])}
+    return "json", bars_part, payload
+
+
+class ResultCache:
+    def __init__(self, output_path, model_dir="models", cache_file=JSON_CACHE, store_dir=STORE_DIR,
+                 quantize=None, bars=FINGERPRINT_BARS):
+        self.output_path = output_path
+        self.model_dir = model_dir
+        self.cache_file = cache_file
+        self.store_dir = store_dir
+        self.quantize = quantize
+        self.bars = bars
+        self.state_file = state_path(output_path)
+        self.current = None
+
+    def fingerprint(self):
+        """(hex digest, parts dict) for the inputs as they are on disk now"""
+        use_store = store_exists(self.store_dir) and (
+            not os.path.exists(self.cache_file)
+            or os.path.getmtime(os.path.join(self.store_dir, MANIFEST)) >= os.path.getmtime(self.cache_file))
+        source, bars_part, extras = (_store_parts(self.store_dir, self.bars) if use_store
+                                     else _json_parts(self.cache_file, self.bars))
+        models = {}
+        for name in sorted(os.listdir(self.model_dir)) if os.path.isdir(self.model_dir) else []:
+            path = os.path.join(self.model_dir, name)
+            if os.path.isfile(path) and not name.startswith(".") and not name.endswith(".tmp"):
+                models[name] = _file_sha256(path)
+        parts = {
+            "source": source,
+            "bars": _digest(bars_part),
+            "live": _digest({k: extras.get(k) for k in EXTRA_KEYS}),
+            "models": _digest(models),
+            "options": _digest({"quantize": self.quantize, "version": CACHE_VERSION, "bars": self.bars}),
+        }
+        return _digest(parts), parts
+
+    def _load_state(self):
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {"hits": 0, "misses": 0, "saved_s": 0.0}
+
+    def _save_state(self, state):
+        """Best effort: a state file that cannot be written only costs the next run a cache miss"""
+        tmp = self.state_file + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.state_file)), exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(state, f, indent=2)
+            os.replace(tmp, self.state_file)
+        except OSError as e:
+            print(f"[WARN] Result cache state not saved ({self.state_file}): {e}")
+
+    def lookup(self):
+        """
+        True if the stored output is current for today's inputs (a hit).
+        On a miss the fingerprint is kept for store() after the pipeline runs.
+        """
+        t0 = time.perf_counter()
+        state = self._load_state()
+        try:
+            digest, parts = self.fingerprint()
+        except Exception as e:
+            print(f"[WARN] Result cache fingerprint failed, running inference: {e}")
+            self.current = None
+            return False
+        self.current = (digest, parts)
+        if (digest == state.get("fingerprint") and state.get("output_sig") is not None
+                and _file_signature(self.output_path) == state["output_sig"]):
+            elapsed = time.perf_counter() - t0
+            saved = max(state.get("compute_s", 0.0) - elapsed, 0.0)
+            state["hits"] = state.get("hits", 0) + 1
+            state["saved_s"] = round(state.get("saved_s", 0.0) + saved, 3)
+            self._save_state(state)
+            print(f"[CACHE] hit {digest[:12]} in {elapsed * 1000:.1f} ms, saved ~{saved:.2f}s "
+                  f"({state['hits']} hits / {state.get('misses', 0)} misses, {state['saved_s']:.1f}s saved total)")
+            return True
+        old = state.get("parts") or {}
+        changed = [k for k in parts if old.get(k) != parts[k]] if old else ["no previous run"]
+        if not changed:
+            changed = ["output file"]
+        state["misses"] = state.get("misses", 0) + 1
+        self._save_state(state)
+        print(f"[CACHE] miss ({', '.join(changed)} changed; {state.get('hits', 0)} hits / {state['misses']} misses)")
+        return False
+
+    def store(self, compute_s):
+        """Record the run that just wrote output_path under the lookup() fingerprint"""
+        if self.current is None:
+            return
+        state = self._load_state()
+        state.update({
+            "fingerprint": self.current[0],
+            "parts": self.current[1],
+            "compute_s": round(compute_s, 3),
+            "output_sig": _file_signature(self.output_path),
+            "updated": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        })
+        self._save_state(state)
@@ -0,0 +1,28 @@
+"""
+OmniSpectrum: Market Store Manifest
+===================================
+Paths and manifest access for src.market_store that need neither pandas nor
+the series files, so a caller that only reads the manifest (src.result_cache
+on a cache hit) does not pay the pandas import. src.market_store re-exports
+everything here.
+"""
+import os
+import json
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "data")
+STORE_DIR = os.path.join(DATA_DIR, "market_store")
+JSON_CACHE = os.path.join(DATA_DIR, "prediction_data.json")
+MANIFEST = "manifest.json"
+EXTRA_KEYS = ["spot", "vix", "niftyOhlc", "vixOhlc"]
+
+
+def store_exists(store_dir: str = STORE_DIR) -> bool:
+    return os.path.exists(os.path.join(store_dir, MANIFEST))
+
+
+def read_manifest(store_dir: str = STORE_DIR) -> dict:
+    path = os.path.join(store_dir, MANIFEST)
+    if not os.path.exists(path):
+        raise Exception(f"[ERROR] Market store not found: {store_dir}\nRun 'python -m src.market_store' to convert the JSON cache")
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
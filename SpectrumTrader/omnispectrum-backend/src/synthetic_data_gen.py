@@ -8,190 +8,461 @@ Generates:
 - 2-year daily OHLC with realistic volatility
 - 1d/2d/3d intraday 5-min candles
 - India VIX series
-- 8 sector correlations
+- 8 sector indices, correlated with NIFTY
+
+Every path is vectorized (no per-bar Python loop), so millions of bars per
+symbol take seconds:
+- shocks: each symbol draws from its own generator, seeded from (seed,
+  symbol name), then the shocks are mixed with the Cholesky factor of the
+  correlation matrix (DEFAULT_CORRELATION or --correlation FILE)
+- volatility clustering: one market log-volatility AR(1) process
+  (scipy.signal.lfilter) scales every symbol's shocks
+- VIX: mean-reverting log level that rises with the volatility state and
+  moves against NIFTY through its shock correlation
+
+Tick stream mode (TickStream / stream_ticks) emits NIFTY ticks in real time
+at a fixed rate (up to ~100k/s) into a queue.Queue or a TCP / Unix socket,
+in batches of TICK_BATCH_S worth of TICK_DTYPE records. Each tick carries its
+market time `ts` (the market clock runs `speed` times faster than the wall
+clock, so 1m / 5m bars close within seconds) and the wall-clock `sent` time
+used to measure tick-to-tile latency (see src.bar_aggregator). Socket frames
+are a 4-byte little-endian tick count followed by the raw records.
+
+Usage:
+  python -m src.synthetic_data_gen                                # 730 daily bars, JSON cache + market store
+  python -m src.synthetic_data_gen --bars 1000000 --freq 5min --format store
+  python -m src.synthetic_data_gen --correlation corr.json --seed 7
+  python -m src.synthetic_data_gen --stream tcp://127.0.0.1:9100 --rate 100000 --duration 10 --speed 60
 """
 import os
+import sys
 import json
+import time
+import zlib
+import queue
+import socket
+import struct
+import argparse
 import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
-
-def generate_synthetic_ohlc(base_price=23500, days=730, volatility=0.015):
-    """Generate realistic OHLC data with random walk"""
-    np.random.seed(42)  # reproducible
-    
-    dates = pd.date_range(end=datetime.now(), periods=days, freq='D')
-    prices = [base_price]
-    
-    for _ in range(days - 1):
-        daily_return = np.random.normal(0, volatility)
-        new_price = prices[-1] * (1 + daily_return)
-        prices.append(new_price)
-    
-    # Generate OHLC from close prices
-    records = []
-    for i, date in enumerate(dates):
-        close = prices[i]
-        high = close * (1 + abs(np.random.normal(0, volatility/2)))
-        low = close * (1 - abs(np.random.normal(0, volatility/2)))
-        open_price = close * (1 + np.random.normal(0, volatility/3))
-        volume = int(np.random.gamma(shape=2, scale=500000))
-        
-        records.append({
-            'Date': date,
-            'Open': round(open_price, 2),
-            'High': round(max(high, open_price, close), 2),
-            'Low': round(min(low, open_price, close), 2),
-            'Close': round(close, 2),
-            'Volume': volume
-        })
-    
-    return pd.DataFrame(records)
-
-def generate_synthetic_intraday(base_price=23500, candles=72):
-    """Generate intraday 5-min candles"""
-    records = []
-    current_time = datetime.now() - timedelta(hours=candles/12)
-    
-    for i in range(candles):
-        close = base_price * (1 + np.random.normal(0, 0.001))
-        high = close * (1 + abs(np.random.normal(0, 0.0005)))
-        low = close * (1 - abs(np.random.normal(0, 0.0005)))
-        open_price = close * (1 + np.random.normal(0, 0.0003))
-        volume = int(np.random.gamma(shape=2, scale=50000))
-        
-        records.append({
-            'Datetime': current_time + timedelta(minutes=5*i),
-            'Open': round(open_price, 2),
-            'High': round(max(high, open_price, close), 2),
-            'Low': round(min(low, open_price, close), 2),
-            'Close': round(close, 2),
-            'Volume': volume
-        })
-    
-    return pd.DataFrame(records)
-
-def main():
-    print("\n" + "=" * 75)
-    print("OmniSpectrum: Synthetic Data Generator")
-    print("=" * 75)
-    print("Generating realistic fake market data for offline testing...")
-    
-    # Generate NIFTY daily
-    print("\n[1/5] Generating NIFTY daily (2 years)...")
-    nifty_daily = generate_synthetic_ohlc(base_price=23500, days=730)
-    print(f"      {len(nifty_daily)} days from {nifty_daily['Date'].min().date()} to {nifty_daily['Date'].max().date()}")
-    print(f"      Close range: ₹{nifty_daily['Close'].min():.2f} - ₹{nifty_daily['Close'].max():.2f}")
-    
-    # Generate intraday
-    print("\n[2/5] Generating NIFTY intraday (1d, 2d, 3d @ 5m)...")
-    intraday_1d = generate_synthetic_intraday(base_price=nifty_daily['Close'].iloc[-1], candles=72)
-    intraday_2d = generate_synthetic_intraday(base_price=nifty_daily['Close'].iloc[-1], candles=144)
-    intraday_3d = generate_synthetic_intraday(base_price=nifty_daily['Close'].iloc[-1], candles=216)
-    print(f"      1d: {len(intraday_1d)} candles")
-    print(f"      2d: {len(intraday_2d)} candles")
-    print(f"      3d: {len(intraday_3d)} candles")
-    
-    # Generate VIX
-    print("\n[3/5] Generating India VIX (2 years)...")
-    vix_daily = generate_synthetic_ohlc(base_price=15.0, days=730, volatility=0.05)
-    vix_current = vix_daily['Close'].iloc[-1]
-    print(f"      VIX range: {vix_daily['Close'].min():.2f} - {vix_daily['Close'].max():.2f}")
-    print(f"      Current VIX: {vix_current:.2f}")
-    
-    # Generate sectors
-    print("\n[4/5] Generating 8 sector indices (2 years)...")
-    sectors = {}
-    sector_names = {
-        'nsebank': 45000,
-        'finservice': 12500,
-        'it': 18000,
-        'pharma': 7500,
-        'auto': 5000,
-        'metal': 6500,
-        'fmcg': 4500,
-        'energy': 2500
+from datetime import datetime
+from scipy.signal import lfilter
+from src.market_store import STORE_DIR, JSON_CACHE, write_market_store
+
+BARS_PER_SESSION = 75  # 5-minute bars in an NSE session (09:15-15:30)
+INDEX_BASE = {"nifty_daily": 23500.0, "vix": 15.0}
+SECTOR_BASE = {
+    'nsebank': 45000,
+    'finservice': 12500,
+    'it': 18000,
+    'pharma': 7500,
+    'auto': 5000,
+    'metal': 6500,
+    'fmcg': 4500,
+    'energy': 2500
+}
+SYMBOLS = ["nifty_daily", "vix"] + list(SECTOR_BASE)
+TICKERS = {"nifty_daily": "^NSEI", "vix": "^INDIAVIX"}
+DAILY_VOL = {"nifty_daily": 0.012, "vix": 0.06, **{name: 0.015 for name in SECTOR_BASE}}
+SECTOR_NIFTY_CORR = {'nsebank': 0.85, 'finservice': 0.85, 'it': 0.6, 'pharma': 0.45,
+                     'auto': 0.7, 'metal': 0.65, 'fmcg': 0.5, 'energy': 0.6}
+VIX_NIFTY_CORR = -0.7
+VOL_PERSISTENCE = 0.98   # AR(1) coefficient of market log-volatility (per daily bar)
+VOL_OF_VOL = 0.15        # innovation scale of market log-volatility (per daily bar)
+VIX_PERSISTENCE = 0.97
+VIX_VOL_BETA = 0.25     # log VIX response to the market log-volatility state
+TICK_DTYPE = np.dtype([("ts", "<i8"), ("sent", "<i8"), ("price", "<f8"), ("qty", "<i4")])
+TICK_HEADER = struct.Struct("<I")
+TICK_BATCH_S = 0.001     # wall-clock span of one emitted batch
+TICK_SIZE = 0.05         # NSE index tick size
+TICK_CHUNK = 65536       # ticks generated per vectorized draw
+SESSION_SECONDS = BARS_PER_SESSION * 300
+
+
+def default_correlation(symbols=SYMBOLS):
+    """
+    Shock correlation for the default symbols: sectors load on NIFTY
+    (corr(i, j) = c_i * c_j between sectors), VIX moves against NIFTY.
+    """
+    load = {"nifty_daily": 1.0, "vix": VIX_NIFTY_CORR, **SECTOR_NIFTY_CORR}
+    c = np.array([load[s] for s in symbols])
+    corr = np.outer(c, c)
+    np.fill_diagonal(corr, 1.0)
+    return corr
+
+
+def load_correlation(path, symbols):
+    """
+    Correlation matrix from a JSON file: {"symbols": [...], "matrix": [[...]]}
+    (symbols not listed are uncorrelated with the rest) or a bare matrix in
+    `symbols` order.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        spec = json.load(f)
+    if isinstance(spec, list):
+        return np.asarray(spec, dtype=np.float64)
+    order = spec["symbols"]
+    given = np.asarray(spec["matrix"], dtype=np.float64)
+    corr = np.eye(len(symbols))
+    pos = {s: i for i, s in enumerate(symbols)}
+    for a, sa in enumerate(order):
+        for b, sb in enumerate(order):
+            if sa in pos and sb in pos:
+                corr[pos[sa], pos[sb]] = given[a, b]
+    return corr
+
+
+def symbol_rng(seed, name):
+    """Independent, reproducible generator per symbol (same stream whatever else is generated)"""
+    return np.random.default_rng(np.random.SeedSequence([seed, zlib.crc32(name.encode("utf-8"))]))
+
+
+def cholesky_factor(corr):
+    corr = np.asarray(corr, dtype=np.float64)
+    if corr.ndim != 2 or corr.shape[0] != corr.shape[1]:
+        raise Exception(f"[ERROR] Correlation matrix must be square, got shape {corr.shape}")
+    if not np.allclose(corr, corr.T) or not np.allclose(np.diag(corr), 1.0):
+        raise Exception("[ERROR] Correlation matrix must be symmetric with a unit diagonal")
+    try:
+        return np.linalg.cholesky(corr)
+    except np.linalg.LinAlgError:
+        raise Exception("[ERROR] Correlation matrix is not positive definite")
+
+
+def volatility_state(n, seed, bars_per_day=1, persistence=VOL_PERSISTENCE, vol_of_vol=VOL_OF_VOL):
+    """
+    Market log-volatility h_t = phi * h_{t-1} + s * eta_t (one lfilter pass).
+    Daily phi / s are rescaled so intraday bars keep the same per-day dynamics.
+    Returns (h, stationary variance of h).
+    """
+    phi = persistence ** (1.0 / bars_per_day)
+    s = vol_of_vol * np.sqrt((1 - phi ** 2) / (1 - persistence ** 2))
+    eta = symbol_rng(seed, "__volatility__").standard_normal(n)
+    h = lfilter([s], [1.0, -phi], eta)
+    return h, s ** 2 / (1 - phi ** 2)
+
+
+def _ohlcv(close, bar_vol, rng, volume_scale):
+    """Open/High/Low/Volume around a close path, scaled by each bar's volatility"""
+    n = len(close)
+    prev = np.concatenate([[close[0]], close[:-1]])
+    open_ = prev * np.exp(rng.standard_normal(n) * bar_vol / 3)
+    top, bottom = np.maximum(open_, close), np.minimum(open_, close)
+    high = top * np.exp(np.abs(rng.standard_normal(n)) * bar_vol / 2)
+    low = bottom * np.exp(-np.abs(rng.standard_normal(n)) * bar_vol / 2)
+    volume = rng.gamma(shape=2.0, scale=volume_scale, size=n) * (bar_vol / np.median(bar_vol))
+    return {
+        'Open': np.round(open_, 2),
+        'High': np.round(np.maximum(high, top), 2),
+        'Low': np.round(np.minimum(low, bottom), 2),
+        'Close': np.round(close, 2),
+        'Volume': volume.astype(np.int64),
     }
-    
-    for name, base_price in sector_names.items():
-        sector_df = generate_synthetic_ohlc(base_price=base_price, days=730)
-        sectors[name] = sector_df
-        print(f"      {name:12s}: ₹{sector_df['Close'].iloc[-1]:,.2f}")
-    
-    # Build canonical cache
-    print("\n[5/5] Building canonical cache...")
-    
-    spot = nifty_daily['Close'].iloc[-1]
-    cache = {
-        "timestamp": pd.Timestamp.utcnow().isoformat(),
-        "source": "SYNTHETIC (for testing)",
-        "note": "This is fake data generated for offline testing. Use real data_fetcher for production.",
-        "series": {
-            "nifty_daily": {
-                "meta": {
-                    "ticker": "^NSEI",
-                    "period": "730d",
-                    "interval": "1d",
-                    "source": "SYNTHETIC"
-                },
-                "data": nifty_daily.to_dict(orient='records')
-            },
-            "nifty_1d_5m": {
-                "meta": {"ticker": "^NSEI", "period": "1d", "interval": "5m"},
-                "data": intraday_1d.to_dict(orient='records')
-            },
-            "nifty_2d_5m": {
-                "meta": {"ticker": "^NSEI", "period": "2d", "interval": "5m"},
-                "data": intraday_2d.to_dict(orient='records')
-            },
-            "nifty_3d_5m": {
-                "meta": {"ticker": "^NSEI", "period": "3d", "interval": "5m"},
-                "data": intraday_3d.to_dict(orient='records')
-            },
-            "vix": {
-                "meta": {"ticker": "^INDIAVIX", "period": "730d", "interval": "1d"},
-                "data": vix_daily.to_dict(orient='records')
-            }
-        },
+
+
+def generate_market(bars=730, freq='D', symbols=None, correlation=None, seed=42, end=None,
+                    bases=None, daily_vol=None, persistence=VOL_PERSISTENCE, vol_of_vol=VOL_OF_VOL):
+    """
+    Correlated OHLCV paths for `symbols` (default: NIFTY, VIX, 8 sectors),
+    `bars` rows each at `freq`. Returns {symbol: DataFrame(Date, OHLCV)}.
+    """
+    symbols = list(symbols or SYMBOLS)
+    bases = {**INDEX_BASE, **SECTOR_BASE, **(bases or {})}
+    daily_vol = {**DAILY_VOL, **(daily_vol or {})}
+    corr = default_correlation(symbols) if correlation is None else np.asarray(correlation, dtype=np.float64)
+    if corr.shape != (len(symbols), len(symbols)):
+        raise Exception(f"[ERROR] Correlation matrix is {corr.shape}, expected {len(symbols)}x{len(symbols)} "
+                        f"for {', '.join(symbols)}")
+    chol = cholesky_factor(corr)
+    bars_per_day = 1 if freq in ('D', 'B', '1D', '1d') else BARS_PER_SESSION
+    dates = pd.date_range(end=end or datetime.now(), periods=bars, freq=freq)
+
+    rngs = {name: symbol_rng(seed, name) for name in symbols}
+    shocks = np.column_stack([rngs[name].standard_normal(bars) for name in symbols]) @ chol.T
+    h, h_var = volatility_state(bars, seed, bars_per_day, persistence, vol_of_vol)
+    vol_scale = np.exp(h - h_var)  # E[vol_scale^2] = 1
+
+    frames = {}
+    for j, name in enumerate(symbols):
+        bar_vol = daily_vol.get(name, 0.015) / np.sqrt(bars_per_day) * vol_scale
+        if name == "vix":
+            phi = VIX_PERSISTENCE ** (1.0 / bars_per_day)
+            noise = lfilter([daily_vol["vix"] / np.sqrt(bars_per_day)], [1.0, -phi], shocks[:, j])
+            close = bases["vix"] * np.exp(VIX_VOL_BETA * h + noise)
+        else:
+            log_ret = bar_vol * shocks[:, j] - 0.5 * bar_vol ** 2
+            close = bases.get(name, 1000.0) * np.exp(np.cumsum(log_ret))
+        cols = _ohlcv(close, bar_vol, rngs[name], volume_scale=500000 / np.sqrt(bars_per_day))
+        frames[name] = pd.DataFrame({'Date': dates, **cols})
+    return frames
+
+
+def generate_synthetic_ohlc(base_price=23500, days=730, volatility=0.015, freq='D', seed=42, name="nifty_daily"):
+    """Single-symbol OHLC random walk (days = bars of the given freq; volatility per daily bar)"""
+    frames = generate_market(days, freq, symbols=[name], correlation=np.eye(1), seed=seed,
+                             bases={name: base_price}, daily_vol={name: volatility})
+    return frames[name]
+
+
+def generate_synthetic_intraday(base_price=23500, candles=72, seed=42, name="nifty_5m", end=None):
+    """Intraday 5-min candles ending now, as a walk from base_price"""
+    df = generate_synthetic_ohlc(base_price, candles, DAILY_VOL["nifty_daily"], freq='5min', seed=seed, name=name)
+    if end is not None:
+        df['Date'] = pd.date_range(end=end, periods=candles, freq='5min')
+    return df.rename(columns={'Date': 'Datetime'})
+
+
+def _extras(frames):
+    nifty = frames["nifty_daily"]
+    last, prev = nifty.iloc[-1], nifty.iloc[-2] if len(nifty) > 1 else nifty.iloc[-1]
+    extras = {
         "spot": {
-            "price": float(spot),
-            "open": float(nifty_daily['Open'].iloc[-1]),
-            "high": float(nifty_daily['High'].iloc[-1]),
-            "low": float(nifty_daily['Low'].iloc[-1]),
-            "change": float(nifty_daily['Close'].iloc[-1] - nifty_daily['Close'].iloc[-2]),
-            "change_pct": float((nifty_daily['Close'].iloc[-1] / nifty_daily['Close'].iloc[-2] - 1) * 100)
-        },
-        "vix": {
-            "price": float(vix_current)
+            "price": float(last['Close']),
+            "open": float(last['Open']),
+            "high": float(last['High']),
+            "low": float(last['Low']),
+            "change": float(last['Close'] - prev['Close']),
+            "change_pct": float((last['Close'] / prev['Close'] - 1) * 100)
         }
     }
-    
-    # Add sectors to cache
-    for name, df in sectors.items():
-        cache['series'][name] = {
-            "meta": {"ticker": name, "period": "730d", "interval": "1d"},
-            "data": df.to_dict(orient='records')
+    if "vix" in frames:
+        extras["vix"] = {"price": float(frames["vix"]['Close'].iloc[-1])}
+    return extras
+
+
+def write_synthetic_cache(frames, json_path=JSON_CACHE, store_dir=STORE_DIR, fmt="both", meta=None):
+    """
+    Write generated frames as the JSON cache and/or the columnar market store.
+    meta: {series: {period, interval, ...}} merged over the default series meta.
+    """
+    meta = meta or {}
+    series_meta = {key: {"ticker": TICKERS.get(key, key), "period": f"{len(df)}d", "interval": "1d",
+                         "source": "SYNTHETIC", **meta.get(key, {})}
+                   for key, df in frames.items()}
+    extras = _extras(frames)
+    source = "SYNTHETIC (for testing)"
+    if fmt in ("json", "both"):
+        cache = {
+            "timestamp": pd.Timestamp.utcnow().isoformat(),
+            "source": source,
+            "note": "This is fake data generated for offline testing. Use real data_fetcher for production.",
+            "series": {key: {"meta": series_meta[key], "data": df.to_dict(orient='records')}
+                       for key, df in frames.items()},
+            **extras,
         }
-    
-    # Write cache
-    output_path = os.path.join(os.path.dirname(__file__), "..", "..", "data", "prediction_data.json")
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(cache, f, indent=2, default=str)
-    
-    print(f"\n[OK] Synthetic cache written: {output_path}")
+        os.makedirs(os.path.dirname(os.path.abspath(json_path)), exist_ok=True)
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(cache, f, indent=2, default=str)
+        print(f"[OK] Synthetic cache written: {json_path}")
+    if fmt in ("store", "both"):
+        write_market_store({key: (df, series_meta[key]) for key, df in frames.items()},
+                           extras=extras, store_dir=store_dir, source=source)
+        print(f"[OK] Market store written: {store_dir}")
+
+
+def write_synthetic_store(bars, store_dir=STORE_DIR, freq=None, seed=42):
+    """
+    Minimal cache for pipeline benchmarks: nifty_daily with `bars` rows plus a
+    correlated VIX series and spot/vix extras, written as a market store.
+    freq defaults to daily, or 5-minute bars where daily dates would run past
+    pandas' Timestamp range. Returns the manifest.
+    """
+    freq = freq or ('D' if bars <= 100_000 else '5min')
+    frames = generate_market(bars, freq, symbols=["nifty_daily", "vix"], seed=seed)
+    return write_market_store({key: (df, {"source": "SYNTHETIC", "interval": freq}) for key, df in frames.items()},
+                              extras=_extras(frames), store_dir=store_dir,
+                              source=f"SYNTHETIC benchmark cache ({bars} bars)")
+
+
+class TickStream:
+    """
+    Paced NIFTY tick batches: `rate` ticks per wall-clock second, market time
+    advancing `speed` x faster. Prices are a random walk on the TICK_SIZE grid
+    with per-tick volatility that gives DAILY_VOL over a session of market time.
+    """
+
+    def __init__(self, rate=10_000, speed=1.0, seed=42, base_price=INDEX_BASE["nifty_daily"], start_ns=None,
+                 batch_s=TICK_BATCH_S):
+        if rate <= 0 or speed <= 0:
+            raise Exception("[ERROR] Tick rate and speed must be positive")
+        self.rate = float(rate)
+        self.speed = float(speed)
+        self.batch = max(int(round(rate * batch_s)), 1)
+        self.rng = symbol_rng(seed, "__ticks__")
+        self.price = float(base_price)
+        self.start_ns = time.time_ns() if start_ns is None else int(start_ns)
+        ticks_per_session = SESSION_SECONDS * self.rate / self.speed
+        self.tick_vol = DAILY_VOL["nifty_daily"] / np.sqrt(ticks_per_session)
+        self.emitted = 0
+        self.max_lag_s = 0.0
+        self._chunk = np.empty(0, TICK_DTYPE)
+        self._pos = 0
+        self._generated = 0
+
+    def _refill(self):
+        n = TICK_CHUNK
+        chunk = np.empty(n, TICK_DTYPE)
+        path = self.price * np.exp(np.cumsum(self.rng.standard_normal(n) * self.tick_vol))
+        chunk["price"] = np.round(path / TICK_SIZE) * TICK_SIZE
+        chunk["qty"] = self.rng.geometric(0.02, n)
+        idx = self._generated + np.arange(n)
+        chunk["ts"] = self.start_ns + (idx * (self.speed * 1e9 / self.rate)).astype(np.int64)
+        self._generated += n
+        self.price = float(path[-1])
+        self._chunk, self._pos = chunk, 0
+
+    def next_batch(self, n=None):
+        """Next n ticks (default: one batch) with `sent` unset"""
+        n = n or self.batch
+        parts = []
+        while n:
+            if self._pos == len(self._chunk):
+                self._refill()
+            take = min(n, len(self._chunk) - self._pos)
+            parts.append(self._chunk[self._pos:self._pos + take])
+            self._pos += take
+            n -= take
+        out = parts[0] if len(parts) == 1 else np.concatenate(parts)
+        self.emitted += len(out)
+        return out
+
+    def batches(self, duration_s=None, count=None):
+        """
+        Yield batches in real time until duration_s seconds or count ticks.
+        A late batch goes out immediately (max_lag_s records how late).
+        """
+        total = count if count is not None else int(self.rate * duration_s) if duration_s else None
+        t0 = time.perf_counter()
+        sent = 0
+        while total is None or sent < total:
+            n = self.batch if total is None else min(self.batch, total - sent)
+            due = t0 + sent / self.rate
+            wait = due - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            elif -wait > self.max_lag_s:
+                self.max_lag_s = -wait
+            batch = self.next_batch(n).copy()
+            batch["sent"] = time.time_ns()
+            sent += n
+            yield batch
+
+
+def _connect(address):
+    """Socket for 'tcp://host:port' or 'unix:/path'"""
+    if address.startswith("tcp://"):
+        host, port = address[len("tcp://"):].rsplit(":", 1)
+        sock = socket.create_connection((host, int(port)))
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+    if address.startswith("unix:"):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(address[len("unix:"):])
+        return sock
+    raise Exception(f"[ERROR] Unsupported stream address: {address} (use tcp://host:port or unix:/path)")
+
+
+def stream_ticks(sink, rate=10_000, duration_s=10.0, speed=1.0, seed=42, base_price=INDEX_BASE["nifty_daily"]):
+    """
+    Emit ticks into sink: a queue.Queue (one TICK_DTYPE array per batch, then
+    None), a connected socket, or an address for _connect. The socket is
+    closed at the end, which ends the stream. Returns producer stats.
+    """
+    stream = TickStream(rate, speed, seed, base_price)
+    sock = _connect(sink) if isinstance(sink, str) else sink
+    to_queue = isinstance(sock, queue.Queue)
+    t0 = time.perf_counter()
+    try:
+        for batch in stream.batches(duration_s):
+            if to_queue:
+                sock.put(batch)
+            else:
+                sock.sendall(TICK_HEADER.pack(len(batch)) + batch.tobytes())
+    finally:
+        if to_queue:
+            sock.put(None)
+        else:
+            sock.close()
+    elapsed = time.perf_counter() - t0
+    return {"ticks": stream.emitted, "seconds": elapsed, "rate": stream.emitted / elapsed if elapsed else 0.0,
+            "max_lag_ms": stream.max_lag_s * 1000, "batch": stream.batch}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OmniSpectrum synthetic market data")
+    parser.add_argument("--bars", type=int, default=730, help="Bars per symbol (default 730 daily bars)")
+    parser.add_argument("--freq", default="D", help="Bar frequency: D, B, 5min, 1min ... (default D)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--correlation", default=None,
+                        help="JSON correlation matrix: {\"symbols\": [...], \"matrix\": [[...]]} or a bare matrix")
+    parser.add_argument("--symbols", default=None, help=f"Comma-separated subset of {','.join(SYMBOLS)}")
+    parser.add_argument("--format", choices=["json", "store", "both"], default="both",
+                        help="Write the JSON cache, the market store, or both (JSON is slow past ~100k bars)")
+    parser.add_argument("--json-path", default=JSON_CACHE)
+    parser.add_argument("--store-dir", default=STORE_DIR)
+    parser.add_argument("--stream", default=None, metavar="ADDRESS",
+                        help="Tick stream mode: send ticks to tcp://host:port or unix:/path (see src.bar_aggregator)")
+    parser.add_argument("--rate", type=float, default=10_000, help="Stream: ticks per second")
+    parser.add_argument("--duration", type=float, default=10.0, help="Stream: seconds to run")
+    parser.add_argument("--speed", type=float, default=60.0, help="Stream: market seconds per wall-clock second")
+    args = parser.parse_args(argv)
+
+    if args.stream:
+        print(f"[INFO] Streaming {args.rate:,.0f} ticks/s for {args.duration:.0f}s to {args.stream} "
+              f"(market clock x{args.speed:g})")
+        stats = stream_ticks(args.stream, args.rate, args.duration, args.speed, args.seed)
+        print(f"[OK] Sent {stats['ticks']:,d} ticks in {stats['seconds']:.2f}s ({stats['rate']:,.0f}/s, "
+              f"max lag {stats['max_lag_ms']:.1f} ms)")
+        return 0
+
+    symbols = args.symbols.split(",") if args.symbols else SYMBOLS
+    if "nifty_daily" not in symbols:
+        raise Exception("[ERROR] --symbols must include nifty_daily")
+    correlation = load_correlation(args.correlation, symbols) if args.correlation else None
+
+    print("\n" + "=" * 75)
+    print("OmniSpectrum: Synthetic Data Generator")
+    print("=" * 75)
+    print("Generating realistic fake market data for offline testing...")
+
+    t0 = pd.Timestamp.now()
+    frames = generate_market(args.bars, args.freq, symbols, correlation, seed=args.seed)
+    elapsed = (pd.Timestamp.now() - t0).total_seconds()
+    nifty = frames["nifty_daily"]
+    print(f"\n[1/3] {len(symbols)} correlated symbols x {args.bars:,d} bars ({args.freq}) in {elapsed:.2f}s")
+    print(f"      {nifty['Date'].min()} -> {nifty['Date'].max()}")
+    for name, df in frames.items():
+        print(f"      {name:12s}: {df['Close'].iloc[-1]:>12,.2f}  (range {df['Close'].min():,.2f} - {df['Close'].max():,.2f})")
+    returns = pd.DataFrame({k: np.diff(np.log(df['Close'].to_numpy())) for k, df in frames.items()})
+    if "vix" in frames and len(returns) > 1:
+        print(f"      corr(nifty, vix) of returns: {returns['nifty_daily'].corr(returns['vix']):+.2f}")
+
+    print("\n[2/3] Generating NIFTY intraday (1d, 2d, 3d @ 5m)...")
+    last_close = nifty['Close'].iloc[-1]
+    for days in (1, 2, 3):
+        frames[f"nifty_{days}d_5m"] = generate_synthetic_intraday(
+            last_close, candles=72 * days, seed=args.seed, name=f"nifty_{days}d_5m")
+        print(f"      {days}d: {72 * days} candles")
+
+    print("\n[3/3] Writing cache...")
+    interval = "1d" if args.freq in ('D', 'B') else args.freq
+    period = f"{args.bars}d" if interval == "1d" else f"{args.bars}bars"
+    meta = {key: {"interval": interval, "period": period} for key in symbols}
+    meta.update({f"nifty_{days}d_5m": {"ticker": "^NSEI", "period": f"{days}d", "interval": "5m"} for days in (1, 2, 3)})
+    write_synthetic_cache(frames, args.json_path, args.store_dir, args.format, meta=meta)
+    extras = _extras(frames)
     print("=" * 75)
-    print(f"Spot: ₹{spot:,.2f}")
-    print(f"VIX: {vix_current:.2f}")
-    print(f"Daily rows: {len(nifty_daily)}")
-    print(f"Sectors: {len(sectors)}")
+    print(f"Spot: ₹{extras['spot']['price']:,.2f}")
+    if "vix" in extras:
+        print(f"VIX: {extras['vix']['price']:.2f}")
+    print(f"Rows per symbol: {args.bars:,d}")
     print("=" * 75)
     print("\nWARNING: This is SYNTHETIC data. For production, use:")
     print("  python -m src.data_fetcher    (with yfinance)")
     print("  python -m src.nse_data_fetcher (with NSE APIs)")
     print("=" * 75 + "\n")
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,280 @@
+"""
+OmniSpectrum: Pipeline Tracing
+==============================
+Lightweight spans for the inference and training pipelines.
+
+    from src import tracing
+    tracing.begin("inference")
+    with tracing.span("features.add_basic", rows=len(df)):
+        df = add_basic_features(df)
+    spans = tracing.end()          # list of span dicts, also written to the sink
+
+A span records its name, parent, nesting depth, start offset and duration
+(ms, relative to begin()) plus any keyword attributes. Spans opened while no
+trace is active cost two perf_counter calls and are dropped, so library code
+can be instrumented unconditionally.
+
+Memory accounting (begin(..., memory=True)) adds per span:
+  peak_mb       tracemalloc peak above the span's starting level (children included)
+  retained_mb   tracemalloc bytes still allocated at exit minus at entry
+  rss_mb        RSS at exit (/proc/self/statm)
+  rss_peak_mb   highest RSS seen by a RSS_INTERVAL_S sampler thread during the span
+A budget (begin(..., budget_mb=N) or $OMNI_MEM_BUDGET_MB) starts the RSS
+sampler (rss_* fields only, unless memory=True) and fails fast: the first
+span boundary after RSS crosses the budget raises with the stage where it
+happened and the report so far. tracemalloc slows allocation-heavy code
+(imports especially) several-fold, so it is opt-in and not needed for the budget.
+
+Sink (end() writes one JSON line per span):
+  - a file path: appended, one trace after another
+  - "stderr"
+  - None: spans are only returned (e.g. into the run_inference.py status JSON)
+The OMNI_TRACE environment variable sets the default sink.
+
+profiled(path) wraps a block in cProfile and dumps pstats to path
+(inspect with: python -m pstats path).
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import threading
+import contextlib
+import tracemalloc
+
+TRACE_ENV = "OMNI_TRACE"
+BUDGET_ENV = "OMNI_MEM_BUDGET_MB"
+PROFILE_TOP = 25
+RSS_INTERVAL_S = 0.005
+MB = 1024 * 1024
+
+_local = threading.local()
+_lock = threading.Lock()
+_active = None
+
+
+def rss_bytes():
+    """Current resident set size, or None where /proc is unavailable"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class _RssSampler(threading.Thread):
+    """Polls RSS in the background; take_peak() returns the max since the last take"""
+
+    def __init__(self, interval=RSS_INTERVAL_S, budget=None):
+        super().__init__(name="rss-sampler", daemon=True)
+        self.interval = interval
+        self.budget = budget
+        self.peak = rss_bytes() or 0
+        self.over = None  # (rss, stage) the first time the budget was crossed
+        self.stage = None
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        rss = rss_bytes() or 0
+        if rss > self.peak:
+            self.peak = rss
+        if self.budget and rss > self.budget and self.over is None:
+            self.over = (rss, self.stage)
+        return rss
+
+    def take_peak(self):
+        current = self.sample()
+        peak, self.peak = self.peak, current
+        return peak
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class Trace:
+    def __init__(self, name, sink=None, memory=False, budget_mb=None, **attrs):
+        self.name = name
+        self.id = uuid.uuid4().hex[:12]
+        self.sink = sink if sink is not None else os.environ.get(TRACE_ENV) or None
+        if budget_mb is None and os.environ.get(BUDGET_ENV):
+            budget_mb = float(os.environ[BUDGET_ENV])
+        self.budget_mb = budget_mb
+        self.memory = bool(memory or budget_mb)  # RSS sampling
+        self.tracemalloc = bool(memory)
+        self.attrs = attrs
+        self.spans = []
+        self.sampler = None
+        self._started_tracemalloc = False
+        if self.tracemalloc and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        if self.memory:
+            self.sampler = _RssSampler(budget=budget_mb * MB if budget_mb else None)
+            self.sampler.start()
+        self.t0 = time.perf_counter()
+        self.started = time.time()
+
+    def close(self):
+        if self.sampler is not None:
+            self.sampler.stop()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+
+    def check_budget(self):
+        """Raise if RSS went over budget since the trace began"""
+        if self.sampler is None or not self.budget_mb:
+            return
+        self.sampler.sample()
+        if self.sampler.over is None:
+            return
+        rss, stage = self.sampler.over
+        spans = sorted(self.spans, key=lambda s: s["start_ms"])
+        raise Exception(f"[ERROR] Memory budget exceeded: RSS {rss / MB:.0f} MB > {self.budget_mb:.0f} MB "
+                        f"during stage '{stage or self.name}'\n{summary(spans)}")
+
+    def record(self, span):
+        with _lock:
+            self.spans.append(span)
+
+    def emit(self):
+        if not self.sink:
+            return
+        lines = [json.dumps({"trace": self.id, "trace_name": self.name, "ts": round(self.started, 3),
+                             **self.attrs, **s}, default=str) for s in self.spans]
+        if self.sink == "stderr":
+            for line in lines:
+                print(line, file=sys.stderr)
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.sink)), exist_ok=True)
+        with open(self.sink, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+
+def begin(name, sink=None, **attrs):
+    """Start a new trace (replacing any active one); sink defaults to $OMNI_TRACE"""
+    global _active
+    if _active is not None:
+        _active.close()
+    _active = Trace(name, sink, **attrs)
+    return _active
+
+
+def end():
+    """Close the active trace, write it to its sink and return its spans (oldest first)"""
+    global _active
+    trace, _active = _active, None
+    if trace is None:
+        return []
+    trace.close()
+    trace.spans.sort(key=lambda s: s["start_ms"])
+    trace.emit()
+    return trace.spans
+
+
+def active():
+    return _active
+
+
+class _Frame:
+    __slots__ = ("name", "mem0", "peak", "rss_peak")
+
+    def __init__(self, name):
+        self.name = name
+        self.mem0 = self.peak = self.rss_peak = 0
+
+
+def _fold_peaks(stack, trace):
+    """Push the peaks since the last reset into every open frame, then reset"""
+    peak = tracemalloc.get_traced_memory()[1] if trace.tracemalloc else 0
+    rss_peak = trace.sampler.take_peak()
+    for frame in stack:
+        frame.peak = max(frame.peak, peak)
+        frame.rss_peak = max(frame.rss_peak, rss_peak)
+    if trace.tracemalloc:
+        tracemalloc.reset_peak()
+
+
+@contextlib.contextmanager
+def span(name, **attrs):
+    """Time a block as a child of the innermost open span"""
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    trace = _active
+    memory = trace is not None and trace.memory
+    parent = stack[-1].name if stack else None
+    frame = _Frame(name)
+    if memory:
+        trace.check_budget()
+        _fold_peaks(stack, trace)
+        if trace.tracemalloc:
+            frame.mem0 = frame.peak = tracemalloc.get_traced_memory()[0]
+        trace.sampler.stage = name
+    stack.append(frame)
+    t0 = time.perf_counter()
+    error = None
+    try:
+        yield attrs
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        t1 = time.perf_counter()
+        if memory:
+            _fold_peaks(stack, trace)
+        stack.pop()
+        if trace is not None and trace is _active:
+            record = {"span": name, "parent": parent, "depth": len(stack),
+                      "start_ms": round((t0 - trace.t0) * 1000, 3),
+                      "duration_ms": round((t1 - t0) * 1000, 3)}
+            if memory:
+                if trace.tracemalloc:
+                    record["peak_mb"] = round((frame.peak - frame.mem0) / MB, 3)
+                    record["retained_mb"] = round((tracemalloc.get_traced_memory()[0] - frame.mem0) / MB, 3)
+                record["rss_mb"] = round(trace.sampler.sample() / MB, 1)
+                record["rss_peak_mb"] = round(frame.rss_peak / MB, 1)
+                trace.sampler.stage = parent
+            if attrs:
+                record["attrs"] = attrs
+            if error:
+                record["error"] = error
+            trace.record(record)
+    if memory and trace is _active:
+        trace.check_budget()
+
+
+def summary(spans):
+    """One line per span, indented by depth: '  name  12.3 ms' (+ memory columns when recorded)"""
+    width = max((len(s["span"]) + 2 * s["depth"] for s in spans), default=0)
+    lines = []
+    for s in spans:
+        line = f"  {'  ' * s['depth'] + s['span']:<{width}}  {s['duration_ms']:10.1f} ms"
+        if "peak_mb" in s:
+            line += f"  peak {s['peak_mb']:9.1f} MB  retained {s['retained_mb']:+9.1f} MB"
+        if "rss_mb" in s:
+            line += f"  rss {s['rss_mb']:8.1f} MB (max {s['rss_peak_mb']:.1f})"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+@contextlib.contextmanager
+def profiled(path, top=PROFILE_TOP):
+    """cProfile the block; dump pstats to path and print the top entries by cumulative time to stderr"""
+    import cProfile
+    import pstats
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        profiler.dump_stats(path)
+        stats = pstats.Stats(profiler, stream=sys.stderr)
+        stats.sort_stats("cumulative").print_stats(top)
+        print(f"[OK] Profile written: {path} (python -m pstats {path})", file=sys.stderr)
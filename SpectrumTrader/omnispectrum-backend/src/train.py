@@ -1,15 +1,20 @@
 import os
+import argparse
+import contextlib
 import joblib
 import numpy as np
-import pandas as pd
 import torch
 import torch.nn as nn
 from sklearn.neural_network import MLPClassifier
 from sklearn.model_selection import train_test_split
 import lightgbm as lgb
+from src.labels import direction_labels, expansion_labels_from_windows
+from src.encoder_bundle import export_bundle
+from src import tracing
+from src.tracing import span
 from src.features import (
-    download_nifty, add_basic_features, build_tme_window,
-    build_vse_grid, build_gfe_geometry, build_engineered_features
+    add_basic_features, build_tme_windows, build_vse_grids, build_gfe_geometries, build_engineered_matrix,
+    load_cache, cache_to_frame
 )
 
 class TME_LSTM(nn.Module):
@@ -49,129 +54,80 @@ class GFE_AE(nn.Module):
         recon = self.dec(z)
         return z, recon
 
-def prepare_dataset(use_cache=True):
-    """Prepare dataset from cached data only"""
+def prepare_dataset(use_cache=True, cached_data=None):
+    """Prepare dataset from cached data only (cached_data defaults to load_cache())"""
     print("[INFO] Loading dataset from cache...")
     
-    import json
-    from pathlib import Path
-    
-    # Use cache path from features module
-    cache_file = Path(os.path.dirname(__file__)) / ".." / ".." / "data" / "prediction_data.json"
-    cache_file = cache_file.resolve()
-    
-    if not cache_file.exists():
-        raise Exception(f"[ERROR] Cache file not found: {cache_file}\nRun 'python -m src.data_fetcher' or 'python -m src.synthetic_data_gen' first")
-    
     try:
-        with open(cache_file, "r") as f:
-            cached_data = json.load(f)
-        
-        # Handle both canonical (yfinance) and synthetic (generated) cache formats
-        if "series" in cached_data:
-            # Synthetic/new format with series.nifty_daily.data
-            nifty_data = cached_data["series"]["nifty_daily"]["data"]
-            # Convert list of dicts to OHLCV dict structure
-            ohlc = {
-                "open": [row["Open"] for row in nifty_data],
-                "high": [row["High"] for row in nifty_data],
-                "low": [row["Low"] for row in nifty_data],
-                "close": [row["Close"] for row in nifty_data],
-                "volume": [row.get("Volume", 0) for row in nifty_data]
-            }
-        else:
-            # Legacy format with direct ohlc dict
-            ohlc = cached_data.get("ohlc", {})
-        
-        if not ohlc or "close" not in ohlc or len(ohlc["close"]) == 0:
-            raise Exception("[ERROR] Invalid cache: missing or empty OHLC data")
-        
-        print(f"[OK] Loaded {len(ohlc['close'])} days of cached data")
-        
-        # Convert to DataFrame
-        df = pd.DataFrame({
-            "Open": ohlc.get("open", []),
-            "High": ohlc.get("high", []),
-            "Low": ohlc.get("low", []),
-            "Close": ohlc.get("close", []),
-            "Volume": ohlc.get("volume", [])
-        })
+        if cached_data is None:
+            with span("cache.load"):
+                cached_data = load_cache()
+        with span("frame.build"):
+            df = cache_to_frame(cached_data)
+        del cached_data  # parsed JSON payload is not needed once the frame exists
         
         if len(df) < 100:
             raise Exception(f"[ERROR] Insufficient data: {len(df)} days (need at least 100)")
         
-        df = add_basic_features(df)
+        with span("features.add_basic", rows=len(df)):
+            df = add_basic_features(df)
         
-        # Build feature windows for all valid indices
-        X_tme, X_vse, X_gfe, X_eng, Y = [], [], [], [], []
-        for idx in range(90, len(df) - 5):
-            tme = build_tme_window(df, idx, window=90)
-            vse = build_vse_grid(df, idx, window=60)
-            gfe = build_gfe_geometry(df, idx, window=20)
-            eng = build_engineered_features(df, idx)
-            
-            # Compute label from next 5 days
-            future_returns = df['Close'].iloc[idx+1:idx+6].pct_change().fillna(0)
-            mean_future = future_returns.mean()
-            if mean_future > 0.005:
-                label = 2
-            elif mean_future < -0.005:
-                label = 0
-            else:
-                label = 1
-            
-            X_tme.append(tme)
-            X_vse.append(vse)
-            X_gfe.append(gfe)
-            X_eng.append(list(eng.values()))
-            Y.append(label)
+        # Build feature windows for all valid indices in one batched pass
+        indices = np.arange(90, len(df) - 5)
+        with span("windows.tme", samples=len(indices)):
+            X_tme = build_tme_windows(df, indices, window=90)
+        with span("windows.vse", samples=len(indices)):
+            X_vse = build_vse_grids(df, indices, window=60)
+        with span("windows.gfe", samples=len(indices)):
+            X_gfe = build_gfe_geometries(df, indices, window=20)
+        with span("windows.engineered", samples=len(indices)):
+            X_eng = build_engineered_matrix(df, indices)
         
-        X_tme = np.array(X_tme)
-        X_vse = np.array(X_vse)
-        X_gfe = np.array(X_gfe)
-        X_eng = np.array(X_eng)
-        Y = np.array(Y)
+        # Direction label from the next 5 days
+        with span("labels.direction"):
+            Y = direction_labels(df['Close'].to_numpy(), indices, horizon=5, threshold=0.005)
         
         print(f"[OK] Dataset prepared: {len(Y)} samples (X_tme: {X_tme.shape}, X_vse: {X_vse.shape}, X_gfe: {X_gfe.shape}, X_eng: {X_eng.shape})")
         return X_tme, X_vse, X_gfe, X_eng, Y, df
         
-    except json.JSONDecodeError as e:
-        raise Exception(f"[ERROR] Invalid JSON in cache: {e}")
     except Exception as e:
         if "[ERROR]" in str(e):
             raise
         raise Exception(f"[ERROR] Failed to process cache: {e}")
 
-def train_all():
+def train_all(cached_data=None, model_dir="models"):
     print("[INFO] Loading data...")
-    X_tme, X_vse, X_gfe, X_eng, Y, df = prepare_dataset()
+    with span("prepare_dataset"):
+        X_tme, X_vse, X_gfe, X_eng, Y, df = prepare_dataset(cached_data=cached_data)
     print(f"[OK] Dataset: {len(Y)} samples")
     device = torch.device('cpu')
     print("\n[INFO] Training TME_LSTM...")
-    tme = TME_LSTM()
-    optimizer = torch.optim.Adam(tme.parameters(), lr=1e-3)
-    X_tme_t = torch.tensor(X_tme, dtype=torch.float32)
-    for ep in range(10):
-        tme.train()
-        optimizer.zero_grad()
-        out = tme(X_tme_t)
-        loss = out.norm() * 0.0
-        loss.backward()
-        optimizer.step()
-    torch.save(tme.state_dict(), "models/tme_lstm.pt")
+    with span("train.tme_lstm", epochs=10):
+        tme = TME_LSTM()
+        optimizer = torch.optim.Adam(tme.parameters(), lr=1e-3)
+        X_tme_t = torch.tensor(X_tme, dtype=torch.float32)
+        for ep in range(10):
+            tme.train()
+            optimizer.zero_grad()
+            out = tme(X_tme_t)
+            loss = out.norm() * 0.0
+            loss.backward()
+            optimizer.step()
+        torch.save(tme.state_dict(), os.path.join(model_dir, "tme_lstm.pt"))
     print("[OK] Saved tme_lstm.pt")
     print("\n[INFO] Training VSE_CNN...")
     vse = VSE_CNN()
-    torch.save(vse.state_dict(), "models/vse_cnn.pt")
+    torch.save(vse.state_dict(), os.path.join(model_dir, "vse_cnn.pt"))
     print("[OK] Saved vse_cnn.pt")
     print("\n[INFO] Training GFE_AE...")
     gfe = GFE_AE()
-    torch.save(gfe.state_dict(), "models/gfe_ae.pt")
+    torch.save(gfe.state_dict(), os.path.join(model_dir, "gfe_ae.pt"))
     print("[OK] Saved gfe_ae.pt")
     print("\n[INFO] Extracting embeddings...")
-    with torch.no_grad():
+    with torch.no_grad(), span("embeddings"):
         tme.eval(); vse.eval(); gfe.eval()
-        tme_outs = tme(torch.tensor(X_tme, dtype=torch.float32)).numpy()
+        with span("forward.tme"):
+            tme_outs = tme(torch.tensor(X_tme, dtype=torch.float32)).numpy()
         if tme_outs.ndim == 1:
             tme_outs = tme_outs.reshape(-1, 1)
         
@@ -182,7 +138,8 @@ def train_all():
             X_vse_reshaped = X_vse.transpose(0, 3, 1, 2)
         
         vse_tensor = torch.tensor(X_vse_reshaped, dtype=torch.float32)
-        vse_out = vse(vse_tensor)
+        with span("forward.vse"):
+            vse_out = vse(vse_tensor)
         # Flatten VSE output to 2D
         if vse_out.ndim > 2:
             vse_outs = vse_out.reshape(vse_out.shape[0], -1).numpy()
@@ -191,7 +148,8 @@ def train_all():
         if vse_outs.ndim == 1:
             vse_outs = vse_outs.reshape(-1, 1)
         
-        gfe_z, _ = gfe(torch.tensor(X_gfe, dtype=torch.float32))
+        with span("forward.gfe"):
+            gfe_z, _ = gfe(torch.tensor(X_gfe, dtype=torch.float32))
         gfe_outs = gfe_z.numpy()
         if gfe_outs.ndim == 1:
             gfe_outs = gfe_outs.reshape(-1, 1)
@@ -220,7 +178,7 @@ def train_all():
     if n_min < 10:
         print(f"    [WARN] Only {n_min} samples, skipping MLP training")
         mlp = MLPClassifier(hidden_layer_sizes=(64,), max_iter=500, random_state=42)
-        joblib.dump(mlp, "models/fusion_mlp.joblib")
+        joblib.dump(mlp, os.path.join(model_dir, "fusion_mlp.joblib"))
     else:
         fused = np.hstack([tme_outs[:n_min], vse_outs[:n_min], gfe_outs[:n_min], eng_arr[:n_min]])
         Y_fused = Y[:n_min]
@@ -231,21 +189,44 @@ def train_all():
             fused, Y_fused, test_size=test_size, random_state=42
         )
         mlp = MLPClassifier(hidden_layer_sizes=(64,), max_iter=500, random_state=42)
-        mlp.fit(X_train, y_train)
-        score = mlp.score(X_val, y_val)
+        with span("train.fusion_mlp", samples=len(X_train)):
+            mlp.fit(X_train, y_train)
+        with span("predict.fusion", samples=len(X_val)):
+            score = mlp.score(X_val, y_val)
         print(f"[OK] Fusion MLP accuracy: {score:.3f}")
-        joblib.dump(mlp, "models/fusion_mlp.joblib")
+        joblib.dump(mlp, os.path.join(model_dir, "fusion_mlp.joblib"))
     print("\n[INFO] Training LightGBM expansion probability...")
-    rv_3 = np.array([np.std(X_tme[i][-3:, 0]) * np.sqrt(252) for i in range(len(X_tme))])
-    rv_90 = np.array([np.std(X_tme[i][:, 0]) * np.sqrt(252) + 1e-9 for i in range(len(X_tme))])
-    exp_label = (rv_3 > rv_90).astype(int)
+    exp_label = expansion_labels_from_windows(X_tme[:, :, 0], short=3)
     lgb_train = lgb.Dataset(fused, label=exp_label)
     params = {"objective": "binary", "metric": "binary_logloss", "verbosity": -1}
-    bst = lgb.train(params, lgb_train, num_boost_round=100)
-    bst.save_model("models/lgb_expansion.txt")
+    with span("train.lightgbm", rounds=100):
+        bst = lgb.train(params, lgb_train, num_boost_round=100)
+    bst.save_model(os.path.join(model_dir, "lgb_expansion.txt"))
     print("[OK] Saved lgb_expansion.txt")
-    print("\n[OK] Training complete! Models saved to models/")
+    print("\n[INFO] Exporting fused encoder bundle...")
+    try:
+        with span("export.bundle"):
+            path = export_bundle(tme, vse, gfe, (X_tme[-64:], X_vse[-64:], X_gfe[-64:]), model_dir=model_dir)
+        print(f"[OK] Saved {os.path.basename(path)}")
+    except Exception as e:
+        print(f"[WARN] Encoder bundle export failed, inference will use eager encoders: {e}")
+    print(f"\n[OK] Training complete! Models saved to {model_dir}/")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the OmniSpectrum models from the market cache")
+    parser.add_argument("--trace", default=None, help="Also write spans as JSON lines to FILE or 'stderr'")
+    parser.add_argument("--profile", default=None, metavar="PATH", help="cProfile the run and dump pstats to PATH")
+    parser.add_argument("--memory", action="store_true", help="Record tracemalloc peak/retained bytes and RSS per stage")
+    parser.add_argument("--mem-budget", type=float, default=None, metavar="MB",
+                        help="Fail as soon as RSS exceeds MB, with a per-stage memory report")
+    args = parser.parse_args()
     os.makedirs("models", exist_ok=True)
-    train_all()
+    tracing.begin("train", sink=args.trace, memory=args.memory, budget_mb=args.mem_budget)
+    try:
+        with tracing.profiled(args.profile) if args.profile else contextlib.nullcontext():
+            with span("train_all"):
+                train_all()
+    finally:
+        spans = tracing.end()
+        print("\n[INFO] Stage timings:")
+        print(tracing.summary(spans))
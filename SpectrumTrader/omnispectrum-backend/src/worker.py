@@ -0,0 +1,202 @@
+"""
+OmniSpectrum: Resident Inference Worker
+=======================================
+Long-lived inference process for the Node server. Models and the market cache
+are loaded once and kept in memory; each request only re-runs the forward pass.
+
+Protocol: JSON lines (one request per line, one response per line)
+  -> {"id": 1, "cmd": "infer", "output_path": "data/omnispectrum.json"}
+  <- {"id": 1, "status": "success", "output_path": "...", "elapsed_ms": 12.3, "reloaded": []}
+  -> {"id": 2, "cmd": "ping"}        <- {"id": 2, "status": "ok", ...}
+  -> {"id": 3, "cmd": "shutdown"}    <- {"id": 3, "status": "bye"}
+
+Transport: stdin/stdout (default) or a local Unix socket (--socket PATH).
+Models are reloaded only when a file under models/ changes on disk, and the
+cache only when prediction_data.json or the market store manifest changes.
+An infer request whose inputs and models match the run that wrote its output
+file returns that file without running the pipeline (src.result_cache);
+responses carry "cache": "hit" / "miss". Each infer response also carries
+its per-stage "spans" (src.tracing).
+"""
+import os
+import sys
+import json
+import time
+import contextlib
+import socketserver
+from src.features import CACHE_FILE, load_cache, cache_to_frame
+from src.market_store import STORE_DIR, MANIFEST
+from src.inference import MODEL_DIR, MODEL_FILES, load_models, run_inference
+from src.result_cache import ResultCache
+from src import tracing
+
+DEFAULT_OUTPUT = os.path.join("data", "omnispectrum.json")
+
+
+def _file_signature(path):
+    """(mtime_ns, size) of a file, or None if it does not exist"""
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+
+class InferenceWorker:
+    def __init__(self, model_dir=MODEL_DIR, cache_file=CACHE_FILE, store_dir=STORE_DIR, quantize=None,
+                 result_cache=True, trace_sink=None, trace_memory=False, mem_budget_mb=None):
+        self.model_dir = model_dir
+        self.quantize = quantize
+        self.cache_file = cache_file
+        self.store_dir = store_dir
+        self.models = None
+        self.cached_data = None
+        self.df = None
+        self._model_sig = None
+        self._cache_sig = None
+        self.requests_served = 0
+        self.result_cache = result_cache
+        self._result_caches = {}
+        self.trace_sink = trace_sink
+        self.trace_memory = trace_memory
+        self.mem_budget_mb = mem_budget_mb
+
+    def _model_signature(self):
+        return tuple(_file_signature(os.path.join(self.model_dir, name)) for name in MODEL_FILES)
+
+    def _cache_signature(self):
+        return (_file_signature(self.cache_file), _file_signature(os.path.join(self.store_dir, MANIFEST)))
+
+    def refresh(self):
+        """Reload models and/or cache if their files changed. Returns list of reloaded parts."""
+        reloaded = []
+        model_sig = self._model_signature()
+        if self.models is None or model_sig != self._model_sig:
+            print("[INFO] Loading models...")
+            with tracing.span("models.load"):
+                self.models = load_models(quantize=self.quantize)
+            self._model_sig = model_sig
+            reloaded.append("models")
+        cache_sig = self._cache_signature()
+        if self.cached_data is None or cache_sig != self._cache_sig:
+            print("[INFO] Loading cached market data...")
+            with tracing.span("cache.load"):
+                self.cached_data = load_cache(self.cache_file, self.store_dir)
+            with tracing.span("frame.build"):
+                self.df = cache_to_frame(self.cached_data)
+            self._cache_sig = cache_sig
+            reloaded.append("cache")
+        return reloaded
+
+    def _cache_for(self, output_path):
+        if output_path not in self._result_caches:
+            self._result_caches[output_path] = ResultCache(
+                output_path, self.model_dir, self.cache_file, self.store_dir, quantize=self.quantize)
+        return self._result_caches[output_path]
+
+    def infer(self, output_path=DEFAULT_OUTPUT):
+        start = time.perf_counter()
+        tracing.begin("infer", sink=self.trace_sink, memory=self.trace_memory, budget_mb=self.mem_budget_mb,
+                      request=self.requests_served + 1)
+        try:
+            cache = self._cache_for(output_path) if self.result_cache else None
+            with tracing.span("result_cache.lookup"):
+                hit = cache is not None and cache.lookup()
+            reloaded = []
+            if not hit:
+                with tracing.span("refresh") as attrs:
+                    reloaded = self.refresh()
+                    attrs["reloaded"] = reloaded
+                with tracing.span("run_inference"):
+                    run_inference(output_path=output_path, models=self.models,
+                                  cached_data=self.cached_data, df=self.df)
+                if cache is not None:
+                    cache.store(time.perf_counter() - start)
+        finally:
+            spans = tracing.end()
+        self.requests_served += 1
+        return {
+            "status": "success",
+            "output_path": os.path.abspath(output_path),
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 2),
+            "reloaded": reloaded,
+            "cache": "hit" if hit else ("miss" if cache is not None else "off"),
+            "spans": spans,
+        }
+
+    def handle(self, line):
+        """Handle one protocol line; returns (response dict, keep_running)"""
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as e:
+            return {"status": "error", "error_type": "JSONDecodeError", "message": str(e)}, True
+
+        req_id = request.get("id")
+        cmd = request.get("cmd", "infer")
+        try:
+            if cmd == "infer":
+                response = self.infer(request.get("output_path") or DEFAULT_OUTPUT)
+            elif cmd == "ping":
+                response = {"status": "ok", "pid": os.getpid(), "requests_served": self.requests_served}
+            elif cmd == "shutdown":
+                response = {"status": "bye"}
+            else:
+                response = {"status": "error", "error_type": "ValueError", "message": f"Unknown cmd: {cmd}"}
+        except Exception as e:
+            response = {"status": "error", "error_type": type(e).__name__, "message": str(e)}
+        response["id"] = req_id
+        return response, cmd != "shutdown"
+
+
+def serve_stdio(worker, stream_in=None, stream_out=None):
+    """Serve JSON-lines requests on stdin/stdout. Pipeline logs go to stderr."""
+    stream_in = stream_in or sys.stdin
+    stream_out = stream_out or sys.stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        worker.refresh()
+        print("[OK] Inference worker ready")
+        for line in stream_in:
+            if not line.strip():
+                continue
+            response, keep_running = worker.handle(line)
+            stream_out.write(json.dumps(response) + "\n")
+            stream_out.flush()
+            if not keep_running:
+                break
+
+
+def serve_unix(worker, socket_path):
+    """Serve JSON-lines requests on a local Unix socket (one request at a time)."""
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for raw in self.rfile:
+                line = raw.decode("utf-8")
+                if not line.strip():
+                    continue
+                with contextlib.redirect_stdout(sys.stderr):
+                    response, keep_running = worker.handle(line)
+                self.wfile.write((json.dumps(response) + "\n").encode("utf-8"))
+                self.wfile.flush()
+                if not keep_running:
+                    self.server._shutdown_requested = True
+                    return
+
+    with contextlib.redirect_stdout(sys.stderr):
+        worker.refresh()
+    server = socketserver.UnixStreamServer(socket_path, Handler)
+    server._shutdown_requested = False
+    print(f"[OK] Inference worker listening on {socket_path}", file=sys.stderr)
+    try:
+        while not server._shutdown_requested:
+            server.handle_request()
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+if __name__ == "__main__":
+    serve_stdio(InferenceWorker())
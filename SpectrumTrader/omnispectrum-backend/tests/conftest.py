@@ -0,0 +1,5 @@
+import os
+import sys
+
+# tests import the backend as `src.*`, the same way `python -m src.x` runs it
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,25 @@
+"""BarAggregator bars against a pandas resample of the same ticks"""
+import numpy as np
+import pandas as pd
+import pytest
+from src.synthetic_data_gen import TickStream
+from src.bar_aggregator import BarAggregator, INTERVALS
+
+
+@pytest.mark.parametrize("rate,speed", [(50_000, 600.0), (2_000, 60.0)])
+def test_bars_match_pandas_resample(rate, speed, ticks=150_000):
+    stream = TickStream(rate, speed, start_ns=1_700_000_000 * 10**9)
+    agg = BarAggregator(list(INTERVALS), history=ticks)
+    batches = [stream.next_batch() for _ in range(ticks // stream.batch)]
+    for batch in batches:
+        agg.add(batch)
+    agg.flush()
+    t = np.concatenate(batches)
+    df = pd.DataFrame({"price": t["price"], "qty": t["qty"]}, index=pd.to_datetime(t["ts"]))
+    for interval, step in INTERVALS.items():
+        ref = df.resample(pd.Timedelta(step, "ns")).agg(
+            {"price": ["first", "max", "min", "last"], "qty": "sum"}).dropna()
+        got = agg.frame(interval)
+        assert len(got) == len(ref), interval
+        assert np.array_equal(got[["Open", "High", "Low", "Close"]].to_numpy(), ref["price"].to_numpy()), interval
+        assert np.array_equal(got["Volume"].to_numpy(), ref["qty"]["sum"].to_numpy()), interval
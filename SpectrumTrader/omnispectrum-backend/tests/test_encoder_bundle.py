@@ -0,0 +1,48 @@
+"""Exported TorchScript encoder bundle against the eager encoders"""
+import os
+import numpy as np
+import pytest
+torch = pytest.importorskip("torch")
+from src.features import add_basic_features, build_tme_windows, build_vse_grids, build_gfe_geometries
+from src.encoder_bundle import STATE_FILES, BUNDLE_FILE, load_eager_encoders, load_encoders, export_bundle, encode
+from src.benchmark import random_ohlc
+
+
+@pytest.fixture(scope="module")
+def windows():
+    feats = add_basic_features(random_ohlc(2_000, seed=2))
+    indices = np.arange(90, len(feats))
+    return build_tme_windows(feats, indices), build_vse_grids(feats, indices), build_gfe_geometries(feats, indices)
+
+
+@pytest.fixture(scope="module")
+def model_dir(tmp_path_factory, windows):
+    from src.train import TME_LSTM, VSE_CNN, GFE_AE
+    path = str(tmp_path_factory.mktemp("models"))
+    torch.manual_seed(0)
+    tme, vse, gfe = TME_LSTM().eval(), VSE_CNN().eval(), GFE_AE().eval()
+    for m, name in zip((tme, vse, gfe), STATE_FILES):
+        torch.save(m.state_dict(), os.path.join(path, name))
+    export_bundle(tme, vse, gfe, tuple(w[-64:] for w in windows), path)
+    return path
+
+
+@pytest.mark.parametrize("n", [1, 256])
+def test_bundle_matches_eager(model_dir, windows, n):
+    eager = load_eager_encoders(model_dir)
+    bundle = torch.jit.load(os.path.join(model_dir, BUNDLE_FILE))
+    batch = tuple(w[-n:] for w in windows)
+    a, b = encode(eager, *batch), encode(bundle, *batch)
+    assert a.shape == (n, 80)
+    assert np.max(np.abs(a - b)) <= 1e-4
+
+
+def test_stale_bundle_falls_back_to_eager(model_dir):
+    assert load_encoders(model_dir)[1] == "bundle"
+    bundle_mtime = os.path.getmtime(os.path.join(model_dir, BUNDLE_FILE))
+    state = os.path.join(model_dir, STATE_FILES[0])
+    os.utime(state, (bundle_mtime + 10, bundle_mtime + 10))
+    try:
+        assert load_encoders(model_dir)[1] == "eager"
+    finally:
+        os.utime(state, (bundle_mtime, bundle_mtime))
@@ -0,0 +1,32 @@
+"""FeatureState streaming updates against a full add_basic_features recompute"""
+import numpy as np
+import pytest
+from src.features import add_basic_features, build_tme_window, build_vse_grid, build_gfe_geometry, build_engineered_features
+from src.feature_state import FeatureState
+from src.benchmark import random_ohlc
+
+
+def assert_matches_recompute(state, df):
+    feats = add_basic_features(df)
+    end = len(feats) - 1
+    expected = (build_tme_window(feats, end), build_vse_grid(feats, end), build_gfe_geometry(feats, end))
+    got = state.model_inputs()
+    for name, a, b in zip(("tme", "vse", "gfe"), expected, got[:3]):
+        assert np.allclose(a, b, atol=1e-6), f"{name} window differs from full recompute"
+    eng = build_engineered_features(feats, end)
+    for k in eng:
+        assert np.isclose(eng[k], got[3][k], rtol=1e-9), f"engineered {k} differs from full recompute"
+
+
+@pytest.mark.parametrize("history,updates", [(5_000, 2_000), (200, 1)])
+def test_updates_match_full_recompute(history, updates):
+    df = random_ohlc(history + updates, seed=1)
+    state = FeatureState.from_history(df.iloc[:history])
+    for o, h, l, c, v in df.iloc[history:].to_numpy():
+        state.update(o, h, l, c, v)
+    assert_matches_recompute(state, df)
+
+
+def test_seed_matches_full_recompute():
+    df = random_ohlc(1_000, seed=3)
+    assert_matches_recompute(FeatureState.from_history(df), df)
@@ -0,0 +1,77 @@
+"""add_basic_features against the original pandas implementation"""
+import numpy as np
+import pandas as pd
+import pytest
+from src.features import add_basic_features
+from src.benchmark import random_ohlc
+
+FEATURE_COLUMNS = [
+    "Return", "rv_5", "rv_10", "rv_20", "rv_60", "ema_8", "ema_21", "ema_slope",
+    "range", "range_10", "rv_ratio_10_60", "ret_z_20",
+]
+
+
+def add_basic_features_reference(df):
+    """Original pandas implementation of add_basic_features, kept as the parity reference"""
+    df = df.copy()
+    
+    # Return series (pct_change's pre-pandas-3 fill_method='pad', spelled out)
+    df['Return'] = df['Close'].ffill().pct_change().fillna(0)
+    
+    # Realized Volatility (multiple windows)
+    for w in [5, 10, 20, 60]:
+        df[f"rv_{w}"] = df['Return'].rolling(w).std() * np.sqrt(252)
+    
+    # Exponential Moving Averages
+    df['ema_8'] = df['Close'].ewm(span=8, adjust=False).mean()
+    df['ema_21'] = df['Close'].ewm(span=21, adjust=False).mean()
+    df['ema_slope'] = (df['ema_8'] - df['ema_21']) / (df['ema_21'] + 1e-9)
+    
+    # Range metrics
+    df['range'] = (df['High'] - df['Low']) / (df['Close'] + 1e-9)
+    df['range_10'] = df['range'].rolling(10).mean()
+    
+    # Volatility ratio
+    df['rv_ratio_10_60'] = df['rv_10'] / (df['rv_60'] + 1e-9)
+    
+    # Z-score of returns
+    df['ret_z_20'] = df['Return'].rolling(20).apply(
+        lambda x: (x.iloc[-1] - x.mean()) / (x.std() + 1e-9) if len(x) > 1 else 0
+    )
+    
+    # Remove NaN rows
+    df = df.dropna()
+    return df
+
+
+def assert_feature_parity(df, rtol=1e-9, atol=1e-10):
+    ref = add_basic_features_reference(df)
+    new = add_basic_features(df)
+    assert list(new.columns) == list(ref.columns)
+    assert new.index.equals(ref.index), f"rows after dropna: {len(new)} vs {len(ref)}"
+    for col in FEATURE_COLUMNS:
+        a, b = ref[col].to_numpy(dtype=np.float64), new[col].to_numpy(dtype=np.float64)
+        assert np.allclose(a, b, rtol=rtol, atol=atol), \
+            f"{col} differs from reference (max abs diff {np.max(np.abs(a - b)):.3e})"
+
+
+@pytest.mark.parametrize("n", [61, 1_000, 20_000, 100_000])
+def test_matches_reference(n):
+    assert_feature_parity(random_ohlc(n, seed=n))
+
+
+def test_matches_reference_with_gaps():
+    df = random_ohlc(2_000, seed=7)
+    df.loc[[100, 101, 900], "Close"] = np.nan
+    df.loc[500, "High"] = np.nan
+    assert_feature_parity(df)
+
+
+def test_short_history_is_empty():
+    out = add_basic_features(random_ohlc(30))
+    assert out.empty and list(out.columns) == list(add_basic_features_reference(random_ohlc(30)).columns)
+
+
+def test_keeps_input_index():
+    df = random_ohlc(500).set_index(pd.date_range("2020-01-01", periods=500, freq="D"))
+    assert add_basic_features(df).index.equals(add_basic_features_reference(df).index)
@@ -0,0 +1,64 @@
+"""NSEDataFetcher session handling against the src.feed_server stand-in (cookies required)"""
+import asyncio
+import time
+import pytest
+from src.feed_server import FeedServer, FeedData
+from src.nse_data_fetcher import NSEDataFetcher, AsyncNSEDataFetcher, LIVE_INDICES, fetch_all_nse_data, run_blocking
+
+
+@pytest.fixture(scope="module")
+def data():
+    return FeedData.synthetic()
+
+
+@pytest.fixture
+def server(data):
+    with FeedServer(data, latency_ms=5.0, cookie_ttl=1.0) as server:
+        yield server
+
+
+def make_fetcher(server):
+    return NSEDataFetcher(server.api_url, server.home_url, warmup_delay=0.0, cache_dir=None)
+
+
+def test_one_homepage_load_per_concurrent_run(server, tmp_path):
+    fetcher = make_fetcher(server)
+    fetch_all_nse_data(str(tmp_path / "nse.json"), str(tmp_path / "store"), concurrent=True, fetcher=fetcher)
+    st = server.stats()
+    assert fetcher.stats["homepage_loads"] == 1
+    assert st["cookies_issued"] == 1 and st["unauthorized"] == 0
+
+
+def test_expired_cookie_refreshes_once(server):
+    fetcher = make_fetcher(server)
+    assert fetcher.get_nifty_live() is not None
+    time.sleep(1.1)  # cookie expires server-side; the client TTL (300 s) still trusts it
+    server.reset_stats()
+    assert fetcher.get_nifty_live() is not None
+    assert server.stats()["unauthorized"] == 1
+    assert fetcher.stats["auth_refreshes"] == 1
+
+
+def test_request_counters_match_server_under_concurrency(server, rounds=20):
+    server.cookie_ttl = None
+    fetcher = make_fetcher(server)
+    before = fetcher.stats.get("requests", 0)
+
+    async def burst():
+        async with AsyncNSEDataFetcher(fetcher=fetcher, concurrency=fetcher.pool_size) as client:
+            for _ in range(rounds):
+                await client.get_indices_live(LIVE_INDICES)
+    asyncio.run(burst())
+    served = server.stats()["routes"].get("equity-stockIndices", 0)
+    assert served >= rounds * len(LIVE_INDICES)
+    assert fetcher.stats["requests"] - before == served
+
+
+def test_run_blocking_inside_running_loop():
+    async def value():
+        return 42
+
+    async def caller():
+        return run_blocking(value())
+    assert run_blocking(value()) == 42
+    assert asyncio.run(caller()) == 42
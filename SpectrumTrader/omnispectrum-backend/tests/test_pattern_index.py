@@ -0,0 +1,82 @@
+"""PatternIndex storage: appends, generation-swapped rebuilds, damaged files"""
+import os
+import numpy as np
+import pandas as pd
+import pytest
+torch = pytest.importorskip("torch")
+from src.features import add_basic_features, build_gfe_geometries
+from src.pattern_index import PatternIndex, GFE_WINDOW, encode_windows, load_gfe_encoder
+from src.benchmark import random_ohlc
+
+
+@pytest.fixture(scope="module")
+def model_dir(tmp_path_factory):
+    from src.train import GFE_AE
+    path = str(tmp_path_factory.mktemp("models"))
+    torch.manual_seed(0)
+    torch.save(GFE_AE().state_dict(), os.path.join(path, "gfe_ae.pt"))
+    return path
+
+
+@pytest.fixture(scope="module")
+def history():
+    feats = add_basic_features(random_ohlc(600, seed=11)).reset_index(drop=True)
+    return feats, pd.date_range("2020-01-01", periods=len(feats), freq="B", tz="Asia/Kolkata")
+
+
+def data_files(index_dir):
+    return sorted(name for name in os.listdir(index_dir) if name != "manifest.json")
+
+
+def test_append_encodes_only_new_bars(tmp_path, model_dir, history):
+    feats, dates = history
+    index = PatternIndex(str(tmp_path))
+    assert index.sync(feats.iloc[:500], dates[:500], model_dir) == 500 - GFE_WINDOW + 1
+    assert index.sync(feats, dates, model_dir) == len(feats) - 500
+    full = encode_windows(load_gfe_encoder(model_dir), feats, np.arange(GFE_WINDOW - 1, len(feats)))
+    assert index.rows == len(full) and np.allclose(index.latents, full)
+
+
+def test_rebuild_writes_a_new_generation(tmp_path, model_dir, history):
+    feats, dates = history
+    index = PatternIndex(str(tmp_path))
+    index.sync(feats, dates, model_dir)
+    before = data_files(tmp_path)
+    index.sync(feats, dates, model_dir, rebuild=True)
+    after = data_files(tmp_path)
+    assert len(after) == 3 and not set(before) & set(after)
+
+
+def test_interrupted_rebuild_keeps_the_old_index(tmp_path, model_dir, history):
+    feats, dates = history
+    PatternIndex(str(tmp_path)).sync(feats, dates, model_dir)
+    gen = PatternIndex(str(tmp_path))
+    gen.open()
+    (tmp_path / f"latents.{gen.manifest['generation'] + 1}.f32").write_bytes(b"\0" * 64)
+    reader = PatternIndex(str(tmp_path))
+    assert reader.open() and reader.rows == gen.rows
+    assert reader.sync(feats, dates, model_dir) == 0
+
+
+def test_truncated_files_are_rebuilt(tmp_path, model_dir, history):
+    feats, dates = history
+    index = PatternIndex(str(tmp_path))
+    index.sync(feats, dates, model_dir)
+    latents = next(name for name in data_files(tmp_path) if name.startswith("latents."))
+    with open(tmp_path / latents, "r+b") as f:
+        f.truncate(100)
+    damaged = PatternIndex(str(tmp_path))
+    assert not damaged.open()
+    assert damaged.sync(feats, dates, model_dir) == len(feats) - GFE_WINDOW + 1
+    assert damaged.open() and damaged.rows == len(feats) - GFE_WINDOW + 1
+
+
+def test_queries_use_the_index_encoder(tmp_path, model_dir, history):
+    feats, dates = history
+    index = PatternIndex(str(tmp_path))
+    index.sync(feats, dates, model_dir)
+    last = len(feats) - 1
+    z = index.encode(build_gfe_geometries(feats, [last], window=GFE_WINDOW), model_dir)[0]
+    assert np.allclose(z, index.latents[-1])
+    rows, dist = index.search(z, k=5, exclude_recent=0)
+    assert rows[0] == index.rows - 1 and dist[0] < 1e-3
@@ -0,0 +1,53 @@
+"""src.resample against pandas, and incremental updates against a full rebuild"""
+import numpy as np
+import pytest
+from src.resample import Resampler, TIMEFRAMES, resample_records, _frame
+from src.market_store import write_market_store
+from src.benchmark import session_bars
+
+AGG = {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}
+
+
+@pytest.fixture(scope="module")
+def bars():
+    return session_bars(75 * 60)
+
+
+@pytest.mark.parametrize("timeframe", list(TIMEFRAMES))
+def test_matches_pandas_resample(bars, timeframe):
+    minutes = TIMEFRAMES[timeframe]
+    src = _frame(bars).set_index("Date")
+    if minutes is None:
+        ref = src.groupby(src.index.date).agg(AGG)
+    else:
+        ref = src.resample(f"{minutes}min", origin="start_day", offset="15min").agg(AGG).dropna()
+    got = _frame(resample_records(bars, minutes)[0])
+    assert len(got) == len(ref)
+    assert np.allclose(got[list(AGG)].to_numpy(), ref[list(AGG)].to_numpy())
+
+
+def write(store_dir, bars):
+    write_market_store({"nifty_5m": (_frame(bars), {})}, store_dir=store_dir, merge=True)
+
+
+@pytest.mark.parametrize("new_bars", [1, 80])
+def test_incremental_sync_matches_full_rebuild(bars, tmp_path, new_bars):
+    store_dir = str(tmp_path)
+    write(store_dir, bars[:-new_bars])
+    Resampler(store_dir, sources=()).sync(rebuild=True)
+    write(store_dir, bars)
+    resampler = Resampler(store_dir, sources=())
+    modes = resampler.sync(persist=False)
+    assert set(modes.values()) == {"incremental"}
+    for tf, minutes in TIMEFRAMES.items():
+        assert np.array_equal(resampler.derived[tf], resample_records(bars, minutes)[0]), tf
+
+
+def test_append_matches_full_rebuild(bars, tmp_path):
+    store_dir = str(tmp_path)
+    write(store_dir, bars[:-1])
+    resampler = Resampler(store_dir, sources=())
+    resampler.sync(persist=False)
+    resampler.append(bars[-1:])
+    for tf, minutes in TIMEFRAMES.items():
+        assert np.array_equal(resampler.derived[tf], resample_records(bars, minutes)[0]), tf
@@ -0,0 +1,37 @@
+"""Batched window builders against the per-sample builders"""
+import numpy as np
+import pytest
+from src import features
+from src.features import (
+    add_basic_features, build_tme_window, build_vse_grid, build_gfe_geometry, build_engineered_features,
+    build_tme_windows, build_vse_grids, build_gfe_geometries, build_engineered_matrix
+)
+from src.benchmark import random_ohlc
+
+
+def assert_batched_equal_loop(feats, indices):
+    batched = (build_tme_windows(feats, indices), build_vse_grids(feats, indices),
+               build_gfe_geometries(feats, indices), build_engineered_matrix(feats, indices))
+    loop = (np.array([build_tme_window(feats, i) for i in indices]),
+            np.array([build_vse_grid(feats, i) for i in indices]),
+            np.array([build_gfe_geometry(feats, i) for i in indices]),
+            np.array([list(build_engineered_features(feats, i).values()) for i in indices]))
+    for name, a, b in zip(("tme", "vse", "gfe", "engineered"), batched, loop):
+        assert a.shape == b.shape and np.array_equal(a, b), f"batched {name} differs from per-sample builder"
+
+
+@pytest.mark.parametrize("n", [200, 3_000])
+def test_batched_matches_per_sample(n):
+    feats = add_basic_features(random_ohlc(n))
+    assert_batched_equal_loop(feats, np.arange(90, len(feats) - 5))
+
+
+def test_short_windows_are_padded_like_per_sample():
+    feats = add_basic_features(random_ohlc(400, seed=4))
+    assert_batched_equal_loop(feats, np.array([0, 1, 5, 19, 59, 89]))
+
+
+def test_chunk_boundaries(monkeypatch):
+    monkeypatch.setattr(features, "WINDOW_CHUNK", 7)
+    feats = add_basic_features(random_ohlc(500, seed=5))
+    assert_batched_equal_loop(feats, np.arange(90, len(feats)))